@@ -1,18 +1,22 @@
 import logging
-import requests
+import time
 import voluptuous as vol
 import asyncio
-import aiohttp
-from datetime import timedelta
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.discovery import load_platform
-from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.const import CONF_NAME, CONF_SCAN_INTERVAL
 from .const import DOMAIN, DEFAULT_NAME, CONF_AUTH_TOKEN, CONF_ENDPOINT_PREFIX
 from .obico_component import ObicoComponent  # Use relative import
+from .fleet import async_get_fleet
+from .commands import async_register_services, async_unregister_services
+from .gcode_file_cache import GCodeFileCache
+from .outbox import EventOutbox
+from .timelapse import async_remove_timelapses
 
 _LOGGER = logging.getLogger(__name__)
 
+PLATFORMS = ["sensor", "camera"]
+
 CONFIG_SCHEMA = vol.Schema(
     {
         DOMAIN: vol.Schema(
@@ -31,80 +35,48 @@ async def async_setup_entry(hass, entry):
     """Set up Obico Connect from a config entry."""
     _LOGGER.debug("Setting up Obico Connect")
     _LOGGER.debug(f"Entry data: {entry.data}")
+    setup_started = time.perf_counter()
 
     name = entry.data.get(CONF_NAME, DEFAULT_NAME)
-    auth_token = entry.data[CONF_AUTH_TOKEN]
     endpoint_prefix = entry.data[CONF_ENDPOINT_PREFIX]
     scan_interval = entry.data.get(CONF_SCAN_INTERVAL, 60)
 
-    hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = {
-        "name": name,
-        "auth_token": auth_token,
-        "endpoint_prefix": endpoint_prefix,
-        "scan_interval": scan_interval,
-    }
-
-    _LOGGER.debug(f"Configuration loaded from entry: {hass.data[DOMAIN][entry.entry_id]}")
+    _LOGGER.debug(f"Configuration loaded from entry: name={name}, endpoint_prefix={endpoint_prefix}, scan_interval={scan_interval}")
 
-    # obico_component = ObicoComponent(hass, hass.data[DOMAIN][entry.entry_id])  # Initialize ObicoComponent
+    fleet = async_get_fleet(hass)  # Shared by all printers, stored in hass.data[DOMAIN]
     obico_component = ObicoComponent(hass, entry)  # Initialize ObicoComponent
-    hass.data[DOMAIN][entry.entry_id] = obico_component  # Store ObicoComponent instance in data
-    obico_component.setup()  # Call setup to establish WebSocket connection and send initial status update
-
-    async def post_printer_status(now):
-        _LOGGER.debug("post_printer_status called")
-        try:
-            async with aiohttp.ClientSession() as session:
-                headers = {'Authorization': f'Token {auth_token}'}
-                _LOGGER.debug(f"Headers: {headers}")
-                payload = {
-                    # Add more detailed status information here
-                    "status": "online",
-                    "temperature": 200,  # Example temperature value
-                    "job": {
-                        "file": "example.gcode",
-                        "progress": 50  # Example progress value
-                    }
-                }
-        except Exception as e:
-            _LOGGER.error(f"Error posting printer status: {e}")
-
-    async def initial_registration():
-        _LOGGER.debug("initial_registration called")
-        try:
-            async with aiohttp.ClientSession() as session:
-                headers = {'Authorization': f'Token {auth_token}'}
-                _LOGGER.debug(f"Headers: {headers}")
-                payload = {
-                    "name": name,
-                    "status": "online"
-                }
-                # async with session.post(f"{endpoint_prefix}/api/v1/octo/printer/", headers=headers, json=payload) as response:
-                async with session.get(f"{endpoint_prefix}/api/v1/octo/printer/", headers=headers) as response:
-                    response_text = await response.text()
-                    _LOGGER.debug(f"Response status: {response.status}")
-                    _LOGGER.debug(f"Response text: {response_text}")
-                    if response.status != 200:
-                        _LOGGER.error(f"Failed to register printer: {response.status} - {response_text}")
-                    else:
-                        _LOGGER.debug(f"Successfully registered printer: {response.status} - {response_text}")
-        except Exception as e:
-            _LOGGER.error(f"Error registering printer: {e}")
-
-    # Perform initial registration
-    _LOGGER.debug("Scheduling initial_registration task")
-    hass.loop.create_task(initial_registration())
-
-    # Schedule the periodic status update
-    _LOGGER.debug("Scheduling post_printer_status task")
-    async_track_time_interval(hass, post_printer_status, timedelta(seconds=scan_interval))
+    fleet.add_component(entry.entry_id, obico_component)
+    await obico_component.async_load()
+    obico_component.setup()  # Local setup; the WebSocket connection and registration start once Home Assistant has started
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    async_register_services(hass)
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))  # options only take effect on a fresh component
+    _LOGGER.debug(f"Set up {entry.title} in {(time.perf_counter() - setup_started) * 1000:.1f} ms, network start deferred until Home Assistant has started")
 
     return True
 
+async def async_reload_entry(hass, entry):
+    """Reload a config entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass, entry):
     """Unload a config entry."""
     _LOGGER.debug("Unloading Obico Connect")
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
     if DOMAIN in hass.data:
-        hass.data[DOMAIN].pop(entry.entry_id)
-    return True
\ No newline at end of file
+        fleet = hass.data[DOMAIN]
+        obico_component = fleet.remove_component(entry.entry_id)
+        if obico_component:
+            await obico_component.shutdown()
+        if not fleet.components:
+            async_unregister_services(hass)
+            hass.data.pop(DOMAIN)
+            await fleet.async_shutdown()
+    return True
+
+async def async_remove_entry(hass, entry):
+    """Remove a config entry's stored data."""
+    await GCodeFileCache(hass, entry.entry_id).async_remove()
+    await EventOutbox(hass, entry.entry_id).async_remove()
+    await async_remove_timelapses(hass, entry.entry_id)
\ No newline at end of file
@@ -0,0 +1,404 @@
+"""Offline micro-benchmarks for the status, serialization and snapshot paths.
+
+Runs against a fake ``hass.states`` store and a local aiohttp stand-in for the Obico endpoints, so no printer,
+camera or server is needed. Home Assistant itself must be importable (as in the integration's dev environment);
+suites whose imports fail are reported as skipped.
+
+    python benchmarks/bench.py                         # table on stderr, JSON on stdout
+    python benchmarks/bench.py -o results.json         # write JSON to a file
+    python benchmarks/bench.py --compare baseline.json # also print the change against an earlier run
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "obico_connect"
+
+def import_package():
+    # Register the repo root as a package without running its __init__ (which sets up the HA entry points)
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [REPO_ROOT]
+        sys.modules[PACKAGE] = package
+    return sys.modules[PACKAGE]
+
+# -- fakes ----------------------------------------------------------------------------------------------------------
+
+BAMBU_STATES = {
+    "print_status": "running",
+    "print_progress": "42",
+    "current_stage": "printing",
+    "gcode_filename": "benchy.gcode",
+    "start_time": "2025-02-22 10:00:00",
+    "end_time": "2025-02-22 11:30:00",
+    "remaining_time": "35",
+    "cooling_fan_speed": "80",
+    "nozzle_temperature": "219.6",
+    "nozzle_target_temperature": "220",
+    "bed_temperature": "59.8",
+    "bed_target_temperature": "60",
+    "current_layer": "12",
+    "total_layer_count": "150",
+}
+
+class FakeState:
+    __slots__ = ("entity_id", "state", "attributes")
+
+    def __init__(self, entity_id, state, attributes=None):
+        self.entity_id = entity_id
+        self.state = state
+        self.attributes = attributes or {}
+
+class FakeStates:
+    def __init__(self):
+        self._states = {}
+
+    def get(self, entity_id):
+        return self._states.get(entity_id)
+
+    def set(self, entity_id, state, attributes=None):
+        self._states[entity_id] = FakeState(entity_id, state, attributes)
+
+class FakeBus:
+    def async_listen(self, event_type, listener):
+        return lambda: None
+
+    def async_listen_once(self, event_type, listener):
+        return lambda: None
+
+class FakeHass:
+    def __init__(self):
+        self.states = FakeStates()
+        self.bus = FakeBus()
+        self.data = {}
+        self.loop = asyncio.get_running_loop()
+
+    async def async_add_executor_job(self, func, *args):
+        return await self.loop.run_in_executor(None, func, *args)
+
+    def async_create_task(self, coro):
+        return self.loop.create_task(coro)
+
+def bambu_entity_map(hass, device_id="bench"):
+    from obico_connect.entity_map import EntityMap, DEVICE_FIELDS
+    entity_map = EntityMap(hass, device_id, "bambu_lab")
+    # Skip the registry lookup, resolve to the legacy "sensor.<device>_<suffix>" ids like a device missing from the registry
+    entity_map._resolved = [(field, f"sensor.{device_id}_{suffix}", converter) for field, (suffix, converter) in DEVICE_FIELDS["bambu_lab"].items()]
+    for suffix, value in BAMBU_STATES.items():
+        hass.states.set(f"sensor.{device_id}_{suffix}", value)
+    return entity_map
+
+def status_component(hass):
+    from obico_connect.obico_component import ObicoComponent
+    from obico_connect.history import PrinterHistory
+    from obico_connect.metrics import PrinterMetrics
+    component = ObicoComponent.__new__(ObicoComponent)
+    component.hass = hass
+    component.device_type = "bambu_lab"
+    component.printer_device_id = "bench"
+    component.entity_map = bambu_entity_map(hass)
+    component.snapshot = status_snapshot(hass, component.entity_map)
+    component.print_job_tracker = types.SimpleNamespace(current_print_ts=-1)
+    component.history = PrinterHistory()
+    component.history.snapshot = component.snapshot
+    component.metrics = PrinterMetrics()
+    return component
+
+def status_snapshot(hass, entity_map):
+    from obico_connect.snapshot import PrinterSnapshot
+    snapshot = PrinterSnapshot(hass, entity_map, "bambu_lab", webcams=[{"name": "camera.bench", "is_primary_camera": True, "stream_mode": "disabled"}])
+    snapshot._by_entity = entity_map.fields_by_entity()  # no state tracking: the benchmarks feed state changes directly
+    snapshot.refresh()
+    return snapshot
+
+def sample_jpeg(width=1920, height=1080, quality=85):
+    from PIL import Image
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+# -- harness --------------------------------------------------------------------------------------------------------
+
+def summarize(name, durations_ns, peaks):
+    durations_ns.sort()
+    total_s = sum(durations_ns) / 1e9
+    return {
+        "name": name,
+        "calls": len(durations_ns),
+        "ops_per_sec": len(durations_ns) / total_s if total_s else None,
+        "p50_us": durations_ns[len(durations_ns) // 2] / 1e3,
+        "p99_us": durations_ns[min(len(durations_ns) - 1, int(len(durations_ns) * 0.99))] / 1e3,
+        "alloc_peak_bytes_per_call": statistics.mean(peaks) if peaks else None,
+    }
+
+def bench_sync(name, func, calls, trace_calls=50):
+    for _ in range(min(calls, 20)):  # warm up
+        func()
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter_ns()
+        func()
+        durations.append(time.perf_counter_ns() - start)
+    # Allocations are measured in a separate, shorter pass: tracing slows every call down considerably
+    peaks = []
+    tracemalloc.start()
+    for _ in range(trace_calls):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return summarize(name, durations, peaks)
+
+async def bench_async(name, func, calls, trace_calls=20):
+    for _ in range(min(calls, 5)):
+        await func()
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter_ns()
+        await func()
+        durations.append(time.perf_counter_ns() - start)
+    peaks = []
+    tracemalloc.start()
+    for _ in range(trace_calls):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return summarize(name, durations, peaks)
+
+# -- suites ---------------------------------------------------------------------------------------------------------
+
+async def suite_status(calls):
+    hass = FakeHass()
+    component = status_component(hass)
+    snapshot = component.snapshot
+    temperatures = [FakeState("sensor.bench_nozzle_temperature", f"{219 + i / 10:.1f}") for i in range(10)]
+    changes = iter(temperatures * (calls // len(temperatures) + 10))
+    return [
+        bench_sync("snapshot.refresh", snapshot.refresh, calls),
+        bench_sync("snapshot ingest+payload (temperature change)", lambda: (snapshot._ingest("sensor.bench_nozzle_temperature", next(changes)), snapshot.payload()), calls),
+        await bench_async("status", component.status, calls),
+    ]
+
+async def suite_encoding(calls):
+    from obico_connect.delta_encoder import DeltaEncoder
+    hass = FakeHass()
+    payload = await status_component(hass).status()
+    results = [bench_sync("json.dumps(status)", lambda: json.dumps(payload, default=str), calls)]
+
+    encoder = DeltaEncoder(full_snapshot_every=calls * 10)
+    encoder.ack(payload, True)
+    steady = dict(payload, status=dict(payload["status"], _ts=payload["status"]["_ts"] + 1))
+    results.append(bench_sync("delta_encode+json.dumps(status)", lambda: json.dumps(encoder.encode(steady)[0], default=str), calls))
+    results[0]["bytes"] = len(json.dumps(payload, default=str))
+    results[1]["bytes"] = len(json.dumps(encoder.encode(steady)[0], default=str))
+    try:
+        import bson
+        encode = getattr(bson, "encode", None) or bson.dumps  # pymongo's bson vs the standalone bson package
+        plain = json.loads(json.dumps(payload, default=str))  # BSON can't encode timedeltas
+        results.append(bench_sync("bson(status)", lambda: encode(plain), calls))
+        results[-1]["bytes"] = len(encode(plain))
+    except ImportError:
+        pass
+    return results
+
+async def suite_serializers(calls):
+    from obico_connect.serializers import SERIALIZERS, create_serializer
+    hass = FakeHass()
+    payload = await status_component(hass).status()
+    status = payload["status"]
+    payload["status"] = dict(status, job=dict(status["job"], duration=datetime.timedelta(minutes=42)))  # exercises the explicit type handling
+    results = []
+    for name in SERIALIZERS:
+        serializer = create_serializer(name)
+        if serializer is None:
+            print(f"serializer {name} skipped: not installed", file=sys.stderr)
+            continue
+        results.append(bench_sync(f"serializer.{name}.dumps(status)", lambda: serializer.dumps(payload), calls))
+        results[-1]["bytes"] = len(serializer.dumps(payload))
+    return results
+
+IMPORT_PROBE = """
+import json, sys, time, types
+package = types.ModuleType({package!r})
+package.__path__ = [{root!r}]
+sys.modules[{package!r}] = package
+before = set(sys.modules)
+start = time.perf_counter_ns()
+import {package}.obico_component, {package}.config_flow, {package}.sensor
+elapsed = time.perf_counter_ns() - start
+print(json.dumps({{"ns": elapsed, "heavy": sorted(name for name in {heavy!r} if name in sys.modules and name not in before)}}))
+"""
+HEAVY_MODULES = ("requests", "bson", "backoff", "PIL", "orjson", "msgpack")
+
+async def suite_startup(calls):
+    # Cold import of the integration's modules in fresh interpreters, with Home Assistant itself already loaded
+    preload = "import homeassistant.core, homeassistant.helpers.event, homeassistant.components.camera, aiohttp\n"
+    probe = preload + IMPORT_PROBE.format(package=PACKAGE, root=REPO_ROOT, heavy=HEAVY_MODULES)
+    durations, heavy = [], set()
+    for _ in range(max(min(calls // 200, 10), 3)):
+        proc = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+        if proc.returncode:
+            raise ImportError(proc.stderr.strip().splitlines()[-1])
+        report = json.loads(proc.stdout)
+        durations.append(report["ns"])
+        heavy.update(report["heavy"])
+    result = summarize("import integration (cold)", durations, [])
+    result["heavy_modules_imported"] = sorted(heavy)
+    return [result]
+
+async def suite_frames(calls):
+    from obico_connect.frame_change import frame_digest, frame_signature
+    from obico_connect.image_processing import process_jpeg, FrameProcessingSettings
+    jpeg = sample_jpeg()
+    settings = FrameProcessingSettings(max_dimension=1280, quality=80)
+    digest = frame_digest(jpeg)
+    calls = max(calls // 20, 10)  # each call decodes a full-HD frame
+    results = [
+        bench_sync("frame_digest(1080p)", lambda: frame_digest(jpeg), calls * 10),
+        bench_sync("frame_signature(1080p)", lambda: frame_signature(jpeg, digest), calls),
+        bench_sync("process_jpeg(1080p->1280)", lambda: process_jpeg(jpeg, settings), calls, trace_calls=5),
+    ]
+    results[-1]["bytes_in"] = len(jpeg)
+    results[-1]["bytes_out"] = len(process_jpeg(jpeg, settings))
+    return results
+
+async def suite_snapshot_upload(calls):
+    from aiohttp import web
+    from obico_connect.jpeg_poster import JpegPoster
+    from obico_connect.webcam import Webcam
+    from obico_connect.image_processing import FrameProcessingSettings
+    from obico_connect.http_client import create_session
+    from obico_connect.metrics import PrinterMetrics
+
+    async def pic(request):
+        await request.read()
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post("/api/v1/octo/pic/", pic)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    hass = FakeHass()
+    session = create_session()
+    plugin = types.SimpleNamespace(
+        endpoint_prefix=f"http://127.0.0.1:{port}",
+        http_session=session,
+        auth_headers=lambda: {"Authorization": "Token bench"},
+        metrics=PrinterMetrics(),
+        fleet=types.SimpleNamespace(capture_slots=asyncio.Semaphore(1)),
+        print_activity=lambda: "printing",
+        snapshot=types.SimpleNamespace(current_layer=None),
+        timelapse=types.SimpleNamespace(async_add_frame=lambda jpeg: asyncio.sleep(0)),
+    )
+    try:
+        jpeg = sample_jpeg(1280, 720)
+    except ImportError:
+        jpeg = os.urandom(200_000)
+    webcam = Webcam(hass, "camera.bench", change_threshold=0, processing_settings=FrameProcessingSettings(max_dimension=0), frame_freshness=0)
+    poster = JpegPoster(hass, [webcam], plugin)
+
+    async def fake_capture():
+        return jpeg
+    webcam.capture_jpeg = fake_capture
+    try:
+        results = [await bench_async("post_pic_to_server(720p, keep-alive)", poster.post_pic_to_server, max(calls // 10, 20))]
+        webcam.frame_cache.freshness_seconds = 3600
+        results.append(await bench_async("async_frame(cached)", webcam.async_frame, calls))
+        return results
+    finally:
+        await session.close()
+        await runner.cleanup()
+
+SUITES = {
+    "status": suite_status,
+    "encoding": suite_encoding,
+    "serializers": suite_serializers,
+    "startup": suite_startup,
+    "frames": suite_frames,
+    "snapshot_upload": suite_snapshot_upload,
+}
+
+# -- reporting ------------------------------------------------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def print_table(results, baseline=None, out=sys.stderr):
+    previous = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    print(f"{'benchmark':45} {'ops/s':>12} {'p50 us':>10} {'p99 us':>10} {'alloc B':>10} {'vs base':>8}", file=out)
+    for r in results:
+        change = ""
+        if r["name"] in previous and previous[r["name"]].get("ops_per_sec"):
+            change = f"{r['ops_per_sec'] / previous[r['name']]['ops_per_sec']:.2f}x"
+        alloc = "" if r["alloc_peak_bytes_per_call"] is None else f"{r['alloc_peak_bytes_per_call']:.0f}"
+        print(f"{r['name']:45} {r['ops_per_sec']:12.1f} {r['p50_us']:10.1f} {r['p99_us']:10.1f} {alloc:>10} {change:>8}", file=out)
+
+async def run(selected, calls):
+    results, skipped = [], {}
+    for name in selected:
+        try:
+            results.extend(await SUITES[name](calls))
+        except ImportError as e:
+            skipped[name] = str(e)
+    return results, skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("suites", nargs="*", help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("-n", "--calls", type=int, default=2000, help="timed calls per benchmark")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare ops/sec against")
+    args = parser.parse_args(argv)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    import_package()
+    results, skipped = asyncio.run(run(args.suites or list(SUITES), args.calls))
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "results": results,
+        "skipped": skipped,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    for name, reason in skipped.items():
+        print(f"skipped {name}: {reason}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,41 @@
 import logging
 from homeassistant.components.camera import Camera
-from .const import DOMAIN
+from .const import DOMAIN, DEFAULT_NAME
 
 _LOGGER = logging.getLogger(__name__)
 
-async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
-    async_add_entities([ObicoConnectCamera(hass.data[DOMAIN])], True)
+async def async_setup_entry(hass, entry, async_add_entities):
+    obico_component = hass.data[DOMAIN].components[entry.entry_id]
+    async_add_entities([ObicoConnectCamera(entry, webcam) for webcam in obico_component.jpeg_poster.webcams])
 
 class ObicoConnectCamera(Camera):
-    def __init__(self, config):
+    """A printer webcam as Obico sees it: served from the frame cache the snapshot uploads fill."""
+    _attr_has_entity_name = True
+
+    def __init__(self, entry, webcam):
         super().__init__()
-        self._name = config["name"]
+        self._webcam = webcam
+        if webcam.is_primary:
+            self._attr_name = "Webcam"
+            self._attr_unique_id = f"{entry.entry_id}_camera"
+        else:
+            self._attr_name = f"{webcam.role.capitalize()} webcam {webcam.entity_id.split('.', 1)[-1]}"
+            self._attr_unique_id = f"{entry.entry_id}_camera_{webcam.entity_id}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, entry.entry_id)},
+            "name": entry.title or DEFAULT_NAME,
+        }
 
     @property
-    def name(self):
-        return self._name
+    def extra_state_attributes(self):
+        return {"source": self._webcam.entity_id, "role": self._webcam.role}
 
-    async def async_camera_image(self):
-        return b""
\ No newline at end of file
+    async def async_camera_image(self, width=None, height=None):
+        if self.entity_id == self._webcam.entity_id:
+            return None  # configured as its own source
+        try:
+            frame = await self._webcam.async_frame()
+        except Exception as e:
+            _LOGGER.debug(f"Unable to capture a frame from {self._webcam.entity_id}: {e}")
+            frame = self._webcam.frame_cache.latest  # stale beats nothing
+        return frame.content if frame else None
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+import voluptuous as vol
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from .const import DOMAIN
+from .entity_map import EntityMap
+
+_LOGGER = logging.getLogger(__name__)
+
+# Obico command -> button entity suffix, per device type; pressed through the printer integration's buttons
+DEVICE_ACTIONS = {
+    "bambu_lab": {
+        "pause": "pause_printing",
+        "resume": "resume_printing",
+        "cancel": "stop_printing",
+    },
+    "moonraker": {
+        "pause": "pause_print",
+        "resume": "resume_print",
+        "cancel": "cancel_print",
+    },
+}
+
+# Passthru calls from the server that map onto the same actions
+PASSTHRU_ACTIONS = {
+    "pause": "pause",
+    "resume": "resume",
+    "cancel": "cancel",
+}
+
+class CommandDispatcher:
+    """Routes printer control commands from the server to the printer integration and acknowledges them."""
+
+    def __init__(self, hass, plugin):
+        self.hass = hass
+        self.plugin = plugin
+        self.actions = EntityMap(hass, plugin.printer_device_id, plugin.device_type, domain="button", suffixes=DEVICE_ACTIONS.get(plugin.device_type, {}))
+        self._lock = asyncio.Lock()  # FIFO, so a pause followed by a resume runs in that order
+
+    def start(self):
+        self.actions.async_start()
+
+    def stop(self):
+        self.actions.async_stop()
+
+    def process_server_msg(self, raw_data):
+        received_at = time.monotonic()
+        serializer = self.plugin.serializer
+        if serializer.binary and isinstance(raw_data, (bytes, bytearray)):
+            return self._dispatch(serializer.loads(raw_data), received_at)
+        # Fast path: most server messages carry neither commands nor passthru calls and don't need a full parse here
+        if isinstance(raw_data, (bytes, bytearray)):
+            raw_data = raw_data.decode()
+        if '"commands"' not in raw_data and '"passthru"' not in raw_data and '"remote_status"' not in raw_data:
+            return None
+        return self._dispatch(serializer.loads(raw_data), received_at)
+
+    def _dispatch(self, msg, received_at):
+        for command in msg.get("commands") or ():
+            self.hass.async_create_task(self.run_command(command.get("cmd"), command.get("args") or {}, received_at))
+        passthru = msg.get("passthru")
+        if passthru:
+            self.hass.async_create_task(self.run_passthru(passthru, received_at))
+        return msg
+
+    async def run_command(self, cmd, args, received_at):
+        try:
+            await self.perform(cmd, args, received_at)
+        except Exception as e:
+            _LOGGER.error(f"Failed to perform '{cmd}' command from server: {e}")
+        # The resulting printer state is the server's acknowledgement for plain commands
+        await self.plugin.post_update_to_server()
+
+    async def run_passthru(self, passthru, received_at):
+        ref = passthru.get("ref")
+        ack = {"ref": ref}
+        try:
+            cmd = PASSTHRU_ACTIONS.get(passthru.get("func"))
+            if cmd is None:
+                raise ValueError(f"Unsupported passthru call: {passthru.get('target')}.{passthru.get('func')}")
+            await self.perform(cmd, passthru.get("kwargs") or {}, received_at)
+            ack["ret"] = "ok"
+        except Exception as e:
+            _LOGGER.error(f"Failed to perform passthru call from server: {e}")
+            ack["error"] = str(e)
+        if ref:
+            await self.plugin.post_update_to_server({"passthru": ack})
+
+    async def perform(self, cmd, args, received_at=None):
+        if cmd not in self.actions.suffixes:
+            raise ValueError(f"Command '{cmd}' is not supported for {self.plugin.device_type} printers")
+        if args:
+            _LOGGER.debug(f"Ignoring '{cmd}' arguments the printer integration can't apply: {args}")
+        entity_id = self.actions.entity_id(cmd)
+        async with self._lock:
+            await self.hass.services.async_call("button", "press", {"entity_id": entity_id}, blocking=True)
+        if received_at is not None:
+            self.plugin.metrics.command_performed(received_at)
+        _LOGGER.info(f"Performed '{cmd}' on {entity_id}")
+
+SERVICES = {
+    "pause_print": "pause",
+    "resume_print": "resume",
+    "cancel_print": "cancel",
+}
+
+SERVICE_SCHEMA = vol.Schema({vol.Optional("config_entry_id"): cv.string})
+
+@callback
+def async_register_services(hass):
+    if hass.services.has_service(DOMAIN, "pause_print"):
+        return
+
+    async def handle_print_service(call):
+        entry_id = call.data.get("config_entry_id")
+        components = [component for component_entry_id, component in hass.data[DOMAIN].components.items() if entry_id in (None, component_entry_id)]
+        if not components:
+            raise HomeAssistantError(f"No Obico Connect printer with config entry {entry_id}")
+        await asyncio.gather(*(component.command_dispatcher.perform(SERVICES[call.service], {}) for component in components))
+
+    for service in SERVICES:
+        hass.services.async_register(DOMAIN, service, handle_print_service, schema=SERVICE_SCHEMA)
+
+@callback
+def async_unregister_services(hass):
+    for service in SERVICES:
+        hass.services.async_remove(DOMAIN, service)
@@ -2,8 +2,13 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
 from homeassistant.helpers.selector import selector
-from .const import DOMAIN, CONF_AUTH_TOKEN, CONF_ENDPOINT_PREFIX, DEFAULT_NAME
-import aiohttp
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from .const import DOMAIN, CONF_AUTH_TOKEN, CONF_ENDPOINT_PREFIX, DEFAULT_NAME, CONF_STATUS_PUSH_MODE, STATUS_PUSH_MODE_EVENT, STATUS_PUSH_MODE_POLL, CONF_STATUS_DELTA_ENCODING, CONF_WS_SERIALIZER, WS_SERIALIZER_AUTO, CONF_SNAPSHOT_CHANGE_THRESHOLD, SNAPSHOT_CHANGE_THRESHOLD
+from .const import CONF_SNAPSHOT_MAX_DIMENSION, CONF_SNAPSHOT_QUALITY, CONF_SNAPSHOT_MAX_BYTES, CONF_WEBCAM_FLIP_H, CONF_WEBCAM_FLIP_V, CONF_WEBCAM_ROTATION
+from .const import SNAPSHOT_MAX_DIMENSION, SNAPSHOT_QUALITY, SNAPSHOT_MAX_BYTES, CONF_SNAPSHOT_FRAME_FRESHNESS, SNAPSHOT_FRAME_FRESHNESS_SECONDS
+from .const import CONF_TIMELAPSE
+from .const import CONF_NOZZLE_CAMERA, CONF_EXTRA_CAMERAS, CONF_EXTRA_CAMERA_INTERVAL_FACTOR, EXTRA_CAMERA_INTERVAL_FACTOR
+from .serializers import SERIALIZERS
 import logging
 import homeassistant.helpers.entity_registry as async_get_entity_registry
 
@@ -64,16 +69,17 @@ class ObicoConnectConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
     async def verify_code(self, code):
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(f"{self.endpoint_prefix}/api/v1/octo/verify/?code={code}") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        printer = data.get("printer")
-                        if printer:
-                            return printer.get("auth_token")
-            except Exception as e:
-                _LOGGER.error(f"Error making GET request: {e}")
+        # One-off call before the entry exists, so it goes through Home Assistant's shared keep-alive session
+        session = async_get_clientsession(self.hass)
+        try:
+            async with session.get(f"{self.endpoint_prefix}/api/v1/octo/verify/?code={code}") as response:
+                if response.status == 200:
+                    data = await response.json()
+                    printer = data.get("printer")
+                    if printer:
+                        return printer.get("auth_token")
+        except Exception as e:
+            _LOGGER.error(f"Error making GET request: {e}")
         return None
 
     @staticmethod
@@ -98,6 +104,21 @@ class ObicoConnectOptionsFlow(config_entries.OptionsFlowWithConfigEntry):
             data_schema=vol.Schema(
             {
                 vol.Optional(CONF_ENDPOINT_PREFIX, default=self.config_entry.options.get(CONF_ENDPOINT_PREFIX, "https://app.obico.io")): str,
+                vol.Optional(CONF_STATUS_PUSH_MODE, default=self.config_entry.options.get(CONF_STATUS_PUSH_MODE, STATUS_PUSH_MODE_EVENT), description="Push status when printer sensors change (event) or on a fixed interval (poll)"): vol.In([STATUS_PUSH_MODE_EVENT, STATUS_PUSH_MODE_POLL]),
+                vol.Optional(CONF_STATUS_DELTA_ENCODING, default=self.config_entry.options.get(CONF_STATUS_DELTA_ENCODING, False), description="Send only changed status fields between periodic full snapshots (requires server support)"): bool,
+                vol.Optional(CONF_WS_SERIALIZER, default=self.config_entry.options.get(CONF_WS_SERIALIZER, WS_SERIALIZER_AUTO), description="Encoding of messages sent to the server; msgpack and bson are offered to the server and fall back to JSON if it declines"): vol.In([WS_SERIALIZER_AUTO, *SERIALIZERS]),
+                vol.Optional(CONF_SNAPSHOT_CHANGE_THRESHOLD, default=self.config_entry.options.get(CONF_SNAPSHOT_CHANGE_THRESHOLD, SNAPSHOT_CHANGE_THRESHOLD), description="Skip uploading webcam frames that changed less than this fraction (0 uploads every frame)"): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+                vol.Optional(CONF_SNAPSHOT_MAX_DIMENSION, default=self.config_entry.options.get(CONF_SNAPSHOT_MAX_DIMENSION, SNAPSHOT_MAX_DIMENSION), description="Downsize webcam frames larger than this many pixels before upload (0 keeps the original size)"): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(CONF_SNAPSHOT_QUALITY, default=self.config_entry.options.get(CONF_SNAPSHOT_QUALITY, SNAPSHOT_QUALITY), description="JPEG quality of re-encoded webcam frames"): vol.All(vol.Coerce(int), vol.Range(min=10, max=95)),
+                vol.Optional(CONF_SNAPSHOT_MAX_BYTES, default=self.config_entry.options.get(CONF_SNAPSHOT_MAX_BYTES, SNAPSHOT_MAX_BYTES), description="Byte budget of an uploaded webcam frame (0 for no budget)"): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(CONF_SNAPSHOT_FRAME_FRESHNESS, default=self.config_entry.options.get(CONF_SNAPSHOT_FRAME_FRESHNESS, SNAPSHOT_FRAME_FRESHNESS_SECONDS), description="Seconds a captured webcam frame is reused by the camera entity and uploads before capturing again"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_WEBCAM_FLIP_H, default=self.config_entry.options.get(CONF_WEBCAM_FLIP_H, False), description="Flip webcam frames horizontally"): bool,
+                vol.Optional(CONF_WEBCAM_FLIP_V, default=self.config_entry.options.get(CONF_WEBCAM_FLIP_V, False), description="Flip webcam frames vertically"): bool,
+                vol.Optional(CONF_WEBCAM_ROTATION, default=self.config_entry.options.get(CONF_WEBCAM_ROTATION, 0), description="Rotate webcam frames clockwise by this many degrees"): vol.All(vol.Coerce(int), vol.In([0, 90, 180, 270])),
+                vol.Optional(CONF_TIMELAPSE, default=self.config_entry.options.get(CONF_TIMELAPSE, False), description="Record a timelapse of every print and upload it when the print ends (needs ffmpeg and server support; uses up to 2 GiB of disk across all printers)"): bool,
+                vol.Optional(CONF_NOZZLE_CAMERA, description={"suggested_value": self.config_entry.options.get(CONF_NOZZLE_CAMERA)}): selector({"entity": {"domain": "camera"}}),
+                vol.Optional(CONF_EXTRA_CAMERAS, default=self.config_entry.options.get(CONF_EXTRA_CAMERAS, []), description="Additional cameras of the printer, uploaded alongside the primary one"): selector({"entity": {"domain": "camera", "multiple": True}}),
+                vol.Optional(CONF_EXTRA_CAMERA_INTERVAL_FACTOR, default=self.config_entry.options.get(CONF_EXTRA_CAMERA_INTERVAL_FACTOR, EXTRA_CAMERA_INTERVAL_FACTOR), description="Snapshot interval of the nozzle and extra cameras as a multiple of the primary camera's"): vol.All(vol.Coerce(float), vol.Range(min=1, max=60)),
             }
             ),
         )
\ No newline at end of file
@@ -5,4 +5,87 @@ CONF_ENDPOINT_PREFIX = "endpoint_prefix"
 POST_STATUS_INTERVAL_SECONDS = 50
 MAX_GCODE_DOWNLOAD_SECONDS = 30 * 60 # 30 minutes
 POST_PIC_INTERVAL_SECONDS = 15.0 # How frequently to post a picture from the webcam to the Obico server
-CONF_DEVICE_TYPE = "device_type"
\ No newline at end of file
+CONF_DEVICE_TYPE = "device_type"
+CONF_STATUS_PUSH_MODE = "status_push_mode"
+STATUS_PUSH_MODE_EVENT = "event" # Push status when a printer sensor changes
+STATUS_PUSH_MODE_POLL = "poll" # Legacy fixed-interval status updates
+STATUS_PUSH_DEBOUNCE_SECONDS = 0.5 # Bursts of sensor changes within this window are coalesced into one status send
+STATUS_HEARTBEAT_SECONDS = 120.0 # Safety-net status send when no sensor changes were pushed for this long
+STATUS_PUSH_DEADBANDS = { # Numeric changes of a sensor's state smaller than these, per logical status field it feeds, do not trigger a push
+    "nozzle_temperature": 1.0,
+    "nozzle_target_temperature": 1.0,
+    "bed_temperature": 1.0,
+    "bed_target_temperature": 1.0,
+    "cooling_fan_speed": 5.0,
+    "percent_progress": 0.5,
+    "percent_print_progress": 0.5,
+    "remaining_time": 1.0,
+    "print_time": 60.0,
+}
+CONF_STATUS_DELTA_ENCODING = "status_delta_encoding"
+STATUS_FULL_SNAPSHOT_EVERY = 20 # With delta encoding on, send a full status snapshot after this many deltas so the server can resync
+CONF_WS_SERIALIZER = "ws_serializer"
+WS_SERIALIZER_AUTO = "auto" # orjson when installed, stdlib json otherwise; binary backends (msgpack, bson) are used only if the server accepts their subprotocol
+GCODE_FILE_CACHE_MAX_ENTRIES = 500 # G-code files whose server file id is remembered across restarts
+GCODE_FILE_CACHE_TTL_SECONDS = 90 * 24 * 60 * 60 # Cached server file ids unused for this long are looked up again
+GCODE_FILE_CACHE_SAVE_DELAY_SECONDS = 10
+HISTORY_CAPACITY = 2048 # Samples kept per history channel (nozzle, bed, fan, progress); older samples are overwritten
+HISTORY_BUCKETS = 12 # Buckets of the min/max/mean history series attached to heartbeat and full-snapshot status messages
+HISTORY_WINDOW_SECONDS = STATUS_HEARTBEAT_SECONDS # Span of the history series, whichever send it rides on
+OUTBOX_MAX_EVENTS = 1000 # Undelivered events kept on disk while the server is unreachable; the oldest are dropped beyond this
+OUTBOX_MAX_AGE_SECONDS = 7 * 24 * 60 * 60 # Undelivered events older than this are dropped
+OUTBOX_REPLAY_BATCH = 20 # Events replayed per batch after a reconnect; a pending status goes out between batches
+STARTUP_STAGGER_SECONDS = 15 # Entries open their server connections spread over this window after Home Assistant has started
+WS_HEARTBEAT_SECONDS = 20.0 # Interval of the websocket ping that measures the round trip and detects dead connections
+WS_MAX_MISSED_PONGS = 2 # Unanswered pings after which the connection is considered dead and re-established
+CONF_TIMELAPSE = "timelapse"
+TIMELAPSE_DISK_QUOTA_BYTES = 2 * 1024 ** 3 # Disk space for timelapse frames and videos, shared by all printers
+TIMELAPSE_SEGMENT_GROW_BYTES = 32 * 1024 ** 2 # Chunk the memory-mapped frame file grows by
+TIMELAPSE_FPS = 30 # Frame rate of the assembled timelapse video
+TIMELAPSE_MIN_FRAMES = 10 # Prints with fewer frames don't get a timelapse
+TIMELAPSE_UPLOAD_PATH = "/api/v1/octo/timelapse/" # Server endpoint receiving the assembled timelapse
+TIMELAPSE_UPLOAD_TIMEOUT_SECONDS = 600 # Upload of one timelapse video
+AGENT_NAME = "octoprint_obico" # Agent reported to the server in the status settings; the integration speaks the OctoPrint agent protocol
+AGENT_VERSION = "2.5.2"
+DEVICE_TYPES = {"Bambu Lab": "bambu_lab", "Moonraker": "moonraker"} # Config flow display name -> internal device type
+OUTBOUND_MAX_EVENTS = 100 # Max queued event messages while the server connection is down
+HTTP_LIMIT_PER_HOST = 8 # Max concurrent connections to one Obico server, shared by all entries using it
+HTTP_KEEPALIVE_SECONDS = 60.0 # How long idle connections to the Obico server are kept open for reuse
+HTTP_DNS_CACHE_SECONDS = 300 # How long resolved server addresses are cached
+HTTP_TIMEOUT_SECONDS = 30.0 # Default total timeout of REST calls to the Obico server
+HTTP_CONNECT_TIMEOUT_SECONDS = 10.0
+SNAPSHOT_INTERVAL_FIRST_LAYERS = 5.0 # Webcam snapshot interval while printing the first layers
+SNAPSHOT_FIRST_LAYERS = 3 # Number of layers that count as "first layers"
+SNAPSHOT_INTERVAL_IDLE = 120.0 # Webcam snapshot interval while the printer is idle; while printing POST_PIC_INTERVAL_SECONDS applies, while offline snapshots are suspended
+SNAPSHOT_INTERVAL_VIEWING = 2.0 # Webcam snapshot interval while the server asks for a viewing boost
+SNAPSHOT_VIEWING_BOOST_SECONDS = 60.0 # A viewing boost lapses if the server does not renew it within this time
+SNAPSHOT_MIN_GAP_SECONDS = 1.0 # Minimum time between two snapshots, also for layer-change triggers
+CONF_SNAPSHOT_CHANGE_THRESHOLD = "snapshot_change_threshold"
+SNAPSHOT_CHANGE_THRESHOLD = 0.02 # Skip uploading a webcam frame whose mean pixel difference from the last uploaded one is below this fraction (0 uploads every frame)
+SNAPSHOT_MAX_STALENESS_SECONDS = 300.0 # Upload a frame at least this often even if nothing changed
+SNAPSHOT_SIGNATURE_SIZE = 32 # Frames are compared as SIZExSIZE grayscale thumbnails
+CONF_SNAPSHOT_MAX_DIMENSION = "snapshot_max_dimension"
+CONF_SNAPSHOT_QUALITY = "snapshot_quality"
+CONF_SNAPSHOT_MAX_BYTES = "snapshot_max_bytes"
+CONF_WEBCAM_FLIP_H = "webcam_flip_h"
+CONF_WEBCAM_FLIP_V = "webcam_flip_v"
+CONF_WEBCAM_ROTATION = "webcam_rotation"
+SNAPSHOT_MAX_DIMENSION = 1280 # Webcam frames larger than this (in pixels, either side) are downsized before upload; 0 keeps the original size
+SNAPSHOT_QUALITY = 80 # JPEG quality used when a webcam frame is re-encoded
+SNAPSHOT_MIN_QUALITY = 40 # Lowest JPEG quality tried to fit a frame into the byte budget
+SNAPSHOT_MAX_BYTES = 0 # Byte budget of an uploaded webcam frame; 0 means no budget
+IMAGE_PROCESSING_WORKERS = 2 # Threads decoding and re-encoding webcam frames, shared by all entries
+SNAPSHOT_CAPTURE_TIMEOUT_SECONDS = 10 # Timeout of capturing a frame from the Home Assistant camera
+SNAPSHOT_CAPTURE_WIDTH = None # Optional width hint passed to the camera when capturing; cameras that support it scale at the source
+SNAPSHOT_CAPTURE_HEIGHT = None # Optional height hint passed to the camera when capturing
+CONF_SNAPSHOT_FRAME_FRESHNESS = "snapshot_frame_freshness"
+SNAPSHOT_FRAME_FRESHNESS_SECONDS = 2.0 # A cached webcam frame younger than this is served to the camera entity and uploads without capturing again
+SNAPSHOT_SLOT_TOLERANCE_SECONDS = 0.5 # Webcams of a printer due within this much of each other are captured in the same cycle
+CONF_NOZZLE_CAMERA = "nozzle_camera_entity_id"
+CONF_EXTRA_CAMERAS = "extra_camera_entity_ids"
+CONF_EXTRA_CAMERA_INTERVAL_FACTOR = "extra_camera_interval_factor"
+EXTRA_CAMERA_INTERVAL_FACTOR = 1.0 # Snapshot interval of the nozzle and extra cameras relative to the primary camera's
+WEBCAM_ROLE_PRIMARY = "primary" # Camera the server runs failure detection and timelapses on
+WEBCAM_ROLE_NOZZLE = "nozzle" # Close-up camera of the nozzle
+WEBCAM_ROLE_SECONDARY = "secondary" # Any other camera of the printer
+FLEET_MAX_CONCURRENT_CAPTURES = 4 # Webcam captures and uploads running at the same time, across all printers
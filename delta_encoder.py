@@ -0,0 +1,49 @@
+import logging
+from .const import STATUS_FULL_SNAPSHOT_EVERY
+
+_LOGGER = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class DeltaEncoder:
+    """Encodes successive status payloads as changed leaves against the last acknowledged payload."""
+
+    def __init__(self, full_snapshot_every=STATUS_FULL_SNAPSHOT_EVERY):
+        self.full_snapshot_every = full_snapshot_every
+        self.reset()
+
+    def reset(self):
+        # Called on (re)connect so the first payload on a connection is always a full snapshot
+        self._acked = None
+        self._since_full = 0
+
+    def encode(self, payload):
+        if self._acked is None or self._since_full >= self.full_snapshot_every:
+            return payload, True
+
+        changed, deleted = {}, []
+        self._diff(self._acked, payload, changed, deleted, ())
+        msg = {"delta": changed}
+        if deleted:
+            msg["deleted"] = deleted
+        return msg, False
+
+    def ack(self, payload, is_full):
+        self._acked = payload
+        self._since_full = 0 if is_full else self._since_full + 1
+
+    @classmethod
+    def _diff(cls, old, new, changed, deleted, path):
+        for key, value in new.items():
+            old_value = old.get(key, _MISSING)
+            if old_value is value:
+                continue
+            if isinstance(value, dict) and isinstance(old_value, dict):
+                sub_changed = {}
+                cls._diff(old_value, value, sub_changed, deleted, path + (key,))
+                if sub_changed:
+                    changed[key] = sub_changed
+            elif old_value is _MISSING or old_value != value:
+                changed[key] = value
+        for key in old.keys() - new.keys():
+            deleted.append(list(path + (key,)))
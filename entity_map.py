@@ -0,0 +1,167 @@
+import logging
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+def to_str(value):
+    return value
+
+def to_lower(value):
+    return value.lower()
+
+def to_float(value):
+    return float(value)
+
+def to_int(value):
+    return int(float(value))
+
+def to_seconds_until(value):
+    # Timestamp sensors (e.g. a print ETA) -> whole seconds from now
+    eta = dt_util.parse_datetime(value)
+    if eta is None:
+        raise ValueError(f"Not a timestamp: {value}")
+    return max(int((eta - dt_util.utcnow()).total_seconds()), 0)
+
+# Logical field -> (sensor entity suffix, converter), per device type
+DEVICE_FIELDS = {
+    "moonraker": {
+        "nozzle_temperature": ("extruder_temperature", to_float),
+        "bed_temperature": ("bed_temperature", to_float),
+        "percent_progress": ("progress", to_float),
+        "print_time": ("print_duration", to_float),
+        "print_time_left": ("print_eta", to_str),
+        "current_layer": ("current_layer", to_int),
+        "total_layers": ("total_layer", to_int),
+        "bed_target_temperature": ("bed_target", to_float),
+        "cooling_fan_speed": ("fan_speed", to_float),
+        "current_stage": ("current_print_state", to_str),
+        "gcode_filename": ("filename", to_str),
+        "print_status": ("printer_state", to_str),
+        "remaining_time": ("print_eta", to_seconds_until),
+        "start_time": ("print_duration", to_str),
+    },
+    "bambu_lab": {
+        "bambu_status": ("print_status", to_lower),
+        "percent_progress": ("print_progress", to_float),
+        "current_stage": ("current_stage", to_str),
+        "gcode_filename": ("gcode_filename", to_str),
+        "start_time": ("start_time", to_str),
+        "end_time": ("end_time", to_str),
+        "remaining_time": ("remaining_time", to_int),
+        "cooling_fan_speed": ("cooling_fan_speed", to_float),
+        "percent_print_progress": ("print_progress", to_float),
+        "nozzle_temperature": ("nozzle_temperature", to_float),
+        "nozzle_target_temperature": ("nozzle_target_temperature", to_float),
+        "bed_temperature": ("bed_temperature", to_float),
+        "bed_target_temperature": ("bed_target_temperature", to_float),
+        "current_layer": ("current_layer", to_int),
+        "total_layers": ("total_layer_count", to_int),
+    },
+}
+
+class EntityMap:
+    """Resolves a printer device's logical status fields to concrete entity ids, once per registry change."""
+
+    def __init__(self, hass, device_id, device_type, domain="sensor", fields=None, suffixes=None):
+        self.hass = hass
+        self.device_id = device_id
+        self.domain = domain
+        # fields: field -> (entity suffix, converter) for entities whose state is read;
+        # suffixes: field -> entity suffix for entities that are only acted on, such as buttons
+        if suffixes is not None:
+            self.fields = {}
+            self.suffixes = suffixes
+        else:
+            self.fields = fields if fields is not None else DEVICE_FIELDS.get(device_type, {})
+            self.suffixes = {field: suffix for field, (suffix, _) in self.fields.items()}
+        self._resolved = None  # list of (field, entity_id, converter)
+        self._listeners = []
+        self._unsubs = []
+
+    @callback
+    def async_start(self):
+        self._unsubs = [
+            self.hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, self._on_registry_updated),
+            self.hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, self._on_registry_updated),
+        ]
+
+    @callback
+    def async_stop(self):
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    @callback
+    def async_add_listener(self, listener):
+        # listener() is called after the entity ids were re-resolved
+        self._listeners.append(listener)
+
+    def _is_relevant(self, event):
+        # Registry updates happen all over Home Assistant; only those touching this device or its entities matter
+        if event.event_type == dr.EVENT_DEVICE_REGISTRY_UPDATED:
+            return event.data.get("device_id") == self.device_id
+        entity_ids = {event.data.get("entity_id"), event.data.get("old_entity_id")}
+        if self._resolved is not None and any(entity_id in entity_ids for _, entity_id, _ in self._resolved):
+            return True
+        if (event.data.get("changes") or {}).get("device_id") == self.device_id:
+            return True  # moved off this device
+        entry = er.async_get(self.hass).async_get(event.data.get("entity_id"))
+        return entry is not None and entry.device_id == self.device_id and entry.domain == self.domain
+
+    @callback
+    def _on_registry_updated(self, event):
+        if not self._is_relevant(event):
+            return
+        old_entity_ids = self.entity_ids() if self._resolved is not None else None
+        self._resolved = None
+        if self.entity_ids() != old_entity_ids:
+            _LOGGER.debug(f"Entities for device {self.device_id} changed, re-resolved")
+            for listener in self._listeners:
+                listener()
+
+    def _resolve(self):
+        by_suffix = {}
+        entity_registry = er.async_get(self.hass)
+        if dr.async_get(self.hass).async_get(self.device_id) is not None:
+            entries = [entry for entry in er.async_entries_for_device(entity_registry, self.device_id) if entry.domain == self.domain]
+            for suffix in self.suffixes.values():
+                if suffix in by_suffix:
+                    continue
+                candidates = [entry.entity_id for entry in entries if entry.translation_key == suffix]
+                if not candidates:
+                    # Shortest match wins so that e.g. "_progress" does not pick up "_print_progress"
+                    candidates = sorted((entry.entity_id for entry in entries if entry.entity_id.endswith(f"_{suffix}")), key=len)
+                if candidates:
+                    by_suffix[suffix] = candidates[0]
+
+        resolved = []
+        for field, suffix in self.suffixes.items():
+            # Fall back to the legacy "<domain>.<printer_device_id>_<suffix>" naming for devices missing from the registry
+            entity_id = by_suffix.get(suffix, f"{self.domain}.{self.device_id}_{suffix}")
+            converter = self.fields[field][1] if field in self.fields else None
+            resolved.append((field, entity_id, converter))
+        return resolved
+
+    def entity_ids(self):
+        if self._resolved is None:
+            self._resolved = self._resolve()
+        return sorted({entity_id for _, entity_id, _ in self._resolved})
+
+    def entity_id(self, field):
+        if self._resolved is None:
+            self._resolved = self._resolve()
+        for name, entity_id, _ in self._resolved:
+            if name == field:
+                return entity_id
+        return None
+
+    def fields_by_entity(self):
+        # entity_id -> [(field, converter)]; one sensor can feed several fields
+        if self._resolved is None:
+            self._resolved = self._resolve()
+        by_entity = {}
+        for field, entity_id, converter in self._resolved:
+            by_entity.setdefault(entity_id, []).append((field, converter))
+        return by_entity
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+from .const import DOMAIN, IMAGE_PROCESSING_WORKERS, FLEET_MAX_CONCURRENT_CAPTURES
+from .http_client import create_session
+
+_LOGGER = logging.getLogger(__name__)
+
+class _PooledSession:
+    __slots__ = ("session", "refs")
+
+    def __init__(self, session):
+        self.session = session
+        self.refs = 0
+
+class FleetManager:
+    """Resources shared by every printer (config entry) on this Home Assistant instance.
+
+    Printers keep their own small state in ObicoComponent; the connection pools, the image worker threads and the
+    capture concurrency limit live here, and per-printer schedules are staggered across their interval.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.components = {}  # entry_id -> ObicoComponent
+        self.capture_slots = asyncio.Semaphore(FLEET_MAX_CONCURRENT_CAPTURES)
+        self._sessions = {}
+        self._image_executor = None
+        self._unsub_stop = hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._on_hass_stop)
+
+    @callback
+    def add_component(self, entry_id, component):
+        self.components[entry_id] = component
+
+    @callback
+    def remove_component(self, entry_id):
+        return self.components.pop(entry_id, None)
+
+    def phase(self, entry_id):
+        # Fraction of an interval by which this printer's periodic work is offset, spreading printers evenly
+        ids = sorted(self.components, key=lambda other: zlib.crc32(other.encode()))
+        if entry_id not in ids or len(ids) < 2:
+            return 0.0
+        return ids.index(entry_id) / len(ids)
+
+    def acquire_session(self, endpoint_prefix):
+        # One keep-alive connection pool per Obico server, shared by every printer that talks to it
+        pooled = self._sessions.get(endpoint_prefix)
+        if pooled is None or pooled.session.closed:
+            _LOGGER.debug(f"Creating HTTP session for {endpoint_prefix}")
+            pooled = self._sessions[endpoint_prefix] = _PooledSession(create_session())
+        pooled.refs += 1
+        return pooled.session
+
+    async def release_session(self, endpoint_prefix):
+        pooled = self._sessions.get(endpoint_prefix)
+        if pooled is None:
+            return
+        pooled.refs -= 1
+        if pooled.refs <= 0:
+            _LOGGER.debug(f"Closing HTTP session for {endpoint_prefix}")
+            del self._sessions[endpoint_prefix]
+            await pooled.session.close()
+
+    @property
+    def image_executor(self):
+        # Bounded pool so that image work never runs on the event loop and can't starve Home Assistant's default executor
+        if self._image_executor is None:
+            self._image_executor = ThreadPoolExecutor(max_workers=IMAGE_PROCESSING_WORKERS, thread_name_prefix="obico_image")
+        return self._image_executor
+
+    async def async_shutdown(self):
+        if self._unsub_stop:
+            self._unsub_stop()
+            self._unsub_stop = None
+        for pooled in self._sessions.values():
+            await pooled.session.close()
+        self._sessions.clear()
+        self._shutdown_executor()
+
+    @callback
+    def _on_hass_stop(self, event):
+        self._unsub_stop = None
+        self._shutdown_executor()
+
+    def _shutdown_executor(self):
+        if self._image_executor is not None:
+            self._image_executor.shutdown(wait=False, cancel_futures=True)
+            self._image_executor = None
+
+@callback
+def async_get_fleet(hass):
+    fleet = hass.data.get(DOMAIN)
+    if fleet is None:
+        fleet = hass.data[DOMAIN] = FleetManager(hass)
+    return fleet
@@ -0,0 +1,47 @@
+import asyncio
+import time
+from .const import SNAPSHOT_FRAME_FRESHNESS_SECONDS
+
+class Frame:
+    """An immutable processed webcam frame; its bytes are handed to every consumer as-is, never copied."""
+    __slots__ = ("content", "digest", "source_digest", "ts")
+
+    def __init__(self, content, digest, source_digest, ts=None):
+        self.content = content
+        self.digest = digest  # of content; identifies the frame, e.g. for change detection
+        self.source_digest = digest if source_digest is None else source_digest  # of the captured frame before processing
+        self.ts = time.time() if ts is None else ts
+
+class FrameCache:
+    """Latest processed frame of one printer's camera, shared by the Obico uploads and the Home Assistant camera entity.
+
+    A frame younger than the freshness window is served without capturing; concurrent requests for a newer one share one capture.
+    """
+
+    def __init__(self, freshness_seconds=SNAPSHOT_FRAME_FRESHNESS_SECONDS):
+        self.freshness_seconds = freshness_seconds
+        self.latest = None
+        self._capturing = None
+
+    def fresh(self, max_age=None):
+        frame = self.latest
+        max_age = self.freshness_seconds if max_age is None else max_age
+        if frame is not None and time.time() - frame.ts <= max_age:
+            return frame
+        return None
+
+    async def async_get(self, capture, max_age=None):
+        # capture(previous_frame) is a coroutine returning the new Frame
+        frame = self.fresh(max_age)
+        if frame is not None:
+            return frame
+        if self._capturing is None:
+            self._capturing = asyncio.get_running_loop().create_task(self._async_capture(capture))
+        return await asyncio.shield(self._capturing)  # a cancelled consumer doesn't cancel the capture others wait for
+
+    async def _async_capture(self, capture):
+        try:
+            self.latest = await capture(self.latest)
+            return self.latest
+        finally:
+            self._capturing = None
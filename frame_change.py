@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+import io
+import logging
+import time
+from .const import SNAPSHOT_CHANGE_THRESHOLD, SNAPSHOT_MAX_STALENESS_SECONDS, SNAPSHOT_SIGNATURE_SIZE
+from .fleet import async_get_fleet
+
+_LOGGER = logging.getLogger(__name__)
+
+class FrameSignature:
+    __slots__ = ("digest", "thumbnail")
+
+    def __init__(self, digest, thumbnail):
+        self.digest = digest
+        self.thumbnail = thumbnail  # SIZE*SIZE grayscale bytes, or None if the frame could not be decoded
+
+def frame_digest(jpeg):
+    return hashlib.blake2b(jpeg, digest_size=16).digest()
+
+def frame_signature(jpeg, digest, size=SNAPSHOT_SIGNATURE_SIZE):
+    # Blocking: decodes the JPEG, run it in an executor
+    try:
+        from PIL import Image
+    except ImportError:
+        return FrameSignature(digest, None)
+    try:
+        with Image.open(io.BytesIO(jpeg)) as img:
+            img.draft("L", (size * 2, size * 2))  # let the JPEG decoder downscale by DCT, much cheaper than a full decode
+            thumbnail = img.convert("L").resize((size, size)).tobytes()
+    except Exception as e:
+        _LOGGER.debug(f"Unable to decode frame for change detection: {e}")
+        thumbnail = None
+    return FrameSignature(digest, thumbnail)
+
+def frame_difference(a, b):
+    # Mean absolute pixel difference of two thumbnails, as a fraction of full scale
+    return sum(abs(x - y) for x, y in zip(a, b)) / (255 * len(a))
+
+def _signature_and_difference(jpeg, digest, reference):
+    signature = frame_signature(jpeg, digest)
+    if reference is None or signature.thumbnail is None or len(reference) != len(signature.thumbnail):
+        return signature, None
+    return signature, frame_difference(reference, signature.thumbnail)
+
+class FrameChangeDetector:
+    """Decides whether a captured frame differs enough from the last uploaded one to be worth uploading."""
+
+    def __init__(self, hass, threshold=SNAPSHOT_CHANGE_THRESHOLD, max_staleness_seconds=SNAPSHOT_MAX_STALENESS_SECONDS):
+        self.hass = hass
+        self.threshold = threshold
+        self.max_staleness_seconds = max_staleness_seconds
+        self._last = None
+        self._last_ts = 0
+        self.frames_skipped = 0
+
+    async def async_check(self, jpeg, digest=None):
+        # Returns (should_upload, signature); pass the signature to accept() once the frame was uploaded
+        if not self.threshold:
+            return True, None
+        stale = time.time() - self._last_ts >= self.max_staleness_seconds
+        digest = digest or frame_digest(jpeg)
+        if self._last is not None and not stale and digest == self._last.digest:
+            self.frames_skipped += 1
+            return False, None  # byte-identical, no need to decode
+
+        reference = self._last.thumbnail if self._last is not None and not stale else None
+        signature, difference = await asyncio.get_running_loop().run_in_executor(
+            async_get_fleet(self.hass).image_executor, _signature_and_difference, jpeg, digest, reference)
+        if difference is None:
+            return True, signature
+        if difference < self.threshold:
+            self.frames_skipped += 1
+            _LOGGER.debug(f"Frame difference {difference:.4f} below threshold {self.threshold}, skipping upload")
+            return False, signature
+        return True, signature
+
+    def accept(self, signature):
+        if signature is not None:
+            self._last = signature
+        self._last_ts = time.time()
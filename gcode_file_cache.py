@@ -0,0 +1,68 @@
+import logging
+import time
+from collections import OrderedDict
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN, GCODE_FILE_CACHE_MAX_ENTRIES, GCODE_FILE_CACHE_TTL_SECONDS, GCODE_FILE_CACHE_SAVE_DELAY_SECONDS
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+class GCodeFileCache:
+    """On-disk LRU of G-code file -> server file id and metadata, so reprints skip the g_code_files round trip."""
+
+    def __init__(self, hass, entry_id, max_entries=GCODE_FILE_CACHE_MAX_ENTRIES, ttl_seconds=GCODE_FILE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.g_code_files")
+        self._entries = OrderedDict()  # key -> {"id", "metadata", "used"}, least recently used first
+
+    @staticmethod
+    def key(filename):
+        # Known as soon as the print starts; the sensors expose neither size nor hash, and the layer count often arrives later
+        return filename
+
+    async def async_load(self):
+        data = await self._store.async_load() or {}
+        now = time.time()
+        entries = sorted(data.get("entries", {}).items(), key=lambda item: item[1].get("used", 0))
+        self._entries = OrderedDict((key, entry) for key, entry in entries if now - entry.get("used", 0) < self.ttl_seconds)
+        self._evict()
+        _LOGGER.debug(f"Loaded {len(self._entries)} cached G-code files")
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if now - entry["used"] >= self.ttl_seconds:
+            del self._entries[key]
+            self._schedule_save()
+            return None
+        entry["used"] = now
+        self._entries.move_to_end(key)
+        self._schedule_save()
+        return entry
+
+    def put(self, key, file_id, metadata=None):
+        self._entries[key] = {"id": file_id, "metadata": metadata or {}, "used": time.time()}
+        self._entries.move_to_end(key)
+        self._evict()
+        self._schedule_save()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @callback
+    def _schedule_save(self):
+        # Coalesces the writes of a burst of lookups into one; HA flushes pending saves on shutdown
+        self._store.async_delay_save(self._data_to_save, GCODE_FILE_CACHE_SAVE_DELAY_SECONDS)
+
+    @callback
+    def _data_to_save(self):
+        return {"entries": dict(self._entries)}
+
+    async def async_remove(self):
+        await self._store.async_remove()
@@ -0,0 +1,114 @@
+import math
+import time
+from array import array
+from homeassistant.core import callback
+from .const import HISTORY_CAPACITY, HISTORY_BUCKETS
+
+# Snapshot field -> history channel
+CHANNELS = {
+    "nozzle_temperature": "tool0",
+    "bed_temperature": "bed",
+    "cooling_fan_speed": "fan",
+    "percent_progress": "progress",
+}
+
+class RingBuffer:
+    """Fixed-capacity (timestamp, value) samples in two preallocated float arrays; the oldest sample is overwritten."""
+    __slots__ = ("capacity", "times", "values", "start", "size")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+
+    def append(self, ts, value):
+        i = (self.start + self.size) % self.capacity
+        self.times[i] = ts
+        self.values[i] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def _first_at_or_after(self, ts):
+        # Binary search over the logical (chronological) order
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[(self.start + mid) % self.capacity] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def downsample(self, since, until, buckets):
+        """min/max/mean per bucket over [since, until); a bucket without samples holds the previous value."""
+        step = (until - since) / buckets
+        mins, maxs, means = [None] * buckets, [None] * buckets, [None] * buckets
+        first = self._first_at_or_after(since)
+        held = self.values[(self.start + first - 1) % self.capacity] if first > 0 else None
+
+        pos = first
+        for b in range(buckets):
+            bucket_end = since + step * (b + 1)
+            # The value held from before the bucket was in effect during its start, so it counts towards min/max
+            lo = hi = held if held == held else None
+            total, count = 0.0, 0
+            while pos < self.size:
+                i = (self.start + pos) % self.capacity
+                if self.times[i] >= bucket_end:
+                    break
+                held = value = self.values[i]
+                pos += 1
+                if value != value:  # NaN: sensor unavailable
+                    continue
+                lo = value if lo is None else min(lo, value)
+                hi = value if hi is None else max(hi, value)
+                total += value
+                count += 1
+            if count:
+                mins[b], maxs[b], means[b] = lo, hi, round(total / count, 2)
+            elif held is not None and held == held:
+                mins[b] = maxs[b] = means[b] = held
+        return mins, maxs, means
+
+class PrinterHistory:
+    """High-rate samples of a printer's temperatures, fan and progress, taken from every state change."""
+
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self.buffers = {channel: RingBuffer(capacity) for channel in CHANNELS.values()}
+
+    @callback
+    def async_start(self, snapshot):
+        self.snapshot = snapshot
+        snapshot.async_add_listener(self._on_snapshot_changed)
+
+    @callback
+    def _on_snapshot_changed(self, changed_fields):
+        now = time.time()
+        for field in changed_fields:
+            channel = CHANNELS.get(field)
+            if channel is None:
+                continue
+            value = getattr(self.snapshot, field)
+            self.buffers[channel].append(now, math.nan if value is None else value)
+
+    def series(self, since, until=None, buckets=HISTORY_BUCKETS):
+        """Compact downsampled series of every channel over [since, until), or None if nothing was sampled yet."""
+        until = until or time.time()
+        if until <= since:
+            return None
+        series = {}
+        for channel, buffer in self.buffers.items():
+            if not buffer.size:
+                continue
+            mins, maxs, means = buffer.downsample(since, until, buckets)
+            series[channel] = {"min": _clean(mins), "max": _clean(maxs), "mean": means}
+        if not series:
+            return None
+        return {"since": int(since), "step": round((until - since) / buckets, 3), **series}
+
+def _clean(values):
+    return [None if value is None else round(value, 2) for value in values]
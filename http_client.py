@@ -0,0 +1,15 @@
+import logging
+import aiohttp
+from .const import HTTP_LIMIT_PER_HOST, HTTP_KEEPALIVE_SECONDS, HTTP_DNS_CACHE_SECONDS, HTTP_TIMEOUT_SECONDS, HTTP_CONNECT_TIMEOUT_SECONDS
+
+_LOGGER = logging.getLogger(__name__)
+
+def create_session():
+    connector = aiohttp.TCPConnector(
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+        enable_cleanup_closed=True,
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
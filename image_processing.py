@@ -0,0 +1,69 @@
+import asyncio
+import io
+import logging
+from .const import SNAPSHOT_MAX_DIMENSION, SNAPSHOT_QUALITY, SNAPSHOT_MIN_QUALITY, SNAPSHOT_MAX_BYTES
+from .fleet import async_get_fleet
+
+_LOGGER = logging.getLogger(__name__)
+
+class FrameProcessingSettings:
+    __slots__ = ("max_dimension", "quality", "max_bytes", "flip_h", "flip_v", "rotation")
+
+    def __init__(self, max_dimension=SNAPSHOT_MAX_DIMENSION, quality=SNAPSHOT_QUALITY, max_bytes=SNAPSHOT_MAX_BYTES, flip_h=False, flip_v=False, rotation=0):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.flip_h = flip_h
+        self.flip_v = flip_v
+        self.rotation = rotation % 360  # degrees clockwise
+
+    def transforms(self):
+        return self.flip_h or self.flip_v or self.rotation
+
+def process_jpeg(jpeg, settings):
+    # Blocking: decodes and re-encodes the frame, run it in the image executor
+    try:
+        from PIL import Image
+    except ImportError:
+        return jpeg
+
+    with Image.open(io.BytesIO(jpeg)) as img:
+        max_dimension = settings.max_dimension
+        oversized = max_dimension and max(img.size) > max_dimension
+        over_budget = settings.max_bytes and len(jpeg) > settings.max_bytes
+        if not (oversized or over_budget or settings.transforms()):
+            return jpeg  # nothing to do, avoid a lossy re-encode
+
+        if oversized:
+            img.draft("RGB", (max_dimension, max_dimension))  # DCT-domain downscale, then finish with a real resize
+        frame = img.convert("RGB")
+    if oversized:
+        frame.thumbnail((max_dimension, max_dimension), Image.BILINEAR)
+    if settings.flip_h:
+        frame = frame.transpose(Image.FLIP_LEFT_RIGHT)
+    if settings.flip_v:
+        frame = frame.transpose(Image.FLIP_TOP_BOTTOM)
+    if settings.rotation:
+        frame = frame.transpose({90: Image.ROTATE_270, 180: Image.ROTATE_180, 270: Image.ROTATE_90}[settings.rotation])
+
+    quality = settings.quality
+    while True:
+        out = io.BytesIO()
+        frame.save(out, format="JPEG", quality=quality, optimize=False)
+        if not settings.max_bytes or out.tell() <= settings.max_bytes or quality <= SNAPSHOT_MIN_QUALITY:
+            return out.getvalue()
+        quality = max(quality - 10, SNAPSHOT_MIN_QUALITY)
+
+class FrameProcessor:
+    """Downsizes, re-encodes and orients webcam frames off the event loop."""
+
+    def __init__(self, hass, settings):
+        self.hass = hass
+        self.settings = settings
+
+    async def async_process(self, jpeg):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(async_get_fleet(self.hass).image_executor, process_jpeg, jpeg, self.settings)
+        except Exception as e:
+            _LOGGER.warning(f"Unable to process webcam frame, uploading it unchanged: {e}")
+            return jpeg
@@ -1,88 +1,198 @@
+import asyncio
 import logging
-import threading
+import math
 import time
 import aiohttp
-import backoff
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
 from .utils import server_request
-from .lib.error_stats import error_stats
-from .const import POST_PIC_INTERVAL_SECONDS
+from .const import (
+    POST_PIC_INTERVAL_SECONDS, SNAPSHOT_INTERVAL_FIRST_LAYERS, SNAPSHOT_FIRST_LAYERS, SNAPSHOT_INTERVAL_IDLE,
+    SNAPSHOT_INTERVAL_VIEWING, SNAPSHOT_VIEWING_BOOST_SECONDS, SNAPSHOT_MIN_GAP_SECONDS, SNAPSHOT_SLOT_TOLERANCE_SECONDS,
+)
 
 
 _logger = logging.getLogger(__name__)
 
 class JpegPoster:
 
-    def __init__(self, hass, camera_entity_id, plugin):
+    def __init__(self, hass, webcams, plugin):
         self.hass = hass
-        self.camera_entity_id = camera_entity_id
+        self.webcams = webcams  # primary first
         self.plugin = plugin
-        self.last_jpg_post_ts = 0
-
-    async def capture_jpeg(self):
-        camera = self.hass.states.get(self.camera_entity_id)
-        if camera is None:
-            raise Exception(f"Camera entity {self.camera_entity_id} not found")
-
-        url = camera.attributes.get("entity_picture")
-        if url is None:
-            raise Exception(f"Camera entity {self.camera_entity_id} does not have an entity_picture attribute")
-
-        # Prepend the base URL of your Home Assistant instance
-        base_url = self.hass.config.external_url or self.hass.config.internal_url
-        if not base_url:
-            raise Exception("Base URL for Home Assistant is not set")
-        full_url = f"{base_url}{url}"
-
-        _logger.debug(f"Capturing JPEG from URL: {full_url}")
-
-        session = async_get_clientsession(self.hass)
-        async with session.get(full_url) as response:
-            _logger.debug(f"Response status: {response.status}")
-            if response.status != 200:
-                _logger.error(f"Failed to capture jpeg - HTTP status code: {response.status}")
-                raise Exception(f"Failed to capture jpeg - HTTP status code: {response.status}")
-            response.raise_for_status()
-            return await response.read()
-
-    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
-    @backoff.on_predicate(backoff.expo, max_tries=3)
-    async def post_pic_to_server(self):
+        self.viewing_boost_until = 0
+        self._capture_requested = False
+        self._wakeup = asyncio.Event()
+        self._loop_task = None
+        self._unsub_state = None
+        self._layer_entity_id = None
+        self._post_with_retries = None
+
+    @property
+    def primary(self):
+        return self.webcams[0]
+
+    async def post_pic_to_server(self, webcam=None):
+        if self._post_with_retries is None:
+            import backoff  # deferred until the first snapshot, keeps it off the integration's import path
+            self._post_with_retries = backoff.on_exception(backoff.expo, Exception, max_tries=3)(
+                backoff.on_predicate(backoff.expo, max_tries=3)(self._post_pic_to_server)
+            )
+        return await self._post_with_retries(webcam or self.primary)
+
+    async def _post_pic_to_server(self, webcam):
+        # One capture slot per attempt, so that a camera backing off between retries doesn't hold up the others
+        async with self.plugin.fleet.capture_slots:  # bounded across all cameras of all printers
+            return await self._capture_and_upload(webcam)
+
+    async def _capture_and_upload(self, webcam):
+        metrics = self.plugin.metrics
         try:
-            error_stats.attempt('webcam')
-            jpeg_data = await self.capture_jpeg()
-            data = aiohttp.FormData()
-            data.add_field('pic', jpeg_data, filename='image.jpg', content_type='image/jpeg')
-            data.add_field('viewing_boost', 'true') # optional?
+            metrics.attempt('webcam')
+            # A frame a dashboard just pulled is reused, as long as it's recent enough not to stand in for a whole interval
+            interval = (self.current_interval() or SNAPSHOT_MIN_GAP_SECONDS) * webcam.interval_factor
+            frame = await webcam.async_frame(min(webcam.frame_cache.freshness_seconds, interval / 2))
         except Exception as e:
-            error_stats.add_connection_error('webcam', self.plugin)
-            _logger.error(f'Failed to capture jpeg - {e}')
+            metrics.error('webcam')
+            _logger.error(f'Failed to capture jpeg from {webcam.entity_id} - {e}')
             return
 
+        jpeg_data = frame.content
+        should_upload, signature = await webcam.change_detector.async_check(jpeg_data, frame.digest)
+        if not should_upload:
+            return True  # unchanged frame; counts as done so that backoff doesn't retry it
+
+        if webcam.is_primary and self.plugin.timelapse:
+            self.hass.async_create_task(self.plugin.timelapse.async_add_frame(jpeg_data))
+        data = aiohttp.FormData()
+        data.add_field('pic', jpeg_data, filename='image.jpg', content_type='image/jpeg')
+        data.add_field('viewing_boost', 'true' if self.viewing_boost_until > time.time() else 'false')
+        # Tagged with the webcam's name and flags from settings.webcams, so the server can tell the cameras apart
+        data.add_field('camera_name', webcam.entity_id)
+        data.add_field('is_primary_camera', 'true' if webcam.is_primary else 'false')
+        data.add_field('is_nozzle_camera', 'true' if webcam.is_nozzle else 'false')
+
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = self.plugin.auth_headers()
-                async with session.post(
-                    f"{self.plugin.endpoint_prefix}/api/v1/octo/pic/",
-                    data=data,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=60)
-                ) as resp:
-                    _logger.warning(f'Jpeg posted to server - {resp.status}')
-                    resp.raise_for_status()
+            headers = self.plugin.auth_headers()
+            upload_started = time.time()
+            async with self.plugin.http_session.post(
+                f"{self.plugin.endpoint_prefix}/api/v1/octo/pic/",
+                data=data,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=60)
+            ) as resp:
+                _logger.debug(f'Jpeg posted to server - {resp.status}')
+                resp.raise_for_status()
+                metrics.pic_uploaded(len(jpeg_data), upload_started)
+                webcam.change_detector.accept(signature)
+                return True
         except aiohttp.ClientResponseError as e:
+            metrics.error('webcam')
             _logger.error(f'Failed to post jpeg to server - {e.status}, message={e.message}, url={e.request_info.url}, error={e}')
         except Exception as e:
+            metrics.error('webcam')
             _logger.error(f'Failed to post jpeg to server - {e}')
 
+    def start(self):
+        self._track_printer_entities()
+        if self._loop_task is None:
+            self._loop_task = asyncio.get_running_loop().create_task(self.pic_post_loop())
+
+    async def stop(self):
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+
+    def on_printer_entities_changed(self):
+        if self._loop_task is not None:
+            self._track_printer_entities()
+
+    def _track_printer_entities(self):
+        if self._unsub_state:
+            self._unsub_state()
+        self._layer_entity_id = self.plugin.entity_map.entity_id("current_layer")
+        self._unsub_state = async_track_state_change_event(self.hass, self.plugin.print_activity_entity_ids(), self._on_printer_state_change)
+
+    @callback
+    def _on_printer_state_change(self, event):
+        new_state, old_state = event.data.get("new_state"), event.data.get("old_state")
+        if event.data["entity_id"] == self._layer_entity_id and new_state and old_state and new_state.state != old_state.state:
+            self._capture_requested = True  # extra capture on layer change
+        self._wakeup.set()  # print state changed: re-evaluate the interval
+
+    def set_viewing_boost(self, viewing):
+        was_boosting = self.viewing_boost_until > time.time()
+        self.viewing_boost_until = time.time() + SNAPSHOT_VIEWING_BOOST_SECONDS if viewing else 0
+        if viewing and not was_boosting:
+            self._wakeup.set()
+
+    def current_interval(self):
+        # Seconds between snapshots in the printer's current state, or None while snapshots are suspended
+        if self.viewing_boost_until > time.time():
+            return SNAPSHOT_INTERVAL_VIEWING
+        activity = self.plugin.print_activity()
+        if activity == "offline":
+            return None
+        if activity == "printing":
+            current_layer = self.plugin.snapshot.current_layer
+            if current_layer is not None and current_layer <= SNAPSHOT_FIRST_LAYERS:
+                return SNAPSHOT_INTERVAL_FIRST_LAYERS
+            return POST_PIC_INTERVAL_SECONDS
+        return SNAPSHOT_INTERVAL_IDLE
+
+    def _until_next_slot(self, interval_seconds, last_post_ts):
+        # Snapshots land on a per-printer grid offset by the printer's phase, so a fleet spreads its uploads evenly
+        now = time.time()
+        offset = self.plugin.fleet.phase(self.plugin.config_entry.entry_id) * interval_seconds
+        earliest = max(now, last_post_ts + interval_seconds / 2)
+        slot = offset + math.ceil((earliest - offset) / interval_seconds) * interval_seconds
+        return slot - now
+
+    def _due_in(self, webcam, interval_seconds):
+        # Seconds until the webcam's next snapshot, or None while snapshots are suspended
+        since_last = time.time() - webcam.last_post_ts
+        if self._capture_requested and since_last >= SNAPSHOT_MIN_GAP_SECONDS:
+            return 0
+        if interval_seconds is None:
+            return None
+        return max(self._until_next_slot(interval_seconds * webcam.interval_factor, webcam.last_post_ts), SNAPSHOT_MIN_GAP_SECONDS - since_last, 0)
+
     async def pic_post_loop(self):
         while True:
             try:
-                interval_seconds = POST_PIC_INTERVAL_SECONDS
-                if self.last_jpg_post_ts > time.time() - interval_seconds:
-                    continue
+                interval_seconds = self.current_interval()
+                due = {webcam: self._due_in(webcam, interval_seconds) for webcam in self.webcams}
+                pending = [due_in for due_in in due.values() if due_in is not None]
+                due_in = min(pending) if pending else None  # suspended until the printer state changes if None
 
-                self.last_jpg_post_ts = time.time()
-                await self.post_pic_to_server()
+                if due_in is None or due_in > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), due_in)
+                        continue  # woken early: state change, layer change or viewing boost
+                    except asyncio.TimeoutError:
+                        pass
+
+                # Every webcam due about now goes in this cycle, concurrently: the cycle takes as long as the slowest camera
+                ready = [webcam for webcam, webcam_due_in in due.items() if webcam_due_in is not None and webcam_due_in - due_in <= SNAPSHOT_SLOT_TOLERANCE_SECONDS]
+                self._capture_requested = False
+                results = await asyncio.gather(*(self._post_in_slot(webcam) for webcam in ready), return_exceptions=True)
+                for webcam, result in zip(ready, results):
+                    if isinstance(result, Exception):
+                        _logger.error(f"Error posting snapshot of {webcam.entity_id}: {result}")
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                _logger.error(f"Error in pic_post_loop: {e}")
\ No newline at end of file
+                _logger.error(f"Error in pic_post_loop: {e}")
+                await asyncio.sleep(SNAPSHOT_MIN_GAP_SECONDS)
+
+    async def _post_in_slot(self, webcam):
+        webcam.last_post_ts = time.time()
+        await self.post_pic_to_server(webcam)
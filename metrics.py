@@ -0,0 +1,105 @@
+import bisect
+import time
+
+CHANNELS = ("webcam", "ws", "rest")
+UPLOAD_BYTES_BUCKETS = (16_384, 32_768, 65_536, 131_072, 262_144, 524_288, 1_048_576, 2_097_152, 4_194_304)
+UPLOAD_LATENCY_MS_BUCKETS = (50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000)
+COMMAND_LATENCY_MS_BUCKETS = (10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000)
+WS_RTT_MS_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1_600, 5_000)
+
+class Histogram:
+    """Fixed-bucket histogram; observe() only bumps preallocated counters."""
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.total = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile; None above the largest bound
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+    def as_dict(self):
+        labels = [f"le_{bound}" for bound in self.bounds] + ["le_inf"]
+        return dict(zip(labels, self.counts))
+
+class PrinterMetrics:
+    """Per-printer counters read by the diagnostic sensors. Recording never allocates beyond int updates."""
+    __slots__ = ("attempts", "errors", "upload_bytes", "upload_latency_ms", "command_latency_ms", "ws_rtt_ms", "last_ws_rtt_ms", "ws_connects", "last_status_ts", "last_pic_ts", "queue_depth_fn", "queue_stats_fn")
+
+    def __init__(self, queue_depth_fn=None, queue_stats_fn=None):
+        self.attempts = [0] * len(CHANNELS)
+        self.errors = [0] * len(CHANNELS)
+        self.upload_bytes = Histogram(UPLOAD_BYTES_BUCKETS)
+        self.upload_latency_ms = Histogram(UPLOAD_LATENCY_MS_BUCKETS)
+        self.command_latency_ms = Histogram(COMMAND_LATENCY_MS_BUCKETS)
+        self.ws_rtt_ms = Histogram(WS_RTT_MS_BUCKETS)
+        self.last_ws_rtt_ms = None
+        self.ws_connects = 0
+        self.last_status_ts = None
+        self.last_pic_ts = None
+        self.queue_depth_fn = queue_depth_fn
+        self.queue_stats_fn = queue_stats_fn
+
+    def attempt(self, channel):
+        self.attempts[CHANNELS.index(channel)] += 1
+
+    def error(self, channel):
+        self.errors[CHANNELS.index(channel)] += 1
+
+    def attempts_for(self, channel):
+        return self.attempts[CHANNELS.index(channel)]
+
+    def errors_for(self, channel):
+        return self.errors[CHANNELS.index(channel)]
+
+    def pic_uploaded(self, num_bytes, started_at):
+        now = time.time()
+        self.upload_bytes.observe(num_bytes)
+        self.upload_latency_ms.observe((now - started_at) * 1000)
+        self.last_pic_ts = now
+
+    def command_performed(self, received_at):
+        # received_at is time.monotonic() when the server message arrived
+        self.command_latency_ms.observe((time.monotonic() - received_at) * 1000)
+
+    def status_sent(self):
+        self.last_status_ts = time.time()
+
+    def ws_connected(self):
+        self.ws_connects += 1
+
+    def ws_rtt(self, rtt_ms):
+        self.ws_rtt_ms.observe(rtt_ms)
+        self.last_ws_rtt_ms = rtt_ms
+
+    def ws_reconnects(self):
+        return max(self.ws_connects - 1, 0)
+
+    def queue_depth(self):
+        return self.queue_depth_fn() if self.queue_depth_fn else 0
+
+    def queue_stats(self):
+        # Enqueue, coalesce, drop and send counters of the outbound queue
+        return self.queue_stats_fn() if self.queue_stats_fn else {}
+
+    def queue_stat(self, name):
+        return self.queue_stats().get(name, 0)
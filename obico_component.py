@@ -1,97 +1,102 @@
-import logging
 import json
-import requests
-import websocket
-import threading
+import logging
+import sqlite3
 import time
-import datetime
-import bson  # Import bson for binary serialization
-import inspect  # Import inspect for inspecting function arguments
 import asyncio  # Import asyncio for non-blocking sleep
-from .const import POST_STATUS_INTERVAL_SECONDS  # Import the constant
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.start import async_at_started
+from .const import STARTUP_STAGGER_SECONDS, WS_HEARTBEAT_SECONDS, WS_MAX_MISSED_PONGS
+from .const import POST_STATUS_INTERVAL_SECONDS, CONF_STATUS_PUSH_MODE, STATUS_PUSH_MODE_EVENT, STATUS_PUSH_MODE_POLL, CONF_STATUS_DELTA_ENCODING, CONF_WS_SERIALIZER, WS_SERIALIZER_AUTO, DEVICE_TYPES, CONF_SNAPSHOT_CHANGE_THRESHOLD, SNAPSHOT_CHANGE_THRESHOLD
+from .const import CONF_SNAPSHOT_MAX_DIMENSION, CONF_SNAPSHOT_QUALITY, CONF_SNAPSHOT_MAX_BYTES, CONF_WEBCAM_FLIP_H, CONF_WEBCAM_FLIP_V, CONF_WEBCAM_ROTATION
+from .const import SNAPSHOT_MAX_DIMENSION, SNAPSHOT_QUALITY, SNAPSHOT_MAX_BYTES, CONF_SNAPSHOT_FRAME_FRESHNESS, SNAPSHOT_FRAME_FRESHNESS_SECONDS
+from .const import CONF_TIMELAPSE, HISTORY_WINDOW_SECONDS
+from .const import CONF_NOZZLE_CAMERA, CONF_EXTRA_CAMERAS, CONF_EXTRA_CAMERA_INTERVAL_FACTOR, EXTRA_CAMERA_INTERVAL_FACTOR, WEBCAM_ROLE_PRIMARY, WEBCAM_ROLE_NOZZLE, WEBCAM_ROLE_SECONDARY
 from .jpeg_poster import JpegPoster  # Import JpegPoster
+from .image_processing import FrameProcessingSettings
+from .webcam import Webcam
+from .status_push import StatusPusher
+from .delta_encoder import DeltaEncoder
+from .serializers import text_serializer, offered_subprotocols, negotiate
+from .entity_map import EntityMap
+from .snapshot import PrinterSnapshot
+from .print_job_tracker import PrintJobTracker
+from .history import PrinterHistory
+from .ws import WebSocketClient
+from .outbound_queue import OutboundQueue
+from .outbox import EventOutbox
+from .fleet import async_get_fleet
+from .metrics import PrinterMetrics
+from .commands import CommandDispatcher
+from .timelapse import TimelapseRecorder
 
 _LOGGER = logging.getLogger(__name__)
 
-class WebSocketClient:
-    def __init__(self, url, token=None, on_ws_msg=None, on_ws_close=None, on_ws_open=None, subprotocols=None, waitsecs=120):
-        self._mutex = threading.RLock()
-
-        def on_error(ws, error):
-            _LOGGER.warning('Server WS ERROR: {}'.format(error))
-            threading.Thread(target=self.close).start()
-
-        def on_message(ws, msg):
-            if on_ws_msg:
-                on_ws_msg(ws, msg)
-
-        def on_close(ws, close_status_code, close_msg):
-            _LOGGER.warning('WS Closed - {} - {}'.format(close_status_code, close_msg))
-            if on_ws_close:
-                on_ws_close(ws, close_status_code=close_status_code)
-
-        def on_open(ws):
-            _LOGGER.debug('WS Opened')
-            threading.Thread(target=on_ws_open, args=(ws,)).start() if on_ws_open else None
-
-        _LOGGER.debug('Connecting to websocket: {}'.format(url))
-        header = ["authorization: bearer " + token] if token else None
-        self.ws = websocket.WebSocketApp(
-            url,
-            on_message=on_message,
-            on_open=on_open,
-            on_close=on_close,
-            on_error=on_error,
-            header=header,
-            subprotocols=subprotocols
-        )
-
-        run_forever_kwargs = {'reconnect': 0} if 'reconnect' in inspect.getfullargspec(websocket.WebSocketApp.run_forever).args else {}
-        wst = threading.Thread(target=self.ws.run_forever, kwargs=run_forever_kwargs)
-        wst.daemon = True
-        wst.start()
-
-        asyncio.create_task(self.wait_for_connection(waitsecs))
-
-    async def wait_for_connection(self, waitsecs):
-        for i in range(waitsecs * 10):
-            if self.connected():
-                return
-            await asyncio.sleep(0.1)
-        self.ws.close()
-        raise WebSocketConnectionException('Not connected to websocket server after {}s'.format(waitsecs))
-
-    def send(self, data, as_binary=False):
-        with self._mutex:
-            if self.connected():
-                if as_binary:
-                    self.ws.send(data, opcode=websocket.ABNF.OPCODE_BINARY)
-                else:
-                    self.ws.send(data)
-            else:
-                _LOGGER.warning("Attempted to send data, but WebSocket is not connected.")
-
-    def connected(self):
-        return self.ws.sock and self.ws.sock.connected
-
-    def close(self):
-        self.ws.close()
-
-class WebSocketConnectionException(Exception):
-    pass
-
 class ObicoComponent:
     def __init__(self, hass, config_entry):
         self.hass = hass
+        self.config_entry = config_entry  # collaborators below read it, so it's set first
         self.auth_token = config_entry.data["auth_token"]
         self.endpoint_prefix = config_entry.data["endpoint_prefix"]
         self.camera_entity_id = config_entry.data["camera_entity_id"]
         self.printer_device_id = config_entry.data["printer_device_id"]
-        self.device_type = config_entry.data["device_type"]
+        self.device_type = DEVICE_TYPES.get(config_entry.data["device_type"], config_entry.data["device_type"])  # config flow stores the display name
         self.ws_client = None
-        self.jpeg_poster = JpegPoster(hass, self.camera_entity_id, self)
-        self.config_entry = config_entry
-        self.schedule_periodic_status_update()
+        self.fleet = async_get_fleet(hass)
+        self.http_session = self.fleet.acquire_session(self.endpoint_prefix)  # pooled keep-alive connections to the server
+        self.entity_map = EntityMap(hass, self.printer_device_id, self.device_type)
+        webcams = self._create_webcams(hass, config_entry.options)
+        self.snapshot = PrinterSnapshot(hass, self.entity_map, self.device_type, webcams=[webcam.settings() for webcam in webcams])
+        self.print_job_tracker = PrintJobTracker(hass, self)
+        self.history = PrinterHistory()
+        self._history_due = False  # set by heartbeat sends, cleared once a history series went out
+        self.jpeg_poster = JpegPoster(hass, webcams, self)
+        self.status_push_mode = config_entry.options.get(CONF_STATUS_PUSH_MODE, STATUS_PUSH_MODE_EVENT)
+        self.status_pusher = None
+        self.delta_encoder = DeltaEncoder() if config_entry.options.get(CONF_STATUS_DELTA_ENCODING, False) else None
+        self.serializer_preference = config_entry.options.get(CONF_WS_SERIALIZER, WS_SERIALIZER_AUTO)
+        self.serializer = text_serializer()  # replaced per connection once the server has picked a subprotocol
+        self.outbox = EventOutbox(hass, config_entry.entry_id)
+        self.outbound = OutboundQueue(self.send_status_to_server, self.send_ws_msg_to_server, self.wait_for_ws_connection, outbox=self.outbox)
+        self.metrics = PrinterMetrics(queue_depth_fn=self.outbound.depth, queue_stats_fn=self.outbound.stats)
+        self.command_dispatcher = CommandDispatcher(hass, self)
+        self.printer_settings = {}  # from the server's registration response
+        self.timelapse = TimelapseRecorder(hass, self) if config_entry.options.get(CONF_TIMELAPSE, False) else None  # opt-in
+        self._unsub_started = None  # waiting for Home Assistant to start
+        self._unsub_network_start = None  # staggered network start, scheduled once it has
+        self._shutting_down = False
+        self._status_task = None  # poll mode's periodic status update
+
+    def _create_webcams(self, hass, options):
+        # The primary camera comes from the entry's data and has the orientation options; the nozzle and extra cameras are optional
+        def processing_settings(primary):
+            return FrameProcessingSettings(
+                max_dimension=options.get(CONF_SNAPSHOT_MAX_DIMENSION, SNAPSHOT_MAX_DIMENSION),
+                quality=options.get(CONF_SNAPSHOT_QUALITY, SNAPSHOT_QUALITY),
+                max_bytes=options.get(CONF_SNAPSHOT_MAX_BYTES, SNAPSHOT_MAX_BYTES),
+                flip_h=primary and options.get(CONF_WEBCAM_FLIP_H, False),
+                flip_v=primary and options.get(CONF_WEBCAM_FLIP_V, False),
+                rotation=options.get(CONF_WEBCAM_ROTATION, 0) if primary else 0,
+            )
+
+        roles = {self.camera_entity_id: WEBCAM_ROLE_PRIMARY}
+        if options.get(CONF_NOZZLE_CAMERA):
+            roles.setdefault(options[CONF_NOZZLE_CAMERA], WEBCAM_ROLE_NOZZLE)
+        for entity_id in options.get(CONF_EXTRA_CAMERAS, []):
+            roles.setdefault(entity_id, WEBCAM_ROLE_SECONDARY)
+        extra_interval_factor = options.get(CONF_EXTRA_CAMERA_INTERVAL_FACTOR, EXTRA_CAMERA_INTERVAL_FACTOR)
+        return [
+            Webcam(
+                hass,
+                entity_id,
+                role=role,
+                interval_factor=1.0 if role == WEBCAM_ROLE_PRIMARY else extra_interval_factor,
+                change_threshold=options.get(CONF_SNAPSHOT_CHANGE_THRESHOLD, SNAPSHOT_CHANGE_THRESHOLD),
+                processing_settings=processing_settings(role == WEBCAM_ROLE_PRIMARY),
+                frame_freshness=options.get(CONF_SNAPSHOT_FRAME_FRESHNESS, SNAPSHOT_FRAME_FRESHNESS_SECONDS),
+            )
+            for entity_id, role in roles.items()
+        ]
 
     def auth_headers(self):
         return {
@@ -101,309 +106,212 @@ class ObicoComponent:
     def is_configured(self):
         return self.auth_token is not None and self.endpoint_prefix is not None
 
+    async def async_load(self):
+        # State kept on disk between restarts
+        await self.print_job_tracker.file_cache.async_load()
+        try:
+            await self.outbox.async_open()
+        except (sqlite3.Error, OSError) as e:
+            _LOGGER.error(f"Event outbox unavailable, events will only be queued in memory: {e}")
+            self.outbound.outbox = None
+
     def setup(self):
         _LOGGER.debug("Setting up ObicoComponent")
         if self.is_configured():
-            self.establish_ws_connection()
+            self.entity_map.async_start()
+            self.snapshot.async_start()
+            self.print_job_tracker.async_start()
+            self.history.async_start(self.snapshot)
+            self.command_dispatcher.start()
+            # Network activity waits until Home Assistant has started so that it doesn't slow the restart down
+            self._unsub_started = async_at_started(self.hass, self._on_hass_started)
+
+    @callback
+    def _on_hass_started(self, hass):
+        # Runs synchronously inside async_at_started when Home Assistant is already running, so it has its own handle
+        self._unsub_started = None
+        if self._shutting_down:
+            return
+        # Spread the entries' connections over a few seconds instead of opening them all at once
+        delay = self.fleet.phase(self.config_entry.entry_id) * STARTUP_STAGGER_SECONDS
+        self._unsub_network_start = async_call_later(self.hass, delay, self._start_network)
+
+    async def _start_network(self, now):
+        self._unsub_network_start = None
+        if self._shutting_down:
+            return
+        self.establish_ws_connection()
+        self.outbound.start()
+        if self.status_push_mode == STATUS_PUSH_MODE_POLL:
             self.schedule_periodic_status_update()
-            asyncio.create_task(self.jpeg_poster.pic_post_loop())
+        else:
+            self.status_pusher = StatusPusher(self.hass, self, self.entity_map.fields_by_entity())
+            self.status_pusher.start()
+            self.entity_map.async_add_listener(self.on_printer_entities_changed)
+        self.jpeg_poster.start()
+        self.print_job_tracker.async_start_network()
+        await self.register_printer()
+
+    async def register_printer(self):
+        _LOGGER.debug("register_printer called")
+        try:
+            self.metrics.attempt('rest')
+            async with self.http_session.get(f"{self.endpoint_prefix}/api/v1/octo/printer/", headers=self.auth_headers()) as response:
+                response_text = await response.text()
+                _LOGGER.debug(f"Response status: {response.status}")
+                _LOGGER.debug(f"Response text: {response_text}")
+                if response.status != 200:
+                    self.metrics.error('rest')
+                    _LOGGER.error(f"Failed to register printer: {response.status} - {response_text}")
+                else:
+                    _LOGGER.debug(f"Successfully registered printer: {response.status} - {response_text}")
+                    try:
+                        self.printer_settings = json.loads(response_text).get("printer") or {}
+                    except (ValueError, AttributeError):
+                        _LOGGER.warning("Unable to read printer settings from the registration response")
+        except Exception as e:
+            self.metrics.error('rest')
+            _LOGGER.error(f"Error registering printer: {e}")
+
+    async def shutdown(self):
+        self._shutting_down = True
+        for unsub in (self._unsub_started, self._unsub_network_start):
+            if unsub:
+                unsub()
+        self._unsub_started = self._unsub_network_start = None
+        if self.status_pusher:
+            self.status_pusher.stop()
+            self.status_pusher = None
+        if self._status_task:
+            self._status_task.cancel()
+            self._status_task = None
+        self.entity_map.async_stop()
+        self.snapshot.async_stop()
+        self.command_dispatcher.stop()
+        await self.jpeg_poster.stop()
+        if self.timelapse:
+            await self.timelapse.async_stop()
+        await self.outbound.stop()
+        await self.outbox.async_close()
+        if self.ws_client:
+            await self.ws_client.close()
+            self.ws_client = None
+        await self.fleet.release_session(self.endpoint_prefix)
+
+    def on_printer_entities_changed(self):
+        if self.status_pusher:
+            self.status_pusher.set_entities(self.entity_map.fields_by_entity())
+        self.jpeg_poster.on_printer_entities_changed()
+
+    def print_activity(self):
+        # Coarse printer activity that drives the webcam snapshot schedule: "printing", "idle" or "offline"
+        if self.device_type == "bambu_lab":
+            bambu_status = self.snapshot.bambu_status
+            if bambu_status in (None, "offline", "unknown"):
+                return "offline"
+            return "printing" if bambu_status in ("running", "prepare", "slicing") else "idle"
+        if self.device_type == "moonraker":
+            if self.snapshot.print_status in (None, "shutdown"):
+                return "offline"
+            return "printing" if self.snapshot.current_stage == "printing" else "idle"
+        return "idle"
+
+    def print_activity_entity_ids(self):
+        fields = ("bambu_status", "print_status", "current_stage", "current_layer")
+        return [self.entity_map.entity_id(field) for field in fields if field in self.entity_map.fields]
 
     def establish_ws_connection(self):
         ws_url = f"{self.endpoint_prefix.replace('http', 'ws')}/ws/dev/"
         _LOGGER.debug(f"Establishing WebSocket connection to {ws_url}")
         self.ws_client = WebSocketClient(
+            self.http_session,
             url=ws_url,
             token=self.auth_token,
             on_ws_msg=self.process_server_msg,
             on_ws_close=self.on_server_ws_close,
             on_ws_open=self.on_server_ws_open,
+            subprotocols=offered_subprotocols(self.serializer_preference),
+            heartbeat_interval=WS_HEARTBEAT_SECONDS,
+            max_missed_pongs=WS_MAX_MISSED_PONGS,
+            metrics=self.metrics,
         )
+        self.ws_client.start()
 
     def process_server_msg(self, ws, raw_data):
-        msg = json.loads(raw_data)
+        msg = self.command_dispatcher.process_server_msg(raw_data)  # dispatches printer commands before anything else
+        if msg is None:
+            return
         _LOGGER.debug("Received from server: \n{}".format(msg))
-        # Process the message as needed
+        if "remote_status" in msg:
+            self.jpeg_poster.set_viewing_boost(msg["remote_status"].get("viewing", False))
 
     def on_server_ws_close(self, ws, close_status_code):
         _LOGGER.warning('Server WS Closed - {}'.format(close_status_code))
-        self.ws_client = None
+        if self.delta_encoder:
+            self.delta_encoder.reset()
 
-    def on_server_ws_open(self, ws):
+    async def on_server_ws_open(self, ws):
         _LOGGER.debug('Server WS Opened')
-        self.post_update_to_server()
-
-    def post_update_to_server(self, data=None):
-        if not data:
-            data = self.status()
-        self.send_ws_msg_to_server(data)
-
-    def send_ws_msg_to_server(self, data, as_binary=False):
-        if not self.ws_client or not self.ws_client.connected():
-            self.establish_ws_connection()
-        if as_binary:
-            raw = bson.dumps(data)
-            _LOGGER.debug("Sending binary ({} bytes) to server".format(len(raw)))
+        self.serializer = negotiate(self.serializer_preference, ws.protocol)
+        _LOGGER.debug(f"Encoding server messages with {self.serializer.name}")
+        if self.delta_encoder:
+            self.delta_encoder.reset()
+        await self.post_update_to_server()
+
+    async def post_update_to_server(self, data=None, with_history=False):
+        # Queued rather than sent inline: status snapshots coalesce while the connection is down, events keep their order
+        if data:
+            self.outbound.put_event_nowait(data)
         else:
-            _LOGGER.debug("Sending to server: \n{}".format(data))
-            raw = json.dumps(data, default=str)
-        self.ws_client.send(raw, as_binary=as_binary)
-
-    async def fetch_moonraker_data(self):
-        # Fetch data from Moonraker component
-        data = {}
-        try:
-            data["nozzle_temperature"] = self.hass.states.get(f"sensor.{self.printer_device_id}_extruder_temperature").state
-            data["bed_temperature"] = self.hass.states.get(f"sensor.{self.printer_device_id}_bed_temperature").state
-            data["percent_progress"] = self.hass.states.get(f"sensor.{self.printer_device_id}_progress").state   # Bambu sends: "failed", "finish", "idle", "init", "offline", "pause", "prepare", "running", "slicing", "unknown" --> Obico wants: STARTED, ENDED, PAUSED, RESUMED, FAILURE_ALERTED, ALERT_MUTED, ALERT_UNMUTED, FILAMENT_CHANGE, PRINTER_ERROR
-
-
-
-
-            data["print_time"] = self.hass.states.get(f"sensor.{self.printer_device_id}_print_duration").state
-            data["print_time_left"] = self.hass.states.get(f"sensor.{self.printer_device_id}_print_eta").state
-            data["current_layer"] = self.hass.states.get(f"sensor.{self.printer_device_id}_current_layer").state
-            data["total_layers"] = self.hass.states.get(f"sensor.{self.printer_device_id}_total_layer").state
-            data["bed_target_temperature"] = self.hass.states.get(f"sensor.{self.printer_device_id}_bed_target").state
-            data["cooling_fan_speed"] = self.hass.states.get(f"sensor.{self.printer_device_id}_fan_speed").state
-            data["current_stage"] = self.hass.states.get(f"sensor.{self.printer_device_id}_current_print_state").state
-            data["gcode_filename"] = self.hass.states.get(f"sensor.{self.printer_device_id}_filename").state
-            data["print_status"] = self.hass.states.get(f"sensor.{self.printer_device_id}_printer_state").state
-            data["remaining_time"] = self.hass.states.get(f"sensor.{self.printer_device_id}_print_eta").state
-            data["start_time"] = self.hass.states.get(f"sensor.{self.printer_device_id}_print_duration").state
-        except Exception as e:
-            _LOGGER.warning(f"Error fetching Moonraker data: {e}")
-        return data
-
-    async def fetch_bambu_lab_data(self):
-        # Fetch data from Bambu Lab component
-        data = {}
-        try:
-            bambu_status = self.hass.states.get(f"sensor.{self.printer_device_id}_print_status").state.lower()  # Bambu sends: "failed", "finish", "idle", "init", "offline", "pause", "prepare", "running", "slicing", "unknown" --> Obico wants: STARTED, ENDED, PAUSED, RESUMED, FAILURE_ALERTED, ALERT_MUTED, ALERT_UNMUTED, FILAMENT_CHANGE, PRINTER_ERROR
-            status_mapping = {
-                "running": "STARTED",
-                "idle": "ENDED",
-                "failed": "FAILURE_ALERTED",
-                "pause": "PAUSED",
-                "prepare": "STARTED",
-                "finish": "ENDED",
-                "init": "STARTED",
-                "offline": "PRINTER_ERROR",
-                "slicing": "STARTED",
-                "unknown": "PRINTER_ERROR",
-                "none": None
-            }
-            if bambu_status == "none":
-                data["print_status"] = None
-                data["operational"] = None
-                data["printing"] = None
-                data["pausing"] = None
-                data["resuming"] = None
-                data["finishing"] = None
-                data["closedOrError"] = None
-                data["error"] = None
-                data["paused"] = None
-                data["ready"] = None
-                data["sdReady"] = None
-            else:
-                data["print_status"] = status_mapping.get(bambu_status)
-                data["operational"] = bambu_status not in ["offline", "unknown"]
-                data["printing"] = bambu_status in ["running", "prepare", "slicing"]
-                data["pausing"] = bambu_status == "pause"  # might need to find a better way to determine this
-                data["resuming"] = bambu_status == "running"  # might need to find a better way to determine this
-                data["finishing"] = bambu_status == "finish"  # might need to find a better way to determine this
-                data["closedOrError"] = bambu_status in ["failed", "offline", "unknown"]
-                data["error"] = bambu_status == "failed"
-                data["paused"] = bambu_status == "pause"
-                data["ready"] = bambu_status in ["idle", "finish", "init", "slicing"]
-                data["sdReady"] = bambu_status not in ["offline", "unknown"]  # might need to find a better way to determine this
-            data["error"] = {"failed": "Failed", "offline": "Offline", "unknown": "Unknown"}.get(bambu_status)
-            data["percent_progress"] = self.hass.states.get(f"sensor.{self.printer_device_id}_print_progress").state
-            data["current_stage"] = self.hass.states.get(f"sensor.{self.printer_device_id}_current_stage").state
-            data["gcode_filename"] = self.hass.states.get(f"sensor.{self.printer_device_id}_gcode_filename").state
-            data["start_time"] = self.hass.states.get(f"sensor.{self.printer_device_id}_start_time").state  # time stamp
-            data["end_time"] = self.hass.states.get(f"sensor.{self.printer_device_id}_end_time").state  # time stamp
-            data["remaining_time"] = self.hass.states.get(f"sensor.{self.printer_device_id}_remaining_time").state  # minutes
-            try:
-                start_time = datetime.datetime.strptime(data["start_time"], "%Y-%m-%d %H:%M:%S")
-                end_time = datetime.datetime.strptime(data["end_time"], "%Y-%m-%d %H:%M:%S")
-                total_print_time = end_time - start_time
-                data["total_print_time"] = total_print_time
-            except Exception as e:
-                _LOGGER.warning(f"Error calculating total print time: {e}")
-                data["total_print_time"] = None
-            data["cooling_fan_speed"] = self.hass.states.get(f"sensor.{self.printer_device_id}_cooling_fan_speed").state
-            data["percent_print_progress"] = self.hass.states.get(f"sensor.{self.printer_device_id}_print_progress").state
-            data["nozzle_temperature"] = self.hass.states.get(f"sensor.{self.printer_device_id}_nozzle_temperature").state
-            data["nozzle_target_temperature"] = self.hass.states.get(f"sensor.{self.printer_device_id}_nozzle_target_temperature").state
-            data["bed_temperature"] = self.hass.states.get(f"sensor.{self.printer_device_id}_bed_temperature").state
-            data["bed_target_temperature"] = self.hass.states.get(f"sensor.{self.printer_device_id}_bed_target_temperature").state
-        except Exception as e:
-            _LOGGER.warning(f"Error fetching Bambu Lab data: {e}")
-        return data
+            self._history_due = self._history_due or with_history
+            self.outbound.put_status(await self.status())
+
+    async def wait_for_ws_connection(self):
+        # The outbound queue only starts after establish_ws_connection() has created the client
+        await self.ws_client.wait_for_connection()
+
+    async def send_status_to_server(self, data):
+        msg, is_full = self.delta_encoder.encode(data) if self.delta_encoder else (data, False)
+        with_history = is_full or self._history_due
+        if with_history:
+            msg = self.with_history(msg)
+        sent = await self.send_ws_msg_to_server(msg)
+        if sent:
+            if self.delta_encoder:
+                self.delta_encoder.ack(data, is_full)
+            if with_history:
+                self._history_due = False
+            self.metrics.status_sent()
+        return sent
+
+    def with_history(self, msg):
+        # What happened over the last heartbeat interval, e.g. heater droop, as min/max/mean per bucket.
+        # Added to the outgoing message only, so the payload the delta encoder acknowledges never holds it.
+        history = self.history.series(time.time() - HISTORY_WINDOW_SECONDS)
+        if not history:
+            return msg
+        if "delta" in msg:
+            delta = msg["delta"]
+            return dict(msg, delta=dict(delta, status=dict(delta.get("status", {}), history=history)))
+        return dict(msg, status=dict(msg["status"], history=history))
+
+    async def send_ws_msg_to_server(self, data):
+        if not self.ws_client:
+            return False
+        serializer = self.serializer
+        raw = serializer.dumps(data)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Sending {} ({} bytes) to server: \n{}".format(serializer.name, len(raw), data))
+        return await self.ws_client.send(raw, as_binary=serializer.binary)
 
     async def status(self):
-        if self.device_type == "moonraker":
-            data = await self.fetch_moonraker_data()
-        elif self.device_type == "bambu_lab":
-            data = await self.fetch_bambu_lab_data()
-        else:
-            data = {}
-
-        return {
-            "current_print_ts": int(time.time()),
-            #"event": {
-            #    "event_type": data.get("print_progress", "PRINTER_ERROR"),  # STARTED, ENDED, PAUSED, RESUMED, FAILURE_ALERTED, ALERT_MUTED, ALERT_UNMUTED, FILAMENT_CHANGE, PRINTER_ERROR
-            #},
-            #"settings": {
-            #    "webcams": [
-            #        {
-            #            "name": "Dummy Camera",
-            #            "is_primary_camera": True,
-            #            "stream_mode": "live",
-            #            "stream_id": 1,
-            #            "flipV": False,
-            #            "flipH": False,
-            #            "rotation": 0,
-            #            "streamRatio": "16:9"
-            #        }
-            #    ],
-            #    "temperature": {
-            #        "profiles": [
-            #            {"bed": 60, "chamber": None, "extruder": 200, "name": "PLA"},
-            #            {"bed": 100, "chamber": None, "extruder": 240, "name": "ABS"}
-            #        ]
-            #    },
-            #    "agent": {
-            #        "name": "octoprint_obico",
-            #        "version": "2.5.2"
-            #    }
-            #},
-            "status": {
-                "_ts": int(time.time()),
-                "state": {
-                    "text": data.get("current_stage", "Unknown"),  # or "Offline"... etc
-                    "flags": {
-                        "operational": data.get("operational", False),  # true if the printer is operational, false otherwise
-                        "printing": data.get("printing", False),   # true if the printer is currently printing, false otherwise
-                        "cancelling": data.get("cancelling", False),  # true if the printer is currently printing and in the process of pausing, false otherwise
-                        "pausing": data.get("pausing", False),  # true if the printer is currently printing and in the process of pausing, false otherwise
-                        "resuming": data.get("resuming", False),
-                        "finishing": data.get("finishing", False),
-                        "closedOrError": data.get("closedOrError", False),  # true if the printer is disconnected (possibly due to an error), false otherwise
-                        "error": data.get("error", False),  # true if an unrecoverable error occurred, false otherwise
-                        "paused": data.get("paused", False),  # true if the printer is currently paused, false otherwise
-                        "ready": data.get("ready", False),  # true if the printer is operational and no data is currently being streamed to SD, so ready to receive instructions
-                        "sdReady": data.get("sdReady", False)  # true if the printer’s SD card is available and initialized, false otherwise. This is redundant information to the SD State.
-                    },
-                    "error": data.get("error", "")
-                },
-                "job": {
-                    "file": {
-                        "name": data.get("gcode_filename", "Unknown"),
-                        # "path": "/path/to/example.gcode",
-                        "display": data.get("gcode_filename", "Unknown"),
-                        # "origin": "local",
-                        # "size": 123456,
-                        "date": data.get("start_time", "")
-                    },
-                    "estimatedPrintTime": str(data.get("total_print_time", "Unknown")),
-                    #"averagePrintTime": 3500,
-                    #"lastPrintTime": 3400,
-                    #"filament": {
-                    #    "tool0": {
-                    #        "length": 1000,
-                    #        "volume": 10
-                    #    }
-                    #},
-                    #"user": "User Name",
-                },
-                #"currentLayerHeight": 0.2,
-                #"currentZ": 5.0,
-                #"currentFeedRate": 100,
-                #"currentFlowRate": 100,
-                "currentFanSpeed": float(data.get("cooling_fan_speed", 0)),
-                "progress": {
-                    "completion": float(data.get("percent_print_progress", 0)),
-                    #"filepos": 123456,
-                    "printTime": str(data.get("total_print_time", "Unknown")),
-                    "printTimeLeft": int(data.get("remaining_time", 0)),
-                    #"printTimeLeftOrigin": "estimate"
-                },
-                "temperatures": {
-                    "tool0": {
-                        "actual": float(data.get("nozzle_temperature", 0)),
-                        "target": float(data.get("nozzle_target_temperature", 0)),
-                        "offset": 0
-                    },
-                    "bed": {
-                        "actual": float(data.get("bed_temperature", 0)),
-                        "target": float(data.get("bed_target_temperature", 60)),
-                        "offset": 0
-                    },
-                    #"chamber": {
-                    #    "actual": None,
-                    #    "target": None,
-                    #    "offset": 0
-                    #}
-                },
-                #"file_metadata": {
-                #    "hash": "abc123",
-                #    "obico": {
-                #        "totalLayerCount": int(data.get("total_layers", 0))
-                #    },
-                #    "analysis": {
-                #        "printingArea": {
-                #            "maxX": 200,
-                #            "maxY": 200,
-                #            "maxZ": 200,
-                #            "minX": 0,
-                #            "minY": 0,
-                #            "minZ": 0
-                #        },
-                #        "dimensions": {
-                #            "depth": 200,
-                #            "height": 200,
-                #            "width": 200
-                #        },
-                #        "travelArea": {
-                #            "maxX": 200,
-                #            "maxY": 200,
-                #            "maxZ": 200,
-                #            "minX": 0,
-                #            "minY": 0,
-                #            "minZ": 0
-                #        },
-                #        "travelDimensions": {
-                #            "depth": 200,
-                #            "height": 200,
-                #            "width": 200
-                #        },
-                #        "estimatedPrintTime": 3600,
-                #        "filament": {
-                #            "tool0": {
-                #                "length": 1000,
-                #                "volume": 10
-                #            }
-                #        }
-                #   },
-                #    "history": {
-                #        "timestamp": data.get("start_time", "2025-02-22T23:05:10.652919Z"),
-                #        "printTime": 3600,
-                #        "success": True,
-                #        "printerProfile": "default"
-                #    },
-                #    "statistics": {
-                #        "averagePrintTime": 3500,
-                #        "lastPrintTime": 3400
-                #    }
-                #}
-            }
-        }
+        return self.snapshot.payload(self.print_job_tracker.current_print_ts)
 
     def schedule_periodic_status_update(self):
         async def periodic_status_update():
+            await asyncio.sleep(self.fleet.phase(self.config_entry.entry_id) * POST_STATUS_INTERVAL_SECONDS)  # stagger printers
             while True:
                 await asyncio.sleep(POST_STATUS_INTERVAL_SECONDS)
-                self.post_update_to_server()
+                await self.post_update_to_server(with_history=True)
 
-        asyncio.create_task(periodic_status_update())
\ No newline at end of file
+        self._status_task = self.hass.async_create_background_task(periodic_status_update(), f"{self.config_entry.entry_id} periodic status update")
\ No newline at end of file
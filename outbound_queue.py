@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from collections import deque
+from .const import OUTBOUND_MAX_EVENTS, OUTBOX_REPLAY_BATCH
+
+_LOGGER = logging.getLogger(__name__)
+
+class OutboundQueue:
+    """Two-lane outbound buffer drained by a single writer task.
+
+    Status snapshots are latest-wins: only the newest one is kept. Events keep their order and are bounded;
+    when the event lane is full, put_event_nowait() rejects the event.
+    With an outbox, the event lane lives on disk instead and survives outages and restarts.
+    """
+
+    def __init__(self, send_status, send_event, wait_connected, max_events=OUTBOUND_MAX_EVENTS, outbox=None):
+        self._send_status = send_status  # async callables returning True once the message is on the wire
+        self._send_event = send_event
+        self._wait_connected = wait_connected
+        self.max_events = max_events
+        self.outbox = outbox
+        self._status = None
+        self._events = deque()
+        self._wakeup = asyncio.Event()
+        self._writer_task = None
+        # Counters
+        self.status_enqueued = 0
+        self.status_coalesced = 0
+        self.events_enqueued = 0
+        self.events_dropped = 0
+        self.sent = 0
+        self.send_failures = 0
+
+    def depth(self):
+        return self._event_count() + (self._status is not None)
+
+    def stats(self):
+        return {
+            "status_enqueued": self.status_enqueued,
+            "status_coalesced": self.status_coalesced,
+            "events_enqueued": self.events_enqueued,
+            "events_dropped": self.events_dropped,
+            "sent": self.sent,
+            "send_failures": self.send_failures,
+        }
+
+    def _event_count(self):
+        return self.outbox.count if self.outbox else len(self._events)
+
+    def put_status(self, payload):
+        if self._status is not None:
+            self.status_coalesced += 1
+        self._status = payload
+        self.status_enqueued += 1
+        self._wakeup.set()
+
+    def put_event_nowait(self, msg):
+        if self.outbox:
+            task = asyncio.get_running_loop().create_task(self.outbox.async_append(msg))
+            task.add_done_callback(self._on_event_persisted)
+            return True
+        if len(self._events) >= self.max_events:
+            self.events_dropped += 1
+            _LOGGER.warning(f"Outbound event queue full ({self.max_events}), dropping event")
+            return False
+        self._append_event(msg)
+        return True
+
+    def _on_event_persisted(self, task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.events_dropped += 1
+            _LOGGER.error(f"Failed to store outbound event: {task.exception()}")
+            return
+        self.events_enqueued += 1
+        self.events_dropped += task.result()
+        self._wakeup.set()
+
+    def _append_event(self, msg):
+        self._events.append(msg)
+        self.events_enqueued += 1
+        self._wakeup.set()
+
+    def start(self):
+        if self._writer_task is None:
+            self._writer_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._event_count() or self._status is not None:
+                await self._wait_connected()
+                # Events go first so that the status that follows them reflects their outcome
+                if self.outbox and self.outbox.count:
+                    if not await self._deliver_outbox_batch():
+                        continue
+                    if self.outbox.count and self._status is not None:
+                        # A long backlog doesn't hold back live status: it goes out between replayed batches
+                        await self._deliver_status()
+                elif self._events:
+                    if not await self._deliver(self._send_event, self._events[0]):
+                        continue
+                    self._events.popleft()
+                elif self._status is not None:
+                    await self._deliver_status()
+
+    async def _deliver_status(self):
+        payload = self._status
+        if await self._deliver(self._send_status, payload) and self._status is payload:  # a newer snapshot may have arrived while sending
+            self._status = None
+
+    async def _deliver_outbox_batch(self):
+        # Delivered rows are deleted after the batch; a crash in between re-sends them (at-least-once)
+        delivered = []
+        batch = await self.outbox.async_read_batch(OUTBOX_REPLAY_BATCH)
+        if not batch:
+            self.outbox.count = 0  # everything was expired or discarded meanwhile
+            return True
+        try:
+            for row_id, msg in batch:
+                if not await self._deliver(self._send_event, msg):
+                    return False
+                delivered.append(row_id)
+        finally:
+            await self.outbox.async_delete(delivered)
+        return True
+
+    async def _deliver(self, send, msg):
+        # Returns False when the message should stay queued and be retried
+        try:
+            sent = await send(msg)
+        except Exception as e:
+            _LOGGER.error(f"Dropping outbound message that could not be sent: {e}")
+            self.send_failures += 1
+            return True
+        if sent:
+            self.sent += 1
+            return True
+        self.send_failures += 1
+        await asyncio.sleep(1)  # the connection just dropped; give the transport a moment to notice before retrying
+        return False
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .const import DOMAIN, OUTBOX_MAX_EVENTS, OUTBOX_MAX_AGE_SECONDS
+from .serializers import encode_default
+
+_LOGGER = logging.getLogger(__name__)
+
+class EventOutbox:
+    """Crash-safe, append-only SQLite log of event messages that haven't reached the server yet.
+
+    Every statement runs on one dedicated thread, in submission order, so appends keep the order of their callers.
+    """
+
+    def __init__(self, hass, entry_id, max_events=OUTBOX_MAX_EVENTS, max_age_seconds=OUTBOX_MAX_AGE_SECONDS):
+        self.hass = hass
+        self.path = hass.config.path(".storage", f"{DOMAIN}.{entry_id}.outbox.db")
+        self.max_events = max_events
+        self.max_age_seconds = max_age_seconds
+        self.count = 0  # rows on disk, kept in step with every statement
+        self._conn = None
+        self._executor = None
+
+    async def _run(self, func, *args):
+        return await self.hass.loop.run_in_executor(self._executor, func, *args)
+
+    async def async_open(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="obico_outbox")
+        self.count = await self._run(self._open)
+        if self.count:
+            _LOGGER.info(f"{self.count} undelivered events from before the restart will be replayed")
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, isolation_level=None)  # autocommit: every append is its own transaction
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")  # an appended event survives a power cut
+        self._conn.execute("CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, payload TEXT NOT NULL)")
+        self._expire()
+        return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def _expire(self):
+        # Age and size caps; returns the number of events dropped
+        dropped = self._conn.execute("DELETE FROM events WHERE created < ?", (time.time() - self.max_age_seconds,)).rowcount
+        dropped += self._conn.execute(
+            "DELETE FROM events WHERE id <= (SELECT id FROM events ORDER BY id DESC LIMIT 1 OFFSET ?)", (self.max_events,)
+        ).rowcount
+        if dropped:
+            _LOGGER.warning(f"Dropped {dropped} undelivered events over the outbox limits")
+        return dropped
+
+    async def async_append(self, msg):
+        """Persists an event; returns the number of older events dropped to stay within the caps."""
+        payload = json.dumps(msg, default=encode_default)
+        dropped = await self._run(self._append, payload)
+        self.count += 1 - dropped
+        return dropped
+
+    def _append(self, payload):
+        self._conn.execute("INSERT INTO events (created, payload) VALUES (?, ?)", (time.time(), payload))
+        return self._expire()
+
+    async def async_read_batch(self, limit):
+        """Oldest events first, as (row id, message)."""
+        rows = await self._run(self._read_batch, limit)
+        batch = []
+        for row_id, payload in rows:
+            try:
+                batch.append((row_id, json.loads(payload)))
+            except ValueError:
+                _LOGGER.error(f"Discarding unreadable outbox event {row_id}")
+                await self.async_delete([row_id])
+        return batch
+
+    def _read_batch(self, limit):
+        return self._conn.execute("SELECT id, payload FROM events ORDER BY id LIMIT ?", (limit,)).fetchall()
+
+    async def async_delete(self, row_ids):
+        if row_ids:
+            self.count -= await self._run(self._delete, row_ids)
+
+    def _delete(self, row_ids):
+        return self._conn.execute(f"DELETE FROM events WHERE id IN ({','.join('?' * len(row_ids))})", row_ids).rowcount
+
+    async def async_close(self):
+        if self._executor is None:
+            return
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    async def async_remove(self):
+        await self.async_close()
+        await self.hass.async_add_executor_job(self._remove_files)
+
+    def _remove_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
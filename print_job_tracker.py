@@ -1,136 +1,183 @@
-import re
 import logging
-import time
-import threading
 import os
-from .const import MAX_GCODE_DOWNLOAD_SECONDS
+import time
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util
+from .gcode_file_cache import GCodeFileCache
 from .utils import server_request
 
 _LOGGER = logging.getLogger(__name__)
 
+# Printer state -> print phase
+BAMBU_PHASES = {
+    "running": "printing",
+    "prepare": "printing",
+    "slicing": "printing",
+    "pause": "paused",
+    "finish": "done",
+    "failed": "failed",
+    "idle": "idle",
+    "init": "idle",
+}
+MOONRAKER_PHASES = {  # Klipper print_stats state
+    "printing": "printing",
+    "paused": "paused",
+    "complete": "done",
+    "cancelled": "cancelled",
+    "error": "failed",
+    "standby": "idle",
+}
+ACTIVE_PHASES = ("printing", "paused")
+
+# Fields whose changes can move the print to another phase
+PHASE_FIELDS = ("bambu_status", "print_status", "current_stage")
+
 class PrintJobTracker:
+    """Derives the print lifecycle from the printer's sensors and keeps current_print_ts stable for the whole print.
 
-    def __init__(self):
-        self._mutex = threading.RLock()
+    Runs entirely on the event loop: transitions are evaluated in the snapshot's state change callback.
+    """
+
+    def __init__(self, hass, plugin):
+        self.hass = hass
+        self.plugin = plugin
         self.current_print_ts = -1    # timestamp when current print started, acting as a unique identifier for a print
-        self.obico_g_code_file_id = None
-        self._file_metadata_cache = None
-        self.current_layer_height = None
-        self.gcode_downloading_started = None
-
-    def on_event(self, plugin, event, payload):
-
-        def find_obico_g_code_file_id(payload):
-            md5_hash = self.get_file_metadata(plugin._file_manager, payload['path'], payload['origin']).get('hash')
-            if not md5_hash:
-                return None
-
-            g_code_data = dict(
-                filename=payload['name'],
-                safe_filename=os.path.basename(payload['path']),
-                num_bytes=payload['size'],
-                agent_signature='md5:{}'.format(md5_hash),
-                url = payload['path']
-                )
-            resp = server_request('POST', '/api/v1/octo/g_code_files/', plugin, timeout=60, data=g_code_data, headers=plugin.auth_headers())
-
-            return resp.json()['id'] if resp else None
-
-        if event == 'PrintStarted':
-            with self._mutex:
-                self.current_print_ts = int(time.time())
-                self._file_metadata_cache = None
-
-            self.set_obico_g_code_file_id(find_obico_g_code_file_id(payload))
-
-        data = self.status(plugin)
-        data['event'] = {
-            'event_type': event,
-            'data': payload
+        self.file_cache = GCodeFileCache(hass, plugin.config_entry.entry_id)
+        self.phase = None  # last phase seen while the printer was online
+        self._offline = True  # no state seen yet, or the printer went offline since
+        self._network_started = False  # server lookups wait until the component's network start
+
+    @callback
+    def async_start(self):
+        self._on_phase(self.print_phase())
+        self.plugin.snapshot.async_add_listener(self._on_snapshot_changed)
+
+    @callback
+    def async_start_network(self):
+        self._network_started = True
+        if self.current_print_ts != -1 and self.plugin.snapshot.g_code_file_id is None:
+            self.find_obico_g_code_file_id()  # deferred from a print recovered at setup
+
+    def print_phase(self):
+        snapshot = self.plugin.snapshot
+        if snapshot.device_type == "bambu_lab":
+            return BAMBU_PHASES.get(snapshot.bambu_status, "offline")
+        if snapshot.device_type == "moonraker":
+            if snapshot.print_status in (None, "shutdown"):
+                return "offline"
+            return MOONRAKER_PHASES.get(snapshot.current_stage, "idle")
+        return "idle"
+
+    def _running_print_ts(self):
+        snapshot = self.plugin.snapshot
+        if snapshot.print_time is not None:
+            return int(time.time() - snapshot.print_time)
+        start = dt_util.parse_datetime(snapshot.start_time) if snapshot.start_time else None
+        if start is None:
+            return int(time.time())
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=dt_util.get_default_time_zone())
+        return int(start.timestamp())
+
+    @callback
+    def _on_snapshot_changed(self, changed_fields):
+        if any(field in PHASE_FIELDS for field in changed_fields):
+            self._on_phase(self.print_phase())
+        if "total_layers" in changed_fields and self.current_print_ts != -1 and self.plugin.snapshot.g_code_file_id is not None:
+            self.find_obico_g_code_file_id()  # the layer count arrived after a cache hit: check it's still the same slice
+
+    def _on_phase(self, phase):
+        if phase == "offline":
+            self._offline = True  # losing the printer's connection doesn't end the print
+            return
+        previous, self.phase = self.phase, phase
+        reconnected, self._offline = self._offline, False
+        if phase == previous:
+            return
+        if reconnected and phase in ACTIVE_PHASES and self.current_print_ts == -1:
+            # Already printing when the printer's sensors (re)appear, e.g. after a restart: the same print continues,
+            # so recover its start instead of reporting a new one
+            self.current_print_ts = self._running_print_ts()
+            self.find_obico_g_code_file_id()
+            return
+
+        if phase == "printing":
+            if previous == "paused":
+                self.on_event("PrintResumed")
+            elif self.current_print_ts == -1:
+                self.on_event("PrintStarted")
+        elif phase == "paused":
+            if self.current_print_ts == -1:
+                self.on_event("PrintStarted")
+            self.on_event("PrintPaused")
+        elif self.current_print_ts != -1:
+            if phase == "done":
+                self.on_event("PrintDone")
+            elif phase == "cancelled":
+                self.on_event("PrintFailed", {"reason": "cancelled"})
+            elif phase == "failed":
+                self.on_event("PrintFailed", {"reason": "error"})
+            else:  # back to idle without passing through done or failed
+                self.on_event("PrintFailed", {"reason": "stopped"})
+
+    @callback
+    def on_event(self, event, event_data=None):
+        if event == "PrintStarted":
+            self.current_print_ts = int(time.time())
+            self.find_obico_g_code_file_id()
+
+        snapshot = self.plugin.snapshot
+        data = snapshot.payload(self.current_print_ts)
+        data["event"] = {
+            "event_type": event,
+            "data": {"name": snapshot.gcode_filename, **(event_data or {})},
         }
+        _LOGGER.debug(f"Print event {event} for print {self.current_print_ts}")
+        self.plugin.outbound.put_event_nowait(data)
 
         # Unsetting self.current_print_ts should happen after it is captured in payload to make sure last event of a print contains the correct current_print_ts
-        with self._mutex:
-            if event == 'PrintFailed' or event == 'PrintDone':
-                self.current_print_ts = -1
-                self.set_obico_g_code_file_id(None)
-                self._file_metadata_cache = None
-                self.current_layer_height = None
-
-                # First layer AI
-                plugin.nozzlecam.on_first_layer = False # catch-all to make sure /nozzle_cam/first_layer_done/ is called in case such as canceled mid first layer.
-
-        return data
-
-    def status(self, plugin, status_only=False):
-        data = {
-            'status': plugin._printer.get_current_data()
-        }
-
-        with self._mutex:
-            data['current_print_ts'] = self.current_print_ts
-            current_file = data.get('status', {}).get('job', {}).get('file')
-            if self.get_obico_g_code_file_id() and current_file:
-                current_file['obico_g_code_file_id'] = self.get_obico_g_code_file_id()
-
-            # Injecting a 'G-Code Downloading' state so that the client side can treat it as a transition state
-            if self.gcode_downloading_started is not None:
-                if data.get('status', {}).get('state', {}).get('text') != 'Operational': # It is in an unexpected state. Something has gone wrong
-                    self.set_gcode_downloading_started(None)
-                elif time.time() - self.gcode_downloading_started > MAX_GCODE_DOWNLOAD_SECONDS: # For the edge case that the download thread died without an exception
-                    self.set_gcode_downloading_started(None)
-                else:
-                    data['status']['state']['text'] = 'G-Code Downloading'
-                    data['status']['state']['flags']['operational'] = False
-
-        # Apparently printers like Prusa throws random temperatures here. This should be consistent with OctoPrint, which only keeps r"^(tool\d+|bed|chamber)$"
-        temperatures = {}
-        for (k,v) in plugin._printer.get_current_temperatures().items():
-            if re.search(r'^(tool\d+|bed|chamber)$', k):
-                temperatures[k] = v
-
-        data['status']['temperatures'] = temperatures
-        data['status']['_ts'] = int(time.time())
-        data['status']['currentLayerHeight'] = self.current_layer_height # use camel-case to be consistent with the existing convention
-
-        if status_only:
-            if self._file_metadata_cache:
-                data['status']['file_metadata'] = self._file_metadata_cache
-            return data
-
-        data['status']['file_metadata'] = self._file_metadata_cache = self.get_file_metadata(plugin, data)
-
-        octo_settings = plugin.octoprint_settings_updater.as_dict()
-        if octo_settings:
-            data['settings'] = octo_settings
-
-        return data
-
-    def increment_layer_height(self, val):
-        with self._mutex:
-            self.current_layer_height = val
-
-    def set_obico_g_code_file_id(self, obico_g_code_file_id):
-        with self._mutex:
-            self.obico_g_code_file_id = obico_g_code_file_id
-
-    def get_obico_g_code_file_id(self):
-        with self._mutex:
-            return self.obico_g_code_file_id
-
-    def set_gcode_downloading_started(self, timestamp):
-        with self._mutex:
-            self.gcode_downloading_started = timestamp
-
-    def get_file_metadata(self, plugin, data):
-        try:
-            current_file = data.get('status', {}).get('job', {}).get('file', {})
-            origin = current_file.get('origin')
-            path = current_file.get('path')
-            if not origin or not path:
-                return None
-
-            return plugin._file_manager._storage_managers.get(origin).get_metadata(path) or {}
-        except Exception as e:
-            _LOGGER.exception(e)
-            return None
\ No newline at end of file
+        if event in ("PrintFailed", "PrintDone"):
+            if self.plugin.timelapse:
+                self.hass.async_create_task(self.plugin.timelapse.async_finish(self.current_print_ts, event == "PrintDone"))
+            self.current_print_ts = -1
+            snapshot.set_g_code_file_id(None)
+
+    @callback
+    def find_obico_g_code_file_id(self):
+        # A cache hit reports the file id from the very first event of the print; a miss asks the server in the background
+        snapshot = self.plugin.snapshot
+        snapshot.set_g_code_file_id(None)
+        if not snapshot.gcode_filename:
+            return
+        key = GCodeFileCache.key(snapshot.gcode_filename)
+        cached = self.file_cache.get(key)
+        if cached is not None and self._same_slice(cached):
+            snapshot.set_g_code_file_id(cached["id"])
+            return
+        if not self._network_started:
+            return
+        self.hass.async_create_task(self._async_lookup_g_code_file_id(key, snapshot.gcode_filename, self.current_print_ts))
+
+    def _same_slice(self, cached):
+        # Layer counts known on both sides must agree, otherwise the file was re-sliced under the same name
+        cached_layers = cached["metadata"].get("total_layers")
+        total_layers = self.plugin.snapshot.total_layers
+        return cached_layers is None or total_layers is None or cached_layers == total_layers
+
+    async def _async_lookup_g_code_file_id(self, key, filename, print_ts):
+        g_code_data = dict(
+            filename=filename,
+            safe_filename=os.path.basename(filename),
+            num_bytes=0,  # unknown: the printer integrations don't expose the file size
+            agent_signature=f"name:{key}",
+            url=filename,
+            )
+        resp = await server_request('POST', '/api/v1/octo/g_code_files/', self.plugin, timeout=60, data=g_code_data)
+        if not resp or 'id' not in resp:
+            return
+        metadata = {k: v for k, v in resp.items() if k != 'id'}
+        metadata["total_layers"] = self.plugin.snapshot.total_layers
+        self.file_cache.put(key, resp['id'], metadata)
+        if self.current_print_ts == print_ts:  # still the same print
+            self.plugin.snapshot.set_g_code_file_id(resp['id'])
+            await self.plugin.post_update_to_server()
@@ -1,24 +1,162 @@
 import logging
-from homeassistant.helpers.entity import Entity
-from .const import DOMAIN
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorEntityDescription, SensorStateClass
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.util import dt as dt_util
+from .const import DOMAIN, DEFAULT_NAME
 
 _LOGGER = logging.getLogger(__name__)
 
-async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
-    async_add_entities([ObicoConnectSensor(hass.data[DOMAIN])], True)
+SCAN_INTERVAL = timedelta(seconds=30)  # metrics are plain counters; sensors sample them instead of being pushed per event
 
-class ObicoConnectSensor(Entity):
-    def __init__(self, config):
-        self._name = config["name"]
-        self._state = None
+@dataclass(frozen=True, kw_only=True)
+class ObicoSensorEntityDescription(SensorEntityDescription):
+    value_fn: Callable[[Any], Any]
+    attributes_fn: Callable[[Any], dict] | None = None
 
-    @property
-    def name(self):
-        return self._name
+def _timestamp(ts):
+    return dt_util.utc_from_timestamp(ts) if ts else None
+
+def _channel_descriptions(channel):
+    return (
+        ObicoSensorEntityDescription(
+            key=f"{channel}_attempts",
+            name=f"{channel.capitalize()} attempts",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            value_fn=lambda metrics: metrics.attempts_for(channel),
+        ),
+        ObicoSensorEntityDescription(
+            key=f"{channel}_errors",
+            name=f"{channel.capitalize()} errors",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            value_fn=lambda metrics: metrics.errors_for(channel),
+        ),
+    )
+
+SENSORS = (
+    *_channel_descriptions("webcam"),
+    *_channel_descriptions("ws"),
+    *_channel_descriptions("rest"),
+    ObicoSensorEntityDescription(
+        key="upload_bytes",
+        name="Snapshot upload size",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: metrics.upload_bytes.mean(),
+        attributes_fn=lambda metrics: {"count": metrics.upload_bytes.count, "total": metrics.upload_bytes.total, "buckets": metrics.upload_bytes.as_dict()},
+    ),
+    ObicoSensorEntityDescription(
+        key="upload_latency",
+        name="Snapshot upload latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: metrics.upload_latency_ms.mean(),
+        attributes_fn=lambda metrics: {
+            "p50": metrics.upload_latency_ms.quantile(0.5),
+            "p95": metrics.upload_latency_ms.quantile(0.95),
+            "buckets": metrics.upload_latency_ms.as_dict(),
+        },
+    ),
+    ObicoSensorEntityDescription(
+        key="command_latency",
+        name="Command latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: metrics.command_latency_ms.mean(),
+        attributes_fn=lambda metrics: {
+            "count": metrics.command_latency_ms.count,
+            "p50": metrics.command_latency_ms.quantile(0.5),
+            "p95": metrics.command_latency_ms.quantile(0.95),
+            "buckets": metrics.command_latency_ms.as_dict(),
+        },
+    ),
+    ObicoSensorEntityDescription(
+        key="ws_rtt",
+        name="WebSocket round trip",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: round(metrics.last_ws_rtt_ms, 1) if metrics.last_ws_rtt_ms is not None else None,
+        attributes_fn=lambda metrics: {
+            "mean": metrics.ws_rtt_ms.mean(),
+            "p50": metrics.ws_rtt_ms.quantile(0.5),
+            "p95": metrics.ws_rtt_ms.quantile(0.95),
+            "buckets": metrics.ws_rtt_ms.as_dict(),
+        },
+    ),
+    ObicoSensorEntityDescription(
+        key="ws_reconnects",
+        name="Server reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.ws_reconnects(),
+    ),
+    ObicoSensorEntityDescription(
+        key="queue_depth",
+        name="Outbound queue depth",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: metrics.queue_depth(),
+        attributes_fn=lambda metrics: metrics.queue_stats(),
+    ),
+    ObicoSensorEntityDescription(
+        key="events_dropped",
+        name="Events dropped",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.queue_stat("events_dropped"),
+    ),
+    ObicoSensorEntityDescription(
+        key="status_coalesced",
+        name="Status updates coalesced",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.queue_stat("status_coalesced"),
+    ),
+    ObicoSensorEntityDescription(
+        key="send_failures",
+        name="Send failures",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.queue_stat("send_failures"),
+    ),
+    ObicoSensorEntityDescription(
+        key="last_status",
+        name="Last status sent",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=lambda metrics: _timestamp(metrics.last_status_ts),
+    ),
+    ObicoSensorEntityDescription(
+        key="last_picture",
+        name="Last picture uploaded",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=lambda metrics: _timestamp(metrics.last_pic_ts),
+    ),
+)
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    obico_component = hass.data[DOMAIN].components[entry.entry_id]
+    async_add_entities([ObicoConnectSensor(entry, obico_component.metrics, description) for description in SENSORS])
+
+class ObicoConnectSensor(SensorEntity):
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, entry, metrics, description):
+        self.entity_description = description
+        self._metrics = metrics
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, entry.entry_id)},
+            "name": entry.title or DEFAULT_NAME,
+        }
 
     @property
-    def state(self):
-        return self._state
+    def native_value(self):
+        return self.entity_description.value_fn(self._metrics)
 
-    async def async_update(self):
-        self._state = "obico_connect_sensor_state"
\ No newline at end of file
+    @property
+    def extra_state_attributes(self):
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self._metrics)
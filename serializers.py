@@ -0,0 +1,136 @@
+import abc
+import datetime
+import importlib
+import json
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+def encode_default(obj):
+    # Explicit handling for the non-JSON types that show up in status payloads; anything else is a bug, not a string
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable for the server")
+
+def _to_plain(obj):
+    # For backends without a default hook (BSON): applies encode_default to nested values up front
+    if isinstance(obj, dict):
+        return {str(k): _to_plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return [_to_plain(v) for v in obj]
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return _to_plain(encode_default(obj))
+
+class Serializer(abc.ABC):
+    """Encodes outbound server messages; binary backends are sent as binary websocket frames."""
+    name = None
+    subprotocol = None  # offered to the server for binary backends; text backends need no negotiation
+    binary = False
+
+    @abc.abstractmethod
+    def dumps(self, data):
+        ...
+
+    @abc.abstractmethod
+    def loads(self, raw):
+        ...
+
+class JsonSerializer(Serializer):
+    name = "json"
+
+    def __init__(self):
+        # One encoder instance for the connection instead of building one per json.dumps() call
+        self._encoder = json.JSONEncoder(default=encode_default, separators=(",", ":"), check_circular=False)
+
+    def dumps(self, data):
+        return self._encoder.encode(data)
+
+    def loads(self, raw):
+        return json.loads(raw)
+
+class OrjsonSerializer(Serializer):
+    name = "orjson"
+
+    def __init__(self):
+        self._orjson = importlib.import_module("orjson")
+        self._option = self._orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data):
+        # Same JSON text on the wire as JsonSerializer, so the server can't tell the difference
+        return self._orjson.dumps(data, default=encode_default, option=self._option).decode()
+
+    def loads(self, raw):
+        return self._orjson.loads(raw)
+
+class MsgpackSerializer(Serializer):
+    name = "msgpack"
+    subprotocol = "obico.msgpack"
+    binary = True
+
+    def __init__(self):
+        self._msgpack = importlib.import_module("msgpack")
+        # The packer keeps its internal buffer between messages
+        self._packer = self._msgpack.Packer(default=encode_default, use_bin_type=True, datetime=False)
+
+    def dumps(self, data):
+        return self._packer.pack(data)
+
+    def loads(self, raw):
+        return self._msgpack.unpackb(raw, raw=False)
+
+class BsonSerializer(Serializer):
+    name = "bson"
+    subprotocol = "obico.bson"
+    binary = True
+
+    def __init__(self):
+        bson = importlib.import_module("bson")
+        # pymongo's bson vs the standalone bson package; neither is a requirement, bson is only offered when installed
+        self._encode = getattr(bson, "encode", None) or bson.dumps
+        self._decode = getattr(bson, "decode", None) or bson.loads
+
+    def dumps(self, data):
+        return self._encode(_to_plain(data))
+
+    def loads(self, raw):
+        return self._decode(raw)
+
+SERIALIZERS = {
+    "json": JsonSerializer,
+    "orjson": OrjsonSerializer,
+    "msgpack": MsgpackSerializer,
+    "bson": BsonSerializer,
+}
+
+def create_serializer(name):
+    """Builds the named backend, or None if its library isn't installed."""
+    try:
+        return SERIALIZERS[name]()
+    except ImportError as e:
+        _LOGGER.debug(f"Serializer '{name}' unavailable: {e}")
+        return None
+
+def text_serializer():
+    # orjson when installed; stdlib json otherwise
+    return create_serializer("orjson") or JsonSerializer()
+
+def offered_subprotocols(preferred):
+    """Websocket subprotocols to offer for the configured backend ("auto" and text backends offer none)."""
+    serializer_cls = SERIALIZERS.get(preferred)
+    if serializer_cls is None or serializer_cls.subprotocol is None or create_serializer(preferred) is None:
+        return ()
+    return (serializer_cls.subprotocol,)
+
+def negotiate(preferred, protocol):
+    """Picks the backend for a freshly opened connection from the subprotocol the server accepted."""
+    for serializer_cls in SERIALIZERS.values():
+        if protocol and serializer_cls.subprotocol == protocol:
+            return serializer_cls()
+    if preferred in ("json", "orjson"):
+        return create_serializer(preferred) or JsonSerializer()
+    return text_serializer()
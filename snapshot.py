@@ -0,0 +1,209 @@
+import datetime
+import logging
+import time
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
+from .entity_map import DEVICE_FIELDS
+from .const import AGENT_NAME, AGENT_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+# Every logical field of every device type gets a typed slot; fields a device type doesn't map stay None
+FIELDS = tuple(sorted({field for fields in DEVICE_FIELDS.values() for field in fields}))
+
+# Field -> payload sections it feeds; a change only re-renders those sections, the others are reused as-is
+SECTIONS = {
+    "bambu_status": ("state",),
+    "print_status": ("state",),
+    "current_stage": ("state",),
+    "gcode_filename": ("job",),
+    "start_time": ("job", "progress"),
+    "end_time": ("job", "progress"),
+    "print_time": ("job", "progress"),
+    "percent_progress": ("progress",),
+    "remaining_time": ("progress",),
+    "nozzle_temperature": ("temperatures",),
+    "nozzle_target_temperature": ("temperatures",),
+    "bed_temperature": ("temperatures",),
+    "bed_target_temperature": ("temperatures",),
+}
+
+FLAG_NAMES = ("operational", "printing", "cancelling", "pausing", "resuming", "finishing", "closedOrError", "error", "paused", "ready", "sdReady")
+
+def bambu_flags(bambu_status):
+    # Bambu sends: "failed", "finish", "idle", "init", "offline", "pause", "prepare", "running", "slicing", "unknown"
+    if bambu_status == "none":
+        return dict.fromkeys(FLAG_NAMES, None) | {"cancelling": False}
+    return {
+        "operational": bambu_status not in ("offline", "unknown"),
+        "printing": bambu_status in ("running", "prepare", "slicing"),
+        "cancelling": False,
+        "pausing": bambu_status == "pause",  # might need to find a better way to determine this
+        "resuming": bambu_status == "running",  # might need to find a better way to determine this
+        "finishing": bambu_status == "finish",  # might need to find a better way to determine this
+        "closedOrError": bambu_status in ("failed", "offline", "unknown"),
+        "error": bambu_status == "failed",
+        "paused": bambu_status == "pause",
+        "ready": bambu_status in ("idle", "finish", "init", "slicing"),
+        "sdReady": bambu_status not in ("offline", "unknown"),  # might need to find a better way to determine this
+    }
+
+def parse_print_time(start_time, end_time):
+    try:
+        return datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S") - datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError) as e:
+        _LOGGER.debug(f"Error calculating total print time: {e}")
+        return None
+
+class PrinterSnapshot:
+    """Typed status of one printer, updated in place from its sensors' state changes.
+
+    States are converted once when they change; the server payload is rendered on demand from cached sections.
+    """
+    __slots__ = FIELDS + ("hass", "entity_map", "device_type", "total_print_time", "g_code_file_id", "_by_entity", "_sections", "_settings", "_listeners", "_unsub_state")
+
+    def __init__(self, hass, entity_map, device_type, webcams=()):
+        self.hass = hass
+        self.entity_map = entity_map
+        self.device_type = device_type
+        for field in FIELDS:
+            setattr(self, field, None)
+        self.total_print_time = None  # timedelta, derived from the start/end time or the print duration
+        self.g_code_file_id = None  # server id of the file being printed
+        self._by_entity = {}
+        self._sections = {}
+        self._listeners = []
+        self._unsub_state = None
+        # Static for the lifetime of the entry, so built once and shared by every payload
+        self._settings = {
+            "webcams": list(webcams),
+            "agent": {"name": AGENT_NAME, "version": AGENT_VERSION},
+        }
+
+    @callback
+    def async_start(self):
+        self.entity_map.async_add_listener(self._on_entities_changed)
+        self._track()
+
+    @callback
+    def async_stop(self):
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+
+    @callback
+    def async_add_listener(self, listener):
+        # listener(changed_fields) is called on the event loop right after a state change was ingested
+        self._listeners.append(listener)
+
+    @callback
+    def _on_entities_changed(self):
+        if self._unsub_state:
+            self._track()
+
+    def _track(self):
+        if self._unsub_state:
+            self._unsub_state()
+        self._by_entity = self.entity_map.fields_by_entity()
+        self._unsub_state = async_track_state_change_event(self.hass, list(self._by_entity), self._on_state_change)
+        self.refresh()
+
+    def refresh(self):
+        get_state = self.hass.states.get
+        for entity_id in self._by_entity:
+            self._ingest(entity_id, get_state(entity_id))
+
+    @callback
+    def _on_state_change(self, event):
+        self._ingest(event.data["entity_id"], event.data.get("new_state"))
+
+    def _ingest(self, entity_id, state):
+        changed = []
+        for field, converter in self._by_entity.get(entity_id, ()):
+            value = None
+            if state is not None and state.state not in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+                try:
+                    value = converter(state.state)
+                except (TypeError, ValueError) as e:
+                    _LOGGER.debug(f"Unable to convert {entity_id} state {state.state!r}: {e}")
+            if value == getattr(self, field):
+                continue
+            setattr(self, field, value)
+            changed.append(field)
+            for section in SECTIONS.get(field, ()):
+                self._sections.pop(section, None)
+            if field in ("start_time", "end_time", "print_time"):
+                self._update_print_time()
+        if changed:
+            for listener in self._listeners:
+                listener(changed)
+
+    def _update_print_time(self):
+        if self.device_type == "bambu_lab":
+            self.total_print_time = parse_print_time(self.start_time, self.end_time)
+        else:
+            self.total_print_time = datetime.timedelta(seconds=int(self.print_time)) if self.print_time is not None else None
+
+    def set_g_code_file_id(self, g_code_file_id):
+        if g_code_file_id != self.g_code_file_id:
+            self.g_code_file_id = g_code_file_id
+            self._sections.pop("job", None)
+
+    def print_time_text(self):
+        return str(self.total_print_time) if self.total_print_time is not None else "Unknown"
+
+    def _section(self, name):
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = getattr(self, f"_render_{name}")()
+        return section
+
+    def _render_state(self):
+        if self.device_type == "bambu_lab":
+            bambu_status = self.bambu_status or "unknown"
+            flags = bambu_flags(bambu_status)
+            error = {"failed": "Failed", "offline": "Offline", "unknown": "Unknown"}.get(bambu_status)
+        else:
+            flags = dict.fromkeys(FLAG_NAMES, False)
+            error = ""
+        return {"text": self.current_stage or "Unknown", "flags": flags, "error": error}
+
+    def _render_job(self):
+        filename = self.gcode_filename or "Unknown"
+        file = {"name": filename, "display": filename, "date": self.start_time or ""}
+        if self.g_code_file_id is not None:
+            file["obico_g_code_file_id"] = self.g_code_file_id
+        return {
+            "file": file,
+            "estimatedPrintTime": self.print_time_text(),
+        }
+
+    def _render_progress(self):
+        return {
+            "completion": self.percent_progress or 0.0,
+            "printTime": self.print_time_text(),
+            "printTimeLeft": self.remaining_time or 0,
+        }
+
+    def _render_temperatures(self):
+        return {
+            "tool0": {"actual": self.nozzle_temperature or 0.0, "target": self.nozzle_target_temperature or 0.0, "offset": 0},
+            "bed": {"actual": self.bed_temperature or 0.0, "target": self.bed_target_temperature if self.bed_target_temperature is not None else 60.0, "offset": 0},
+        }
+
+    def payload(self, current_print_ts=-1):
+        # Unchanged sections are the same objects as in the previous payload, which the delta encoder skips by identity
+        now = int(time.time())
+        return {
+            "current_print_ts": current_print_ts,
+            "settings": self._settings,
+            "status": {
+                "_ts": now,
+                "state": self._section("state"),
+                "job": self._section("job"),
+                "currentFanSpeed": self.cooling_fan_speed or 0.0,
+                "progress": self._section("progress"),
+                "temperatures": self._section("temperatures"),
+            },
+        }
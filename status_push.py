@@ -0,0 +1,101 @@
+import logging
+import time
+from datetime import timedelta
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event, async_track_time_interval
+from .const import STATUS_PUSH_DEBOUNCE_SECONDS, STATUS_HEARTBEAT_SECONDS, STATUS_PUSH_DEADBANDS
+
+_LOGGER = logging.getLogger(__name__)
+
+class StatusPusher:
+    """Pushes printer status to the server when one of the printer's sensors changes."""
+
+    def __init__(self, hass, plugin, fields_by_entity, debounce_seconds=STATUS_PUSH_DEBOUNCE_SECONDS, heartbeat_seconds=STATUS_HEARTBEAT_SECONDS, deadbands=STATUS_PUSH_DEADBANDS):
+        # fields_by_entity: entity_id -> [(field, converter)], as resolved by the printer's entity map
+        self.hass = hass
+        self.plugin = plugin
+        self.debounce_seconds = debounce_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._deadband_config = deadbands
+        self._set_entities(fields_by_entity)
+        self.last_push_ts = 0
+        self._reference_values = {}  # value of each entity when it last triggered a push, for deadband comparison
+        self._unsub_state = None
+        self._unsub_heartbeat = None
+        self._unsub_debounce = None
+
+    def _set_entities(self, fields_by_entity):
+        self.entity_ids = list(fields_by_entity)
+        self.deadbands = {entity_id: self._deadband_for(fields, self._deadband_config) for entity_id, fields in fields_by_entity.items()}
+
+    @staticmethod
+    def _deadband_for(fields, deadbands):
+        # A sensor feeding several fields is still one value; fields without a band of their own are other views of it
+        return max((deadbands.get(field, 0) for field, _ in fields), default=0)
+
+    def start(self):
+        _LOGGER.debug(f"Tracking {len(self.entity_ids)} entities for status push")
+        self._unsub_state = async_track_state_change_event(self.hass, self.entity_ids, self._on_state_change)
+        # Offset the heartbeat by this printer's phase so that a fleet of printers doesn't beat in lockstep
+        delay = self.plugin.fleet.phase(self.plugin.config_entry.entry_id) * self.heartbeat_seconds
+        self._unsub_heartbeat = async_call_later(self.hass, delay, self._start_heartbeat)
+
+    async def _start_heartbeat(self, now):
+        self._unsub_heartbeat = async_track_time_interval(self.hass, self._on_heartbeat, timedelta(seconds=self.heartbeat_seconds))
+
+    def set_entities(self, fields_by_entity):
+        self._set_entities(fields_by_entity)
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = async_track_state_change_event(self.hass, self.entity_ids, self._on_state_change)
+        self.schedule_push()
+
+    def stop(self):
+        for unsub in (self._unsub_state, self._unsub_heartbeat, self._unsub_debounce):
+            if unsub:
+                unsub()
+        self._unsub_state = self._unsub_heartbeat = self._unsub_debounce = None
+
+    @callback
+    def _on_state_change(self, event):
+        new_state = event.data.get("new_state")
+        if new_state is None:
+            return
+        entity_id = event.data["entity_id"]
+        if not self._exceeds_deadband(entity_id, new_state.state):
+            return
+        self._reference_values[entity_id] = new_state.state
+        self.schedule_push()
+
+    def _exceeds_deadband(self, entity_id, value):
+        band = self.deadbands.get(entity_id, 0)
+        reference = self._reference_values.get(entity_id)
+        if reference is None:
+            return True
+        if not band:
+            return value != reference
+        try:
+            return abs(float(value) - float(reference)) >= band
+        except (TypeError, ValueError):  # "unavailable", "unknown" and other non-numeric states always count as a change
+            return value != reference
+
+    @callback
+    def schedule_push(self):
+        # Trailing-edge debounce: the first change opens the window, later changes within it ride along in the same send
+        if self._unsub_debounce is None:
+            self._unsub_debounce = async_call_later(self.hass, self.debounce_seconds, self._on_debounce_elapsed)
+
+    async def _on_debounce_elapsed(self, now):
+        self._unsub_debounce = None
+        await self.push()
+
+    async def _on_heartbeat(self, now):
+        if time.time() - self.last_push_ts >= self.heartbeat_seconds * 0.9:
+            await self.push(with_history=True)
+
+    async def push(self, with_history=False):
+        self.last_push_ts = time.time()
+        try:
+            await self.plugin.post_update_to_server(with_history=with_history)
+        except Exception as e:
+            _LOGGER.warning(f"Error pushing status to server: {e}")
@@ -0,0 +1,27 @@
+import os
+import sys
+import types
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "obico_connect"
+
+# The repository root is the integration package; register it under its domain without running its __init__ (the HA entry points)
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [REPO_ROOT]
+    sys.modules[PACKAGE] = package
+
+@pytest.fixture
+async def image_executor(hass):
+    # Joins the image worker threads after the test, so that none outlives it
+    from obico_connect.fleet import async_get_fleet
+    executor = async_get_fleet(hass).image_executor
+    yield executor
+    await hass.async_add_executor_job(executor.shutdown, True)
+
+@pytest.fixture
+def config_dir(hass, tmp_path):
+    # Files the integration writes next to .storage (outbox, timelapses) land in a fresh directory per test
+    hass.config.config_dir = str(tmp_path)
+    return tmp_path
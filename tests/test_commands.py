@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+import pytest
+from pytest_homeassistant_custom_component.common import async_mock_service
+from obico_connect.commands import CommandDispatcher
+from obico_connect.serializers import JsonSerializer
+
+PAUSE_BUTTON = "button.printer_pause_printing"
+
+@pytest.fixture
+def plugin():
+    return SimpleNamespace(printer_device_id="printer", device_type="bambu_lab", post_update_to_server=AsyncMock(), metrics=Mock(), serializer=JsonSerializer())
+
+@pytest.fixture
+def presses(hass):
+    return async_mock_service(hass, "button", "press")
+
+async def test_messages_without_commands_take_the_fast_path(hass, plugin, presses):
+    dispatcher = CommandDispatcher(hass, plugin)
+    assert dispatcher.process_server_msg('{"webcams": []}') is None
+    assert dispatcher.process_server_msg(b'{"webcams": []}') is None
+    await hass.async_block_till_done()
+    assert not presses
+
+async def test_command_presses_the_button_and_reports_back(hass, plugin, presses):
+    dispatcher = CommandDispatcher(hass, plugin)
+    msg = dispatcher.process_server_msg('{"commands": [{"cmd": "pause", "args": {"retract": 6.5}}]}')
+    assert msg["commands"][0]["cmd"] == "pause"
+    await hass.async_block_till_done()
+    assert [call.data["entity_id"] for call in presses] == [PAUSE_BUTTON]
+    plugin.post_update_to_server.assert_awaited_once_with()
+    plugin.metrics.command_performed.assert_called_once()
+
+async def test_passthru_is_acked(hass, plugin, presses):
+    dispatcher = CommandDispatcher(hass, plugin)
+    dispatcher.process_server_msg('{"passthru": {"ref": "abc", "target": "_printer", "func": "pause"}}')
+    await hass.async_block_till_done()
+    assert [call.data["entity_id"] for call in presses] == [PAUSE_BUTTON]
+    plugin.post_update_to_server.assert_awaited_once_with({"passthru": {"ref": "abc", "ret": "ok"}})
+
+async def test_unsupported_passthru_is_acked_with_an_error(hass, plugin, presses):
+    dispatcher = CommandDispatcher(hass, plugin)
+    dispatcher.process_server_msg('{"passthru": {"ref": "abc", "target": "file_operations", "func": "start_printer_local_print"}}')
+    await hass.async_block_till_done()
+    assert not presses
+    ack = plugin.post_update_to_server.await_args.args[0]["passthru"]
+    assert ack["ref"] == "abc"
+    assert "Unsupported passthru call" in ack["error"]
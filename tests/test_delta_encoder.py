@@ -0,0 +1,47 @@
+from obico_connect.delta_encoder import DeltaEncoder
+
+STATUS = {
+    "status": {"state": {"text": "Printing", "flags": {"printing": True}}, "progress": {"completion": 10}},
+    "current_print_ts": 1700000000,
+}
+
+def test_first_payload_is_full():
+    encoder = DeltaEncoder()
+    msg, is_full = encoder.encode(STATUS)
+    assert is_full
+    assert msg is STATUS
+
+def test_only_changed_leaves_are_sent():
+    encoder = DeltaEncoder()
+    encoder.ack(STATUS, True)
+    payload = {**STATUS, "status": {**STATUS["status"], "progress": {"completion": 11}}}
+    msg, is_full = encoder.encode(payload)
+    assert not is_full
+    assert msg == {"delta": {"status": {"progress": {"completion": 11}}}}
+
+def test_unchanged_payload_is_empty_delta():
+    encoder = DeltaEncoder()
+    encoder.ack(STATUS, True)
+    assert encoder.encode(STATUS) == ({"delta": {}}, False)
+
+def test_removed_keys_are_listed_by_path():
+    encoder = DeltaEncoder()
+    encoder.ack(STATUS, True)
+    payload = {"status": {"state": STATUS["status"]["state"]}}
+    msg, _ = encoder.encode(payload)
+    assert msg == {"delta": {}, "deleted": [["status", "progress"], ["current_print_ts"]]}
+
+def test_full_snapshot_after_the_configured_number_of_deltas():
+    encoder = DeltaEncoder(full_snapshot_every=2)
+    encoder.ack(STATUS, True)
+    for _ in range(2):
+        msg, is_full = encoder.encode(STATUS)
+        assert not is_full
+        encoder.ack(STATUS, is_full)
+    assert encoder.encode(STATUS) == (STATUS, True)
+
+def test_reset_forces_a_full_snapshot():
+    encoder = DeltaEncoder()
+    encoder.ack(STATUS, True)
+    encoder.reset()
+    assert encoder.encode(STATUS) == (STATUS, True)
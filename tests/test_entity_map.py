@@ -0,0 +1,65 @@
+import pytest
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from obico_connect.entity_map import EntityMap
+
+@pytest.fixture
+def device(hass):
+    entry = MockConfigEntry(domain="bambu_lab")
+    entry.add_to_hass(hass)
+    return dr.async_get(hass).async_get_or_create(config_entry_id=entry.entry_id, identifiers={("bambu_lab", "printer")})
+
+def add_entity(hass, device, object_id, translation_key=None, domain="sensor"):
+    entry = er.async_get(hass).async_get_or_create(
+        domain, "bambu_lab", f"{device.id}_{object_id}", device_id=device.id, suggested_object_id=object_id, translation_key=translation_key)
+    return entry.entity_id
+
+async def test_resolves_by_translation_key(hass, device):
+    entity_id = add_entity(hass, device, "garage_printer_nozzle", translation_key="nozzle_temperature")
+    entity_map = EntityMap(hass, device.id, "bambu_lab")
+    assert entity_id == "sensor.garage_printer_nozzle"
+    assert entity_map.entity_id("nozzle_temperature") == entity_id
+
+async def test_suffix_match_prefers_the_shortest_entity_id(hass, device):
+    add_entity(hass, device, "k1_print_progress")
+    add_entity(hass, device, "k1_progress")
+    entity_map = EntityMap(hass, device.id, "moonraker")
+    assert entity_map.entity_id("percent_progress") == "sensor.k1_progress"
+
+async def test_only_entities_of_the_domain_are_resolved(hass, device):
+    add_entity(hass, device, "printer_nozzle_temperature", translation_key="nozzle_temperature", domain="number")
+    entity_map = EntityMap(hass, device.id, "bambu_lab")
+    assert entity_map.entity_id("nozzle_temperature") == f"sensor.{device.id}_nozzle_temperature"
+
+async def test_legacy_naming_for_devices_missing_from_the_registry(hass):
+    entity_map = EntityMap(hass, "printer", "bambu_lab")
+    assert entity_map.entity_id("nozzle_temperature") == "sensor.printer_nozzle_temperature"
+    assert entity_map.entity_id("not_a_field") is None
+
+async def test_listeners_are_told_when_the_device_gets_new_entities(hass, device):
+    entity_map = EntityMap(hass, device.id, "bambu_lab")
+    entity_map.async_start()
+    changes = []
+    entity_map.async_add_listener(lambda: changes.append(entity_map.entity_id("nozzle_temperature")))
+    entity_map.entity_ids()
+
+    add_entity(hass, device, "garage_printer_nozzle", translation_key="nozzle_temperature")
+    await hass.async_block_till_done()
+    assert changes == ["sensor.garage_printer_nozzle"]
+    entity_map.async_stop()
+
+async def test_registry_updates_for_other_devices_are_ignored(hass, device, monkeypatch):
+    entity_map = EntityMap(hass, device.id, "bambu_lab")
+    entity_map.async_start()
+    entity_map.entity_ids()
+    resolve = entity_map._resolve
+    resolves = []
+    monkeypatch.setattr(entity_map, "_resolve", lambda: resolves.append(1) or resolve())
+
+    other_entry = MockConfigEntry(domain="bambu_lab")
+    other_entry.add_to_hass(hass)
+    other = dr.async_get(hass).async_get_or_create(config_entry_id=other_entry.entry_id, identifiers={("bambu_lab", "other")})
+    add_entity(hass, other, "other_printer_nozzle", translation_key="nozzle_temperature")
+    await hass.async_block_till_done()
+    assert resolves == []
+    entity_map.async_stop()
@@ -0,0 +1,68 @@
+import asyncio
+import time
+import pytest
+from obico_connect.frame_cache import Frame, FrameCache
+
+class Camera:
+    """Captures numbered frames; each capture waits until the test releases it."""
+
+    def __init__(self):
+        self.previous = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.fail = False
+
+    async def capture(self, previous):
+        self.previous.append(previous)
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("camera unavailable")
+        n = len(self.previous)
+        return Frame(b"frame %d" % n, bytes([n]), None)
+
+    @property
+    def captures(self):
+        return len(self.previous)
+
+async def test_fresh_frame_is_served_without_capturing():
+    cache, camera = FrameCache(freshness_seconds=60), Camera()
+    first = await cache.async_get(camera.capture)
+    assert await cache.async_get(camera.capture) is first
+    assert camera.captures == 1
+
+async def test_concurrent_requests_share_one_capture():
+    cache, camera = FrameCache(), Camera()
+    camera.release.clear()
+    waiting = [asyncio.create_task(cache.async_get(camera.capture)) for _ in range(3)]
+    await asyncio.sleep(0)
+    camera.release.set()
+    frames = await asyncio.gather(*waiting)
+    assert camera.captures == 1
+    assert frames[0] is frames[1] is frames[2]
+
+async def test_cancelled_consumer_does_not_cancel_the_capture():
+    cache, camera = FrameCache(), Camera()
+    camera.release.clear()
+    cancelled = asyncio.create_task(cache.async_get(camera.capture))
+    waiting = asyncio.create_task(cache.async_get(camera.capture))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    camera.release.set()
+    assert (await waiting).content == b"frame 1"
+    assert cache.latest is not None
+
+async def test_stale_frame_is_recaptured_from_the_previous_one():
+    cache, camera = FrameCache(freshness_seconds=60), Camera()
+    first = await cache.async_get(camera.capture)
+    first.ts = time.time() - 61
+    second = await cache.async_get(camera.capture)
+    assert second is not first
+    assert camera.previous == [None, first]
+
+async def test_failed_capture_is_retried_by_the_next_request():
+    cache, camera = FrameCache(), Camera()
+    camera.fail = True
+    with pytest.raises(RuntimeError):
+        await cache.async_get(camera.capture)
+    camera.fail = False
+    assert (await cache.async_get(camera.capture)).content == b"frame 2"
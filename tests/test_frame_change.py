@@ -0,0 +1,54 @@
+import io
+import pytest
+from obico_connect.frame_change import FrameChangeDetector
+
+Image = pytest.importorskip("PIL.Image")
+
+pytestmark = pytest.mark.usefixtures("image_executor")
+
+def jpeg(gray, quality=90):
+    out = io.BytesIO()
+    Image.new("L", (64, 48), gray).save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+async def uploaded(detector, frame):
+    should_upload, signature = await detector.async_check(frame)
+    if should_upload:
+        detector.accept(signature)
+    return should_upload
+
+async def test_first_frame_is_uploaded(hass):
+    assert await uploaded(FrameChangeDetector(hass), jpeg(128))
+
+async def test_identical_frame_is_skipped(hass):
+    detector = FrameChangeDetector(hass)
+    await uploaded(detector, jpeg(128))
+    assert not await uploaded(detector, jpeg(128))
+    assert detector.frames_skipped == 1
+
+async def test_frame_below_the_threshold_is_skipped(hass):
+    detector = FrameChangeDetector(hass, threshold=0.02)
+    await uploaded(detector, jpeg(128))
+    other_bytes = jpeg(129, quality=70)  # different bytes, same picture
+    assert not await uploaded(detector, other_bytes)
+
+async def test_changed_frame_is_uploaded(hass):
+    detector = FrameChangeDetector(hass, threshold=0.02)
+    await uploaded(detector, jpeg(128))
+    assert await uploaded(detector, jpeg(0))
+    assert detector.frames_skipped == 0
+
+async def test_stale_frame_is_uploaded_even_if_unchanged(hass):
+    detector = FrameChangeDetector(hass, max_staleness_seconds=0)
+    await uploaded(detector, jpeg(128))
+    assert await uploaded(detector, jpeg(128))
+
+async def test_zero_threshold_uploads_every_frame(hass):
+    detector = FrameChangeDetector(hass, threshold=0)
+    await uploaded(detector, jpeg(128))
+    assert await uploaded(detector, jpeg(128))
+
+async def test_undecodable_frame_is_uploaded(hass):
+    detector = FrameChangeDetector(hass)
+    await uploaded(detector, jpeg(128))
+    assert await uploaded(detector, b"not a jpeg")
@@ -0,0 +1,48 @@
+import time
+from obico_connect.const import DOMAIN
+from obico_connect.gcode_file_cache import GCodeFileCache, STORAGE_VERSION
+
+def test_key_is_known_at_print_start():
+    assert GCodeFileCache.key("/prints/benchy.gcode") == "/prints/benchy.gcode"
+
+async def test_put_and_get(hass):
+    cache = GCodeFileCache(hass, "entry")
+    cache.put("benchy.gcode", 42, {"total_layers": 120})
+    entry = cache.get("benchy.gcode")
+    assert entry["id"] == 42
+    assert entry["metadata"] == {"total_layers": 120}
+    assert cache.get("other.gcode") is None
+
+async def test_least_recently_used_entry_is_evicted(hass):
+    cache = GCodeFileCache(hass, "entry", max_entries=2)
+    cache.put("a.gcode", 1)
+    cache.put("b.gcode", 2)
+    cache.get("a.gcode")
+    cache.put("c.gcode", 3)
+    assert cache.get("b.gcode") is None
+    assert cache.get("a.gcode")["id"] == 1
+    assert cache.get("c.gcode")["id"] == 3
+
+async def test_expired_entry_is_a_miss(hass):
+    cache = GCodeFileCache(hass, "entry", ttl_seconds=60)
+    cache.put("benchy.gcode", 42)
+    cache._entries["benchy.gcode"]["used"] -= 61
+    assert cache.get("benchy.gcode") is None
+
+async def test_load_skips_expired_entries(hass, hass_storage):
+    now = time.time()
+    hass_storage[f"{DOMAIN}.entry.g_code_files"] = {
+        "version": STORAGE_VERSION,
+        "minor_version": 1,
+        "key": f"{DOMAIN}.entry.g_code_files",
+        "data": {
+            "entries": {
+                "fresh.gcode": {"id": 1, "metadata": {}, "used": now},
+                "stale.gcode": {"id": 2, "metadata": {}, "used": now - 120},
+            }
+        },
+    }
+    cache = GCodeFileCache(hass, "entry", ttl_seconds=60)
+    await cache.async_load()
+    assert cache.get("fresh.gcode")["id"] == 1
+    assert cache.get("stale.gcode") is None
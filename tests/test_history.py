@@ -0,0 +1,48 @@
+import math
+from obico_connect.history import RingBuffer
+
+def samples(buffer):
+    return [(buffer.times[(buffer.start + i) % buffer.capacity], buffer.values[(buffer.start + i) % buffer.capacity]) for i in range(buffer.size)]
+
+def test_oldest_sample_is_overwritten():
+    buffer = RingBuffer(3)
+    for ts in range(1, 5):
+        buffer.append(ts, ts * 10)
+    assert buffer.size == 3
+    assert samples(buffer) == [(2, 20), (3, 30), (4, 40)]
+
+def test_downsample_per_bucket():
+    buffer = RingBuffer(3)
+    for ts in range(1, 5):
+        buffer.append(ts, ts * 10)
+    mins, maxs, means = buffer.downsample(2, 5, 3)
+    # The value held from the previous bucket counts towards min/max but not the mean
+    assert mins == [20, 20, 30]
+    assert maxs == [20, 30, 40]
+    assert means == [20, 30, 40]
+
+def test_bucket_without_samples_holds_the_previous_value():
+    buffer = RingBuffer(8)
+    buffer.append(0, 10)
+    buffer.append(3, 20)
+    mins, maxs, means = buffer.downsample(0, 4, 4)
+    assert mins == [10, 10, 10, 10]
+    assert maxs == [10, 10, 10, 20]
+    assert means == [10, 10, 10, 20]
+
+def test_unavailable_sensor_leaves_a_gap():
+    buffer = RingBuffer(8)
+    buffer.append(0, 10)
+    buffer.append(1, math.nan)
+    mins, maxs, means = buffer.downsample(0, 3, 3)
+    assert mins == [10, None, None]
+    assert means == [10, None, None]
+
+def test_samples_before_the_window_only_seed_the_held_value():
+    buffer = RingBuffer(8)
+    buffer.append(0, 5)
+    buffer.append(10, 15)
+    mins, maxs, means = buffer.downsample(5, 15, 2)
+    assert mins == [5, 5]
+    assert maxs == [5, 15]
+    assert means == [5, 15]
@@ -0,0 +1,62 @@
+import io
+import random
+import pytest
+from obico_connect.image_processing import FrameProcessingSettings, FrameProcessor, process_jpeg
+
+Image = pytest.importorskip("PIL.Image")
+
+def jpeg(image, quality=95):
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+def halves(size=(200, 100)):
+    # Left half red, right half blue
+    image = Image.new("RGB", size, (255, 0, 0))
+    image.paste((0, 0, 255), (size[0] // 2, 0, size[0], size[1]))
+    return jpeg(image)
+
+def noise(size=(320, 240)):
+    rng = random.Random(0)
+    return jpeg(Image.frombytes("RGB", size, bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] * 3))))
+
+def opened(frame):
+    return Image.open(io.BytesIO(frame))
+
+def test_frame_without_work_is_passed_through():
+    frame = halves()
+    assert process_jpeg(frame, FrameProcessingSettings(max_dimension=1280)) is frame
+
+def test_oversized_frame_is_downsized():
+    frame = process_jpeg(halves((400, 200)), FrameProcessingSettings(max_dimension=100))
+    assert opened(frame).size == (100, 50)
+
+def test_rotation_is_clockwise():
+    frame = process_jpeg(halves(), FrameProcessingSettings(rotation=90))
+    image = opened(frame).convert("RGB")
+    assert image.size == (100, 200)
+    red, _, blue = image.getpixel((50, 20))
+    assert red > 200 and blue < 50  # the left (red) half is on top now
+
+def test_horizontal_flip():
+    image = opened(process_jpeg(halves(), FrameProcessingSettings(flip_h=True))).convert("RGB")
+    red, _, blue = image.getpixel((20, 50))
+    assert blue > 200 and red < 50
+
+def test_negative_rotation_is_normalized():
+    assert FrameProcessingSettings(rotation=-90).rotation == 270
+
+def test_frame_is_reencoded_into_the_byte_budget():
+    frame = noise()
+    lowest = process_jpeg(frame, FrameProcessingSettings(quality=40, rotation=180))
+    budgeted = process_jpeg(frame, FrameProcessingSettings(max_bytes=len(lowest), rotation=180))
+    unbudgeted = process_jpeg(frame, FrameProcessingSettings(rotation=180))
+    assert len(budgeted) <= len(lowest) < len(unbudgeted)
+
+def test_budget_is_best_effort_at_the_lowest_quality():
+    frame = noise()
+    assert process_jpeg(frame, FrameProcessingSettings(max_bytes=100))  # can't fit, sent at the lowest quality
+
+async def test_unprocessable_frame_is_uploaded_unchanged(hass, image_executor):
+    processor = FrameProcessor(hass, FrameProcessingSettings(rotation=90))
+    assert await processor.async_process(b"not a jpeg") == b"not a jpeg"
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from obico_connect import jpeg_poster as jpeg_poster_module
+from obico_connect.fleet import async_get_fleet
+from obico_connect.jpeg_poster import JpegPoster
+from obico_connect.const import POST_PIC_INTERVAL_SECONDS, SNAPSHOT_INTERVAL_FIRST_LAYERS, SNAPSHOT_INTERVAL_IDLE, SNAPSHOT_INTERVAL_VIEWING
+
+LAYER_ENTITY_ID = "sensor.printer_current_layer"
+
+class Printer:
+    """What JpegPoster reads from the component: the printer's activity and current layer, and the fleet it's in."""
+
+    def __init__(self, activity="idle", current_layer=None):
+        self.config_entry = SimpleNamespace(entry_id="entry")
+        self.fleet = None
+        self.activity = activity
+        self.snapshot = SimpleNamespace(current_layer=current_layer)
+        self.entity_map = SimpleNamespace(entity_id=lambda field: LAYER_ENTITY_ID)
+
+    def print_activity(self):
+        return self.activity
+
+    def print_activity_entity_ids(self):
+        return [LAYER_ENTITY_ID]
+
+def webcam(entity_id="camera.printer", interval_factor=1.0, last_post_ts=0):
+    return SimpleNamespace(entity_id=entity_id, interval_factor=interval_factor, last_post_ts=last_post_ts)
+
+class Uploads:
+    """Stands in for post_pic_to_server: each upload takes a little while, and the most that ran at once is kept."""
+
+    def __init__(self, duration=0.02):
+        self.duration = duration
+        self.posted = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, webcam):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self.in_flight -= 1
+        self.posted.append(webcam.entity_id)
+        return True
+
+def poster_for(hass, printer, webcams=None):
+    printer.fleet = async_get_fleet(hass)
+    poster = JpegPoster(hass, webcams or [webcam()], printer)
+    poster.post_pic_to_server = AsyncMock(return_value=True)
+    return poster
+
+async def until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met")
+        await asyncio.sleep(0.01)
+
+@pytest.fixture
+def fast_schedule(monkeypatch):
+    for name in ("POST_PIC_INTERVAL_SECONDS", "SNAPSHOT_INTERVAL_IDLE", "SNAPSHOT_INTERVAL_VIEWING"):
+        monkeypatch.setattr(jpeg_poster_module, name, 0.05)
+    monkeypatch.setattr(jpeg_poster_module, "SNAPSHOT_MIN_GAP_SECONDS", 0.0)
+
+async def test_interval_follows_the_printer(hass):
+    printer = Printer("offline")
+    poster = poster_for(hass, printer)
+    assert poster.current_interval() is None
+    printer.activity = "idle"
+    assert poster.current_interval() == SNAPSHOT_INTERVAL_IDLE
+    printer.activity = "printing"
+    assert poster.current_interval() == POST_PIC_INTERVAL_SECONDS
+    printer.snapshot.current_layer = 2
+    assert poster.current_interval() == SNAPSHOT_INTERVAL_FIRST_LAYERS
+    printer.snapshot.current_layer = 10
+    assert poster.current_interval() == POST_PIC_INTERVAL_SECONDS
+
+async def test_viewing_boost(hass):
+    poster = poster_for(hass, Printer("offline"))
+    poster.set_viewing_boost(True)
+    assert poster.current_interval() == SNAPSHOT_INTERVAL_VIEWING
+    poster.set_viewing_boost(False)
+    assert poster.current_interval() is None
+
+async def test_snapshots_repeat_at_the_interval(hass, fast_schedule):
+    poster = poster_for(hass, Printer("idle"))
+    poster.start()
+    await until(lambda: poster.post_pic_to_server.call_count >= 3)
+    await poster.stop()
+
+async def test_snapshots_are_suspended_while_offline(hass, fast_schedule):
+    poster = poster_for(hass, Printer("offline"))
+    poster.start()
+    await asyncio.sleep(0.2)
+    assert not poster.post_pic_to_server.called
+    poster.set_viewing_boost(True)  # wakes the loop up
+    await until(lambda: poster.post_pic_to_server.called)
+    await poster.stop()
+
+async def test_layer_change_triggers_an_extra_snapshot(hass, monkeypatch):
+    monkeypatch.setattr(jpeg_poster_module, "SNAPSHOT_MIN_GAP_SECONDS", 0.0)
+    poster = poster_for(hass, Printer("printing", current_layer=10), [webcam(last_post_ts=time.time())])  # next one due a whole interval from now
+    poster.start()
+    hass.states.async_set(LAYER_ENTITY_ID, "10")
+    await hass.async_block_till_done()
+    await asyncio.sleep(0.05)
+    assert not poster.post_pic_to_server.called
+    hass.states.async_set(LAYER_ENTITY_ID, "11")
+    await until(lambda: poster.post_pic_to_server.called)
+    assert poster.post_pic_to_server.call_count == 1
+    await poster.stop()
+
+async def test_webcams_due_in_the_same_slot_are_captured_concurrently(hass, fast_schedule):
+    poster = poster_for(hass, Printer("idle"), [webcam("camera.printer"), webcam("camera.nozzle")])
+    uploads = poster.post_pic_to_server.side_effect = Uploads()
+    poster.start()
+    await until(lambda: len(uploads.posted) >= 2)
+    await poster.stop()
+    assert sorted(uploads.posted[:2]) == ["camera.nozzle", "camera.printer"]
+    assert uploads.peak == 2
+
+async def test_secondary_webcam_follows_its_own_interval(hass, fast_schedule):
+    poster = poster_for(hass, Printer("idle"), [webcam("camera.printer"), webcam("camera.chamber", interval_factor=1000, last_post_ts=time.time())])
+    poster.start()
+    await until(lambda: poster.post_pic_to_server.call_count >= 3)
+    await poster.stop()
+    assert {call.args[0].entity_id for call in poster.post_pic_to_server.call_args_list} == {"camera.printer"}
+
+async def test_capture_slots_bound_concurrent_uploads(hass, fast_schedule):
+    poster = poster_for(hass, Printer("idle"), [webcam("camera.printer"), webcam("camera.nozzle")])
+    del poster.post_pic_to_server  # the real one, which takes a capture slot per attempt
+    poster.plugin.fleet.capture_slots = asyncio.Semaphore(1)
+    uploads = poster._capture_and_upload = Uploads()
+    poster.start()
+    await until(lambda: len(uploads.posted) >= 2)
+    await poster.stop()
+    assert uploads.peak == 1
+
+async def test_capture_slot_is_released_while_backing_off(hass, monkeypatch):
+    monkeypatch.setattr(random, "uniform", lambda low, high: 0.05)  # backoff's jitter: a short, fixed wait before the retry
+    printer_camera, nozzle_camera = webcam("camera.printer"), webcam("camera.nozzle")
+    poster = poster_for(hass, Printer("idle"), [printer_camera, nozzle_camera])
+    del poster.post_pic_to_server
+    poster.plugin.fleet.capture_slots = asyncio.Semaphore(1)
+    attempts = []
+
+    async def capture_and_upload(webcam):
+        attempts.append(webcam.entity_id)
+        return len(attempts) > 1  # the very first attempt fails and is retried
+
+    poster._capture_and_upload = capture_and_upload
+    await asyncio.gather(poster.post_pic_to_server(printer_camera), poster.post_pic_to_server(nozzle_camera))
+    assert attempts == ["camera.printer", "camera.nozzle", "camera.printer"]  # the nozzle camera went while the printer camera waited
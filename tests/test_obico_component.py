@@ -0,0 +1,103 @@
+import time
+from datetime import timedelta
+from unittest.mock import AsyncMock
+import pytest
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
+from obico_connect.const import (
+    DOMAIN, CONF_AUTH_TOKEN, CONF_ENDPOINT_PREFIX, CONF_NOZZLE_CAMERA, CONF_STATUS_DELTA_ENCODING, CONF_TIMELAPSE, STARTUP_STAGGER_SECONDS, WEBCAM_ROLE_PRIMARY, WEBCAM_ROLE_NOZZLE,
+)
+from obico_connect.obico_component import ObicoComponent
+
+DATA = {
+    CONF_AUTH_TOKEN: "token",
+    CONF_ENDPOINT_PREFIX: "https://app.obico.io",
+    "camera_entity_id": "camera.printer",
+    "printer_device_id": "device",
+    "device_type": "Bambu Lab",
+}
+
+def config_entry(hass, options=None):
+    entry = MockConfigEntry(domain=DOMAIN, title="Printer", data=DATA, options=options or {})
+    entry.add_to_hass(hass)
+    return entry
+
+async def shutdown(hass, component):
+    # Joins the outbox thread too, so that none outlives the test
+    executor = component.outbox._executor
+    await component.shutdown()
+    if executor:
+        await hass.async_add_executor_job(executor.shutdown, True)
+
+@pytest.fixture
+async def component(hass, config_dir):
+    component = ObicoComponent(hass, config_entry(hass))
+    yield component
+    await shutdown(hass, component)
+
+async def test_construction(hass, component):
+    assert component.device_type == "bambu_lab"
+    assert component.print_job_tracker.plugin is component
+    assert component.timelapse is None  # opt-in
+    assert [(webcam.entity_id, webcam.role) for webcam in component.jpeg_poster.webcams] == [("camera.printer", WEBCAM_ROLE_PRIMARY)]
+    assert component.is_configured()
+
+async def test_load_and_local_setup(hass, config_dir):
+    component = ObicoComponent(hass, config_entry(hass))
+    await component.async_load()
+    assert component.outbound.outbox is component.outbox
+    component.setup()  # Home Assistant is running, so the network start is already scheduled
+    assert component.print_job_tracker.phase is None  # no printer entities in the registry
+    await shutdown(hass, component)
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=STARTUP_STAGGER_SECONDS + 1))
+    await hass.async_block_till_done()
+    assert component.ws_client is None  # shutdown cancelled the network start
+    assert component.status_pusher is None
+
+async def test_options(hass, config_dir):
+    entry = config_entry(hass, {CONF_TIMELAPSE: True, CONF_NOZZLE_CAMERA: "camera.nozzle"})
+    component = ObicoComponent(hass, entry)
+    try:
+        assert component.timelapse.directory.endswith(entry.entry_id)
+        assert [(webcam.entity_id, webcam.role) for webcam in component.jpeg_poster.webcams] == [
+            ("camera.printer", WEBCAM_ROLE_PRIMARY),
+            ("camera.nozzle", WEBCAM_ROLE_NOZZLE),
+        ]
+    finally:
+        await shutdown(hass, component)
+
+def sent_history(component):
+    msg = component.send_ws_msg_to_server.await_args.args[0]
+    return msg.get("delta", msg).get("status", {}).get("history")
+
+async def sending(hass, options=None):
+    component = ObicoComponent(hass, config_entry(hass, options))
+    component.send_ws_msg_to_server = AsyncMock(return_value=True)
+    component.history.buffers["tool0"].append(time.time() - 5, 210.0)
+    return component
+
+async def test_history_rides_on_heartbeats_only(hass, config_dir):
+    component = await sending(hass)
+    try:
+        await component.send_status_to_server({"status": {"_ts": 1}})
+        assert sent_history(component) is None
+        await component.post_update_to_server(with_history=True)  # a heartbeat
+        await component.send_status_to_server({"status": {"_ts": 2}})
+        assert sent_history(component)["tool0"]["max"][-1] == 210.0
+        await component.send_status_to_server({"status": {"_ts": 3}})
+        assert sent_history(component) is None
+    finally:
+        await shutdown(hass, component)
+
+async def test_history_rides_on_full_snapshots_outside_the_delta_state(hass, config_dir):
+    component = await sending(hass, {CONF_STATUS_DELTA_ENCODING: True})
+    try:
+        payload = {"status": {"_ts": 1}}
+        await component.send_status_to_server(payload)
+        assert sent_history(component)
+        assert "history" not in payload["status"]
+        await component.send_status_to_server({"status": {"_ts": 2}})
+        assert component.send_ws_msg_to_server.await_args.args[0] == {"delta": {"status": {"_ts": 2}}}
+    finally:
+        await shutdown(hass, component)
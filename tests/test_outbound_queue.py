@@ -0,0 +1,92 @@
+import asyncio
+from obico_connect.outbound_queue import OutboundQueue
+
+class Server:
+    """Records what the queue sends, in order."""
+
+    def __init__(self):
+        self.sent = []
+        self.fail_with = None
+
+    async def send_status(self, msg):
+        return self._send("status", msg)
+
+    async def send_event(self, msg):
+        return self._send("event", msg)
+
+    def _send(self, lane, msg):
+        if self.fail_with:
+            raise self.fail_with
+        self.sent.append((lane, msg))
+        return True
+
+    async def wait_connected(self):
+        pass
+
+async def drain(queue):
+    for _ in range(100):
+        if not queue.depth():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"{queue.depth()} messages still queued")
+
+async def test_status_is_latest_wins():
+    server = Server()
+    queue = OutboundQueue(server.send_status, server.send_event, server.wait_connected)
+    queue.put_status({"n": 1})
+    queue.put_status({"n": 2})
+    assert queue.depth() == 1
+    queue.start()
+    await drain(queue)
+    await queue.stop()
+    assert server.sent == [("status", {"n": 2})]
+    assert queue.stats()["status_coalesced"] == 1
+    assert queue.stats()["sent"] == 1
+
+async def test_events_keep_their_order_and_go_before_status():
+    server = Server()
+    queue = OutboundQueue(server.send_status, server.send_event, server.wait_connected)
+    queue.put_status({"n": 1})
+    for n in range(3):
+        assert queue.put_event_nowait({"event": n})
+    queue.start()
+    await drain(queue)
+    await queue.stop()
+    assert server.sent == [("event", {"event": 0}), ("event", {"event": 1}), ("event", {"event": 2}), ("status", {"n": 1})]
+
+async def test_full_event_lane_rejects_events():
+    server = Server()
+    queue = OutboundQueue(server.send_status, server.send_event, server.wait_connected, max_events=2)
+    assert queue.put_event_nowait({"event": 0})
+    assert queue.put_event_nowait({"event": 1})
+    assert not queue.put_event_nowait({"event": 2})
+    assert queue.stats()["events_enqueued"] == 2
+    assert queue.stats()["events_dropped"] == 1
+
+async def test_unsendable_message_is_dropped():
+    server = Server()
+    server.fail_with = ValueError("not serializable")
+    queue = OutboundQueue(server.send_status, server.send_event, server.wait_connected)
+    queue.put_event_nowait({"event": 0})
+    queue.start()
+    await drain(queue)
+    await queue.stop()
+    assert server.sent == []
+    assert queue.stats()["send_failures"] == 1
+
+async def test_nothing_is_sent_before_the_connection_is_up():
+    server = Server()
+    connected = asyncio.Event()
+
+    async def wait_connected():
+        await connected.wait()
+
+    queue = OutboundQueue(server.send_status, server.send_event, wait_connected)
+    queue.put_event_nowait({"event": 0})
+    queue.start()
+    await asyncio.sleep(0)
+    assert server.sent == []
+    connected.set()
+    await drain(queue)
+    await queue.stop()
+    assert server.sent == [("event", {"event": 0})]
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from obico_connect.outbox import EventOutbox
+from obico_connect.outbound_queue import OutboundQueue
+
+async def close(hass, outbox):
+    # Joins the outbox thread too, so that none outlives the test
+    executor = outbox._executor
+    await outbox.async_close()
+    await hass.async_add_executor_job(executor.shutdown, True)
+
+@pytest.fixture
+async def outbox(hass, config_dir):
+    outbox = EventOutbox(hass, "entry")
+    await outbox.async_open()
+    yield outbox
+    await close(hass, outbox)
+
+async def test_events_are_read_oldest_first(outbox):
+    for n in range(3):
+        assert await outbox.async_append({"event": n}) == 0
+    assert outbox.count == 3
+    batch = await outbox.async_read_batch(2)
+    assert [msg for _, msg in batch] == [{"event": 0}, {"event": 1}]
+    await outbox.async_delete([row_id for row_id, _ in batch])
+    assert outbox.count == 1
+    assert [msg for _, msg in await outbox.async_read_batch(10)] == [{"event": 2}]
+
+async def test_oldest_events_are_dropped_over_the_cap(hass, config_dir):
+    outbox = EventOutbox(hass, "entry", max_events=2)
+    await outbox.async_open()
+    await outbox.async_append({"event": 0})
+    await outbox.async_append({"event": 1})
+    assert await outbox.async_append({"event": 2}) == 1
+    assert outbox.count == 2
+    assert [msg for _, msg in await outbox.async_read_batch(10)] == [{"event": 1}, {"event": 2}]
+    await close(hass, outbox)
+
+async def test_events_survive_a_restart(hass, config_dir):
+    outbox = EventOutbox(hass, "entry")
+    await outbox.async_open()
+    await outbox.async_append({"event": 0})
+    await close(hass, outbox)
+
+    reopened = EventOutbox(hass, "entry")
+    await reopened.async_open()
+    assert reopened.count == 1
+    assert [msg for _, msg in await reopened.async_read_batch(10)] == [{"event": 0}]
+    await close(hass, reopened)
+
+async def test_expired_events_are_dropped_on_open(hass, config_dir):
+    outbox = EventOutbox(hass, "entry")
+    await outbox.async_open()
+    await outbox.async_append({"event": 0})
+    await close(hass, outbox)
+
+    reopened = EventOutbox(hass, "entry", max_age_seconds=-1)
+    await reopened.async_open()
+    assert reopened.count == 0
+    await close(hass, reopened)
+
+async def test_queue_replays_and_deletes_persisted_events(outbox):
+    sent = []
+
+    async def send(msg):
+        sent.append(msg)
+        return True
+
+    async def wait_connected():
+        pass
+
+    queue = OutboundQueue(send, send, wait_connected, outbox=outbox)
+    for n in range(3):
+        queue.put_event_nowait({"event": n})
+    queue.start()
+    for _ in range(100):
+        if len(sent) == 3 and not outbox.count:
+            break
+        await asyncio.sleep(0.01)
+    await queue.stop()
+    assert sent == [{"event": 0}, {"event": 1}, {"event": 2}]
+    assert outbox.count == 0
+    assert queue.stats()["events_enqueued"] == 3
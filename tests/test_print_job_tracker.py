@@ -0,0 +1,154 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from obico_connect.print_job_tracker import PrintJobTracker
+
+class Snapshot:
+    """Just the printer status fields the tracker reads, changed through update() like the real snapshot's state changes."""
+
+    def __init__(self, **fields):
+        self.device_type = "bambu_lab"
+        self.bambu_status = None
+        self.print_status = None
+        self.current_stage = None
+        self.gcode_filename = "benchy.gcode"
+        self.total_layers = None
+        self.print_time = None
+        self.start_time = None
+        self.g_code_file_id = None
+        self._listeners = []
+        self.__dict__.update(fields)
+
+    def async_add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def set_g_code_file_id(self, g_code_file_id):
+        self.g_code_file_id = g_code_file_id
+
+    def payload(self, current_print_ts=-1):
+        return {"current_print_ts": current_print_ts, "g_code_file_id": self.g_code_file_id}
+
+    def update(self, **fields):
+        self.__dict__.update(fields)
+        for listener in self._listeners:
+            listener(list(fields))
+
+class Outbound:
+    def __init__(self):
+        self.events = []
+
+    def put_event_nowait(self, msg):
+        self.events.append(msg)
+        return True
+
+    def event_types(self):
+        return [msg["event"]["event_type"] for msg in self.events]
+
+def tracker_for(hass, snapshot, timelapse=None):
+    plugin = SimpleNamespace(
+        config_entry=SimpleNamespace(entry_id="entry"), snapshot=snapshot, outbound=Outbound(), post_update_to_server=AsyncMock(), timelapse=timelapse)
+    tracker = PrintJobTracker(hass, plugin)
+    tracker.async_start()
+    return tracker
+
+@pytest.fixture(autouse=True)
+def server_request(monkeypatch):
+    # G-code file lookups on a cache miss; the server doesn't know the file unless a test says otherwise
+    request = AsyncMock(return_value=None)
+    monkeypatch.setattr("obico_connect.print_job_tracker.server_request", request)
+    return request
+
+@pytest.fixture
+def snapshot():
+    return Snapshot(bambu_status="idle")
+
+async def test_print_start_to_done(hass, snapshot):
+    tracker = tracker_for(hass, snapshot, timelapse=SimpleNamespace(async_finish=AsyncMock()))
+    snapshot.update(bambu_status="running")
+    print_ts = tracker.current_print_ts
+    assert print_ts != -1
+    snapshot.update(bambu_status="finish")
+    outbound = tracker.plugin.outbound
+    assert outbound.event_types() == ["PrintStarted", "PrintDone"]
+    assert [msg["current_print_ts"] for msg in outbound.events] == [print_ts, print_ts]  # the last event still carries the print
+    assert tracker.current_print_ts == -1
+    await hass.async_block_till_done()
+    tracker.plugin.timelapse.async_finish.assert_awaited_once_with(print_ts, True)  # the print's timelapse is uploaded
+
+async def test_pause_and_resume(hass, snapshot):
+    tracker = tracker_for(hass, snapshot)
+    for status in ("running", "pause", "running", "finish"):
+        snapshot.update(bambu_status=status)
+    assert tracker.plugin.outbound.event_types() == ["PrintStarted", "PrintPaused", "PrintResumed", "PrintDone"]
+
+async def test_back_to_idle_fails_the_print(hass, snapshot):
+    tracker = tracker_for(hass, snapshot)
+    snapshot.update(bambu_status="running")
+    snapshot.update(bambu_status="idle")
+    assert tracker.plugin.outbound.events[-1]["event"]["data"] == {"name": "benchy.gcode", "reason": "stopped"}
+
+async def test_moonraker_cancelled(hass):
+    snapshot = Snapshot(device_type="moonraker", print_status="ready", current_stage="standby")
+    tracker = tracker_for(hass, snapshot)
+    snapshot.update(current_stage="printing")
+    snapshot.update(current_stage="cancelled")
+    assert tracker.plugin.outbound.event_types() == ["PrintStarted", "PrintFailed"]
+    assert tracker.plugin.outbound.events[-1]["event"]["data"]["reason"] == "cancelled"
+
+async def test_printer_going_offline_keeps_the_print(hass, snapshot):
+    tracker = tracker_for(hass, snapshot)
+    snapshot.update(bambu_status="running")
+    print_ts = tracker.current_print_ts
+    snapshot.update(bambu_status=None)
+    snapshot.update(bambu_status="running")
+    assert tracker.plugin.outbound.event_types() == ["PrintStarted"]
+    assert tracker.current_print_ts == print_ts
+
+async def test_print_running_at_start_is_recovered_not_started(hass):
+    snapshot = Snapshot(bambu_status="running", print_time=600)
+    tracker = tracker_for(hass, snapshot)
+    assert tracker.plugin.outbound.events == []
+    assert abs(tracker.current_print_ts - (time.time() - 600)) <= 1
+    snapshot.update(bambu_status="finish")
+    assert tracker.plugin.outbound.event_types() == ["PrintDone"]
+
+async def test_cached_file_id_is_reported_from_the_first_event(hass, snapshot):
+    tracker = tracker_for(hass, snapshot)
+    tracker.file_cache.put("benchy.gcode", 42, {"total_layers": 120})
+    snapshot.update(bambu_status="running")
+    assert tracker.plugin.outbound.events[0]["g_code_file_id"] == 42
+
+async def test_cached_file_id_of_another_slice_is_dropped(hass, snapshot):
+    tracker = tracker_for(hass, snapshot)
+    tracker.file_cache.put("benchy.gcode", 42, {"total_layers": 120})
+    snapshot.update(bambu_status="running")
+    snapshot.update(total_layers=80)  # same name, re-sliced
+    assert snapshot.g_code_file_id is None
+
+async def test_cache_miss_is_looked_up_on_the_server(hass, snapshot, server_request):
+    server_request.return_value = {"id": 42, "filename": "benchy.gcode"}
+    tracker = tracker_for(hass, snapshot)
+    tracker.async_start_network()
+    snapshot.update(total_layers=120)
+    snapshot.update(bambu_status="running")
+    await hass.async_block_till_done()
+    assert server_request.await_args.kwargs["data"]["filename"] == "benchy.gcode"
+    assert snapshot.g_code_file_id == 42
+    assert tracker.file_cache.get("benchy.gcode")["metadata"]["total_layers"] == 120
+    tracker.plugin.post_update_to_server.assert_awaited_once()
+
+async def test_print_found_when_the_sensors_come_back_is_recovered(hass):
+    snapshot = Snapshot(bambu_status=None)  # sensors still unavailable at setup
+    tracker = tracker_for(hass, snapshot)
+    snapshot.update(bambu_status="running", print_time=600)
+    assert tracker.plugin.outbound.events == []
+    assert abs(tracker.current_print_ts - (time.time() - 600)) <= 1
+
+async def test_lookup_of_a_recovered_print_waits_for_the_network_start(hass, server_request):
+    tracker = tracker_for(hass, Snapshot(bambu_status="running", print_time=600))
+    await hass.async_block_till_done()
+    assert not server_request.called
+    tracker.async_start_network()
+    await hass.async_block_till_done()
+    assert server_request.await_args.kwargs["data"]["filename"] == "benchy.gcode"
@@ -0,0 +1,44 @@
+import datetime
+import json
+import pytest
+from obico_connect import serializers
+from obico_connect.serializers import JsonSerializer, encode_default, negotiate, offered_subprotocols
+
+def test_text_backends_offer_no_subprotocol():
+    assert offered_subprotocols("auto") == ()
+    assert offered_subprotocols("json") == ()
+    assert offered_subprotocols("orjson") == ()
+
+def test_binary_backend_offers_its_subprotocol():
+    pytest.importorskip("msgpack")
+    assert offered_subprotocols("msgpack") == ("obico.msgpack",)
+
+def test_missing_backend_library_offers_nothing(monkeypatch):
+    monkeypatch.setattr(serializers, "create_serializer", lambda name: None)
+    assert offered_subprotocols("msgpack") == ()
+
+def test_accepted_subprotocol_picks_the_binary_backend():
+    pytest.importorskip("msgpack")
+    serializer = negotiate("msgpack", "obico.msgpack")
+    assert serializer.binary
+    assert serializer.loads(serializer.dumps({"a": 1})) == {"a": 1}
+
+def test_server_without_the_subprotocol_falls_back_to_text():
+    serializer = negotiate("msgpack", None)
+    assert not serializer.binary
+    assert serializer.name in ("json", "orjson")
+
+def test_json_is_used_when_configured():
+    assert isinstance(negotiate("json", None), JsonSerializer)
+
+def test_json_output_is_compact():
+    assert JsonSerializer().dumps({"a": [1, 2]}) == '{"a":[1,2]}'
+
+def test_non_json_types_in_status():
+    started = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    data = json.loads(JsonSerializer().dumps({"eta": datetime.timedelta(minutes=2), "started": started, "tags": {"a"}}))
+    assert data == {"eta": 120.0, "started": "2026-01-02T03:04:05", "tags": ["a"]}
+
+def test_unknown_types_are_not_stringified():
+    with pytest.raises(TypeError):
+        encode_default(object())
@@ -0,0 +1,69 @@
+import datetime
+from obico_connect.entity_map import EntityMap
+from obico_connect.snapshot import PrinterSnapshot
+
+def snapshot_for(hass, device_type="bambu_lab"):
+    snapshot = PrinterSnapshot(hass, EntityMap(hass, "printer", device_type), device_type)
+    snapshot.async_start()
+    return snapshot
+
+async def test_states_are_converted_on_ingest(hass):
+    hass.states.async_set("sensor.printer_print_status", "RUNNING")
+    hass.states.async_set("sensor.printer_nozzle_temperature", "215.5")
+    hass.states.async_set("sensor.printer_current_layer", "12")
+    snapshot = snapshot_for(hass)
+    assert snapshot.bambu_status == "running"
+    assert snapshot.nozzle_temperature == 215.5
+    assert snapshot.current_layer == 12
+    assert snapshot.payload()["status"]["state"]["flags"]["printing"]
+    snapshot.async_stop()
+
+async def test_unavailable_and_unparsable_states_are_none(hass):
+    hass.states.async_set("sensor.printer_bed_temperature", "unavailable")
+    hass.states.async_set("sensor.printer_current_layer", "not a number")
+    snapshot = snapshot_for(hass)
+    assert snapshot.bed_temperature is None
+    assert snapshot.current_layer is None
+    assert snapshot.payload()["status"]["temperatures"]["bed"]["actual"] == 0.0
+    snapshot.async_stop()
+
+async def test_state_change_only_re_renders_the_sections_it_feeds(hass):
+    hass.states.async_set("sensor.printer_nozzle_temperature", "200")
+    hass.states.async_set("sensor.printer_gcode_filename", "benchy.gcode")
+    snapshot = snapshot_for(hass)
+    before = snapshot.payload()["status"]
+
+    hass.states.async_set("sensor.printer_nozzle_temperature", "210")
+    await hass.async_block_till_done()
+    after = snapshot.payload()["status"]
+    assert after["temperatures"]["tool0"]["actual"] == 210.0
+    assert after["temperatures"] is not before["temperatures"]
+    assert after["job"] is before["job"]
+    assert after["state"] is before["state"]
+    snapshot.async_stop()
+
+async def test_bambu_print_time_comes_from_start_and_end_time(hass):
+    hass.states.async_set("sensor.printer_start_time", "2026-01-02 10:00:00")
+    hass.states.async_set("sensor.printer_end_time", "2026-01-02 11:30:00")
+    snapshot = snapshot_for(hass)
+    assert snapshot.total_print_time == datetime.timedelta(hours=1, minutes=30)
+    assert snapshot.payload()["status"]["progress"]["printTime"] == "1:30:00"
+    snapshot.async_stop()
+
+async def test_listeners_get_the_changed_fields(hass):
+    snapshot = snapshot_for(hass)
+    changes = []
+    snapshot.async_add_listener(changes.append)
+    hass.states.async_set("sensor.printer_print_status", "RUNNING")
+    hass.states.async_set("sensor.printer_print_status", "RUNNING", {"friendly_name": "Print status"})  # same state
+    await hass.async_block_till_done()
+    assert changes == [["bambu_status"]]
+    snapshot.async_stop()
+
+async def test_g_code_file_id_is_reported_with_the_job(hass):
+    snapshot = snapshot_for(hass)
+    before = snapshot.payload()["status"]["job"]
+    assert "obico_g_code_file_id" not in before["file"]
+    snapshot.set_g_code_file_id(42)
+    assert snapshot.payload()["status"]["job"]["file"]["obico_g_code_file_id"] == 42
+    snapshot.async_stop()
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from obico_connect.fleet import async_get_fleet
+from obico_connect.status_push import StatusPusher
+
+NOZZLE = "sensor.printer_nozzle_temperature"
+PROGRESS = "sensor.printer_print_progress"
+STAGE = "sensor.printer_current_stage"
+
+FIELDS_BY_ENTITY = {
+    NOZZLE: [("nozzle_temperature", float)],
+    PROGRESS: [("percent_progress", float), ("percent_print_progress", float)],
+    STAGE: [("bambu_status", str)],
+}
+
+def pusher_for(hass, fields_by_entity=FIELDS_BY_ENTITY):
+    plugin = SimpleNamespace(fleet=async_get_fleet(hass), config_entry=SimpleNamespace(entry_id="entry"))
+    pusher = StatusPusher(hass, plugin, fields_by_entity, deadbands={"nozzle_temperature": 1.0, "percent_progress": 0.5, "percent_print_progress": 0.25})
+    pusher.start()
+    return pusher
+
+async def changed(hass, pusher, entity_id, state):
+    # Whether the state change opened a push window; the window is then closed for the next change
+    hass.states.async_set(entity_id, state)
+    await hass.async_block_till_done()
+    scheduled = pusher._unsub_debounce is not None
+    if scheduled:
+        pusher._unsub_debounce()
+        pusher._unsub_debounce = None
+    return scheduled
+
+def test_deadbands_follow_the_fields_a_sensor_feeds():
+    pusher = StatusPusher(None, None, FIELDS_BY_ENTITY, deadbands={"nozzle_temperature": 1.0, "percent_progress": 0.5, "percent_print_progress": 0.25})
+    assert pusher.deadbands == {NOZZLE: 1.0, PROGRESS: 0.5, STAGE: 0}  # the widest band of a shared sensor wins
+
+async def test_change_within_the_deadband_is_not_pushed(hass):
+    pusher = pusher_for(hass)
+    assert await changed(hass, pusher, NOZZLE, "210.0")
+    assert not await changed(hass, pusher, NOZZLE, "210.6")
+    assert await changed(hass, pusher, NOZZLE, "211.2")
+    pusher.stop()
+
+async def test_field_without_a_deadband_pushes_every_change(hass):
+    pusher = pusher_for(hass)
+    assert await changed(hass, pusher, STAGE, "printing")
+    assert await changed(hass, pusher, STAGE, "paused")
+    assert not await changed(hass, pusher, STAGE, "paused")
+    pusher.stop()
+
+async def test_non_numeric_state_is_always_a_change(hass):
+    pusher = pusher_for(hass)
+    assert await changed(hass, pusher, PROGRESS, "40")
+    assert await changed(hass, pusher, PROGRESS, "unavailable")
+    pusher.stop()
@@ -0,0 +1,38 @@
+from obico_connect.timelapse import FrameSegment
+
+def segment_in(tmp_path, **kwargs):
+    segment = FrameSegment(str(tmp_path / "1700000000"), **kwargs)
+    segment.open()
+    return segment
+
+def test_frames_are_read_back_in_capture_order(tmp_path):
+    segment = segment_in(tmp_path)
+    for n in range(3):
+        segment.append(bytes([n]) * 10, 1700000000 + n)
+    assert segment.frame_count == 3
+    assert [bytes(frame) for frame in segment.frames()] == [b"\x00" * 10, b"\x01" * 10, b"\x02" * 10]
+    segment.close()
+
+def test_data_file_grows_past_the_mapping(tmp_path):
+    segment = segment_in(tmp_path, grow_bytes=16)
+    segment.append(b"a" * 10, 1)
+    segment.append(b"b" * 10, 2)  # doesn't fit the first 16 bytes
+    assert [bytes(frame) for frame in segment.frames()] == [b"a" * 10, b"b" * 10]
+    segment.close()
+
+def test_reopened_segment_keeps_its_frames(tmp_path):
+    segment = segment_in(tmp_path, grow_bytes=16)
+    segment.append(b"a" * 10, 1)
+    segment.close()
+
+    reopened = segment_in(tmp_path, grow_bytes=16)
+    assert reopened.frame_count == 1
+    reopened.append(b"b" * 4, 2)
+    assert [bytes(frame) for frame in reopened.frames()] == [b"a" * 10, b"b" * 4]
+    reopened.close()
+
+def test_remove_deletes_both_files(tmp_path):
+    segment = segment_in(tmp_path)
+    segment.append(b"a", 1)
+    segment.remove()
+    assert list(tmp_path.iterdir()) == []
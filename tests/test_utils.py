@@ -0,0 +1,30 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import Mock
+import pytest
+from obico_connect.utils import server_request
+
+class Response:
+    def __init__(self, error):
+        self.error = error
+
+    async def __aenter__(self):
+        raise self.error
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+def plugin_failing_with(error):
+    session = SimpleNamespace(request=lambda method, url, **kwargs: Response(error))
+    return SimpleNamespace(endpoint_prefix="https://app.obico.io", auth_headers=dict, metrics=Mock(), http_session=session)
+
+async def test_timeout_counts_as_a_failed_request():
+    plugin = plugin_failing_with(asyncio.TimeoutError())
+    assert await server_request('GET', '/api/v1/octo/printer/', plugin) is None
+    plugin.metrics.error.assert_called_once_with('rest')
+
+async def test_failure_is_raised_on_request():
+    plugin = plugin_failing_with(asyncio.TimeoutError())
+    with pytest.raises(asyncio.TimeoutError):
+        await server_request('GET', '/api/v1/octo/printer/', plugin, raise_exception=True)
+    plugin.metrics.error.assert_called_once_with('rest')
@@ -0,0 +1,167 @@
+import asyncio
+from unittest.mock import Mock
+import aiohttp
+import pytest
+from obico_connect import ws as ws_module
+from obico_connect.ws import WebSocketClient
+
+class FakeWebSocket:
+    """Client side of one server connection: the test feeds it messages and closes it from the server end.
+
+    Pings are answered unless the link is dead.
+    """
+
+    def __init__(self, dead=False):
+        self.messages = asyncio.Queue()
+        self.closed = False
+        self.close_code = None
+        self.dead = dead
+        self.sent = []
+        self.pongs = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        msg = await self.messages.get()
+        if msg is None:
+            raise StopAsyncIteration
+        return msg
+
+    def receive(self, data):
+        self.messages.put_nowait(aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, data, None))
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            self.close_code = 1000
+            self.messages.put_nowait(None)
+
+    async def send_str(self, data):
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def ping(self, data):
+        if not self.dead:
+            self.messages.put_nowait(aiohttp.WSMessage(aiohttp.WSMsgType.PONG, data, None))
+
+    async def pong(self, data):
+        self.pongs.append(data)
+
+class FakeSession:
+    """Hands out the given connection outcomes in order (exceptions are raised), then connections that stay open."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.connects = 0
+
+    async def ws_connect(self, url, **kwargs):
+        self.connects += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else FakeWebSocket()
+        if isinstance(outcome, Exception):
+            raise outcome
+        self.ws = outcome
+        return outcome
+
+async def until(condition, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met")
+        await asyncio.sleep(0.001)
+
+@pytest.fixture
+def backoff_delays(monkeypatch):
+    # The upper bound of every jittered backoff; the client then retries right away
+    delays = []
+    monkeypatch.setattr(ws_module.random, "uniform", lambda low, high: delays.append(high) or 0)
+    return delays
+
+async def test_reconnects_with_exponential_backoff(backoff_delays):
+    session = FakeSession(aiohttp.ClientError(), aiohttp.ClientError(), aiohttp.ClientError(), aiohttp.ClientError())
+    client = WebSocketClient(session, "wss://server/ws", backoff_base=1.0, backoff_max=4.0)
+    client.start()
+    await client.wait_for_connection(1)
+    assert session.connects == 5
+    assert backoff_delays == [1.0, 2.0, 4.0, 4.0]  # capped at backoff_max
+    await client.close()
+
+async def test_backoff_restarts_after_a_successful_connection(backoff_delays):
+    first = FakeWebSocket()
+    session = FakeSession(first, aiohttp.ClientError())
+    closes = []
+    client = WebSocketClient(session, "wss://server/ws", on_ws_close=lambda ws, close_status_code: closes.append(close_status_code))
+    client.start()
+    await client.wait_for_connection(1)
+    await first.close()  # dropped by the server
+    await until(lambda: session.connects == 3 and client.connected())
+    assert closes == [1000]
+    assert backoff_delays == [1.0, 2.0]
+    await client.close()
+
+async def test_messages_reach_the_callbacks(backoff_delays):
+    received = []
+    opened = []
+
+    async def on_ws_open(ws):
+        opened.append(ws)
+
+    session = FakeSession()
+    client = WebSocketClient(session, "wss://server/ws", on_ws_msg=lambda ws, data: received.append(data), on_ws_open=on_ws_open)
+    client.start()
+    await client.wait_for_connection(1)
+    session.ws.receive('{"commands": []}')
+    await until(lambda: received)
+    assert opened == [session.ws]
+    assert received == ['{"commands": []}']
+    assert await client.send("status")
+    assert session.ws.sent == ["status"]
+    await client.close()
+
+async def test_send_without_a_connection_fails(backoff_delays):
+    client = WebSocketClient(FakeSession(), "wss://server/ws")
+    assert not await client.send("status")
+
+async def test_waiting_for_a_connection_times_out(backoff_delays):
+    client = WebSocketClient(FakeSession(), "wss://server/ws")
+    with pytest.raises(ws_module.WebSocketConnectionException):
+        await client.wait_for_connection(0.01)
+
+async def test_waiting_without_a_timeout(backoff_delays):
+    client = WebSocketClient(FakeSession(aiohttp.ClientError()), "wss://server/ws")
+    client.start()
+    await client.wait_for_connection()
+    assert client.connected()
+    await client.close()
+
+async def test_heartbeat_measures_the_round_trip(backoff_delays):
+    metrics = Mock()
+    client = WebSocketClient(FakeSession(), "wss://server/ws", heartbeat_interval=0.01, metrics=metrics)
+    client.start()
+    await until(lambda: client.rtt_ms is not None)
+    assert client.rtt_ms >= 0
+    metrics.ws_rtt.assert_called_with(client.rtt_ms)
+    await client.close()
+
+async def test_dead_link_is_closed_and_reconnected(backoff_delays):
+    dead = FakeWebSocket(dead=True)
+    session = FakeSession(dead)
+    metrics = Mock()
+    client = WebSocketClient(session, "wss://server/ws", heartbeat_interval=0.01, max_missed_pongs=2, metrics=metrics)
+    client.start()
+    await until(lambda: session.connects == 2 and client.connected())
+    assert dead.closed
+    metrics.error.assert_called_once_with('ws')
+    await client.close()
+
+async def test_server_pings_are_answered(backoff_delays):
+    session = FakeSession()
+    client = WebSocketClient(session, "wss://server/ws")
+    client.start()
+    await client.wait_for_connection(1)
+    session.ws.messages.put_nowait(aiohttp.WSMessage(aiohttp.WSMsgType.PING, b"ping", None))
+    await until(lambda: session.ws.pongs)
+    assert session.ws.pongs == [b"ping"]
+    await client.close()
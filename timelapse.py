@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import mmap
+import os
+import shutil
+import struct
+import subprocess
+import time
+import aiohttp
+from .const import (
+    DOMAIN, TIMELAPSE_DISK_QUOTA_BYTES, TIMELAPSE_SEGMENT_GROW_BYTES, TIMELAPSE_FPS, TIMELAPSE_MIN_FRAMES,
+    TIMELAPSE_UPLOAD_PATH, TIMELAPSE_UPLOAD_TIMEOUT_SECONDS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+def timelapse_directory(hass, entry_id=None):
+    # Frames of all printers live under one root and share one disk quota
+    root = hass.config.path(DOMAIN, "timelapse")
+    return root if entry_id is None else os.path.join(root, entry_id)
+
+async def async_remove_timelapses(hass, entry_id):
+    await hass.async_add_executor_job(shutil.rmtree, timelapse_directory(hass, entry_id), True)
+
+class FrameSegment:
+    """Append-only frame store: JPEGs in a memory-mapped data file that grows in chunks, plus a fixed-record index file.
+
+    Only the mapping and two counters live in memory; the page cache holds the frames, however long the print.
+    """
+    INDEX_RECORD = struct.Struct("<QId")  # offset, length, capture time
+
+    def __init__(self, path, grow_bytes=TIMELAPSE_SEGMENT_GROW_BYTES):
+        self.data_path = f"{path}.frames"
+        self.index_path = f"{path}.idx"
+        self.grow_bytes = grow_bytes
+        self.frame_count = 0
+        self.used = 0  # bytes of frame data in the data file
+        self._data = None
+        self._index = None
+        self._mm = None
+
+    def open(self):
+        # Reopens an existing segment too, so a print that outlives a restart keeps its earlier frames
+        self._index = open(self.index_path, "ab+")
+        self._index.seek(0, os.SEEK_END)
+        self.frame_count = self._index.tell() // self.INDEX_RECORD.size
+        if self.frame_count:
+            self._index.seek((self.frame_count - 1) * self.INDEX_RECORD.size)
+            offset, length, _ = self.INDEX_RECORD.unpack(self._index.read(self.INDEX_RECORD.size))
+            self.used = offset + length
+        self._data = open(self.data_path, "ab+")
+        self._map(max(os.fstat(self._data.fileno()).st_size, self.grow_bytes))
+
+    def _map(self, size):
+        if self._mm is not None:
+            self._mm.close()
+        if os.fstat(self._data.fileno()).st_size < size:
+            self._data.truncate(size)
+        self._mm = mmap.mmap(self._data.fileno(), size)
+
+    def append(self, jpeg, ts):
+        if self.used + len(jpeg) > len(self._mm):
+            self._map(self.used + len(jpeg) + self.grow_bytes)
+        self._mm[self.used:self.used + len(jpeg)] = jpeg
+        self._index.write(self.INDEX_RECORD.pack(self.used, len(jpeg), ts))
+        self._index.flush()
+        self.used += len(jpeg)
+        self.frame_count += 1
+
+    def frames(self):
+        # Frames in capture order, one at a time
+        self._index.seek(0)
+        for _ in range(self.frame_count):
+            offset, length, _ = self.INDEX_RECORD.unpack(self._index.read(self.INDEX_RECORD.size))
+            yield self._mm[offset:offset + length]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = self._index = None
+
+    def remove(self):
+        self.close()
+        for path in (self.data_path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class TimelapseRecorder:
+    """Records the frames JpegPoster captures during a print and uploads them as one video when the print ends."""
+
+    def __init__(self, hass, plugin, quota_bytes=TIMELAPSE_DISK_QUOTA_BYTES):
+        self.hass = hass
+        self.plugin = plugin
+        self.quota_bytes = quota_bytes
+        self.root = timelapse_directory(hass)
+        self.directory = timelapse_directory(hass, plugin.config_entry.entry_id)
+        self._segment = None
+        self._print_ts = None
+        self._over_quota = False
+        self._lock = asyncio.Lock()  # appends, finishing and eviction never overlap
+
+    async def async_add_frame(self, jpeg):
+        print_ts = self.plugin.print_job_tracker.current_print_ts
+        if print_ts == -1:
+            return
+        async with self._lock:
+            if self._print_ts != print_ts:
+                await self.hass.async_add_executor_job(self._open, print_ts)
+            if self._over_quota:
+                return
+            await self.hass.async_add_executor_job(self._append, jpeg, self._recording_paths())
+
+    def active_paths(self):
+        segment = self._segment
+        return (segment.data_path, segment.index_path) if segment is not None else ()
+
+    def _recording_paths(self):
+        # Segments other printers are still recording into are never evicted
+        paths = set()
+        for component in self.plugin.fleet.components.values():
+            if component.timelapse is not None:
+                paths.update(component.timelapse.active_paths())
+        return paths
+
+    def _open(self, print_ts):
+        if self._segment is not None:
+            self._segment.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment = FrameSegment(os.path.join(self.directory, str(print_ts)))
+        self._segment.open()
+        self._print_ts = print_ts
+        self._over_quota = False
+
+    def _append(self, jpeg, recording):
+        if self._disk_bytes() + len(jpeg) > self.quota_bytes:
+            self._evict_finished(recording)
+            if self._disk_bytes() + len(jpeg) > self.quota_bytes:
+                _LOGGER.warning(f"Timelapse disk quota of {self.quota_bytes} bytes reached, not recording more frames of this print")
+                self._over_quota = True
+                return
+        self._segment.append(jpeg, time.time())
+
+    def _files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                yield os.path.join(directory, name)
+
+    def _disk_bytes(self):
+        total = 0
+        for path in self._files():
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass  # removed by another printer meanwhile
+        return total
+
+    def _evict_finished(self, recording):
+        # Leftovers of earlier prints of any printer (failed uploads), oldest first
+        leftovers = []
+        for path in self._files():
+            if path not in recording:
+                try:
+                    leftovers.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    pass
+        for _, path in sorted(leftovers):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            if self._disk_bytes() <= self.quota_bytes:
+                return
+
+    async def async_finish(self, print_ts, succeeded):
+        async with self._lock:
+            if self._print_ts != print_ts or self._segment is None:
+                return
+            segment, self._segment, self._print_ts = self._segment, None, None
+            try:
+                video_path = await self.hass.async_add_executor_job(self._assemble, segment, print_ts, succeeded)
+                if video_path:
+                    await self._async_upload(video_path, print_ts)
+            finally:
+                # Frames are evicted once the print's video was uploaded or turned out not to be wanted
+                await self.hass.async_add_executor_job(self._remove, segment, f"{segment.data_path[:-len('.frames')]}.mp4")
+
+    def _assemble(self, segment, print_ts, succeeded):
+        setting = "min_timelapse_secs_on_finish" if succeeded else "min_timelapse_secs_on_cancel"
+        min_seconds = self.plugin.printer_settings.get(setting) or 0
+        if segment.frame_count < TIMELAPSE_MIN_FRAMES or time.time() - print_ts < min_seconds:
+            _LOGGER.debug(f"No timelapse for print {print_ts}: {segment.frame_count} frames, shorter than {min_seconds}s")
+            return None
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            _LOGGER.warning("ffmpeg not found, can't assemble the timelapse")
+            return None
+
+        video_path = f"{segment.data_path[:-len('.frames')]}.mp4"
+        cmd = [ffmpeg, "-y", "-loglevel", "error", "-f", "image2pipe", "-framerate", str(TIMELAPSE_FPS), "-c:v", "mjpeg", "-i", "-",
+               "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p", "-movflags", "+faststart", video_path]
+        with subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+            try:
+                for frame in segment.frames():
+                    proc.stdin.write(frame)
+            except BrokenPipeError:
+                pass
+            proc.stdin.close()
+            errors = proc.stderr.read()
+        if proc.returncode:
+            _LOGGER.error(f"ffmpeg failed to assemble the timelapse: {errors.decode(errors='replace').strip()}")
+            return None
+        _LOGGER.debug(f"Assembled timelapse of print {print_ts} from {segment.frame_count} frames")
+        return video_path
+
+    async def _async_upload(self, video_path, print_ts):
+        video = await self.hass.async_add_executor_job(open, video_path, "rb")
+        try:
+            data = aiohttp.FormData()
+            data.add_field("print_ts", str(print_ts))
+            data.add_field("file", video, filename=f"{print_ts}.mp4", content_type="video/mp4")  # streamed from disk in chunks
+            self.plugin.metrics.attempt('rest')
+            async with self.plugin.http_session.post(
+                f"{self.plugin.endpoint_prefix}{TIMELAPSE_UPLOAD_PATH}",
+                data=data,
+                headers=self.plugin.auth_headers(),
+                timeout=aiohttp.ClientTimeout(total=TIMELAPSE_UPLOAD_TIMEOUT_SECONDS),
+            ) as resp:
+                resp.raise_for_status()
+                _LOGGER.info(f"Uploaded timelapse of print {print_ts}")
+        except aiohttp.ClientError as e:
+            self.plugin.metrics.error('rest')
+            _LOGGER.error(f"Failed to upload timelapse of print {print_ts}: {e}")
+        finally:
+            await self.hass.async_add_executor_job(video.close)
+
+    @staticmethod
+    def _remove(segment, video_path):
+        segment.remove()
+        try:
+            os.remove(video_path)
+        except FileNotFoundError:
+            pass
+
+    async def async_stop(self):
+        async with self._lock:
+            if self._segment is not None:
+                await self.hass.async_add_executor_job(self._segment.close)
+                self._segment = None
+                self._print_ts = None
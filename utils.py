@@ -1,3 +1,4 @@
+import asyncio
 import aiohttp
 import logging
 
@@ -9,12 +10,13 @@ async def server_request(method, uri, plugin, timeout=30, raise_exception=False,
     # Merge headers if provided in kwargs
     if 'headers' in kwargs:
         headers.update(kwargs.pop('headers'))
+    plugin.metrics.attempt('rest')
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=headers, timeout=timeout, **kwargs) as resp:
-                resp.raise_for_status()
-                return await resp.json()
-    except aiohttp.ClientError as e:
+        async with plugin.http_session.request(method, url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        plugin.metrics.error('rest')
         _logger.error(f"Request to {url} failed: {e}")
         if raise_exception:
             raise
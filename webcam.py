@@ -0,0 +1,100 @@
+import logging
+import aiohttp
+from homeassistant.components import camera
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from .frame_change import FrameChangeDetector, frame_digest
+from .frame_cache import Frame, FrameCache
+from .image_processing import FrameProcessor, FrameProcessingSettings
+from .const import (
+    WEBCAM_ROLE_PRIMARY, WEBCAM_ROLE_NOZZLE, SNAPSHOT_CHANGE_THRESHOLD, SNAPSHOT_CAPTURE_TIMEOUT_SECONDS,
+    SNAPSHOT_CAPTURE_WIDTH, SNAPSHOT_CAPTURE_HEIGHT, SNAPSHOT_FRAME_FRESHNESS_SECONDS,
+)
+
+_logger = logging.getLogger(__name__)
+
+class Webcam:
+    """One camera of a printer: where frames come from, how often they're taken and how they're processed."""
+
+    def __init__(self, hass, entity_id, role=WEBCAM_ROLE_PRIMARY, interval_factor=1.0, change_threshold=SNAPSHOT_CHANGE_THRESHOLD, processing_settings=None,
+                 capture_timeout=SNAPSHOT_CAPTURE_TIMEOUT_SECONDS, capture_width=SNAPSHOT_CAPTURE_WIDTH, capture_height=SNAPSHOT_CAPTURE_HEIGHT,
+                 frame_freshness=SNAPSHOT_FRAME_FRESHNESS_SECONDS):
+        self.hass = hass
+        self.entity_id = entity_id
+        self.role = role
+        self.interval_factor = interval_factor  # snapshot interval relative to the printer's current one
+        self.capture_timeout = capture_timeout
+        self.capture_width = capture_width
+        self.capture_height = capture_height
+        self.change_detector = FrameChangeDetector(hass, threshold=change_threshold)
+        self.frame_processor = FrameProcessor(hass, processing_settings or FrameProcessingSettings())
+        self.frame_cache = FrameCache(frame_freshness)
+        self.last_post_ts = 0
+
+    @property
+    def is_primary(self):
+        return self.role == WEBCAM_ROLE_PRIMARY
+
+    @property
+    def is_nozzle(self):
+        return self.role == WEBCAM_ROLE_NOZZLE
+
+    def settings(self):
+        # Entry of the status' settings.webcams; uploads are tagged with the same name
+        return {
+            "name": self.entity_id,
+            "is_primary_camera": self.is_primary,
+            "is_nozzle_camera": self.is_nozzle,
+            "stream_mode": "disabled",  # snapshots only
+            "flipV": False,  # frames are already oriented before upload
+            "flipH": False,
+            "rotation": 0,
+            "streamRatio": "16:9",
+        }
+
+    async def capture_jpeg(self):
+        # In-process camera API first; the HTTP round trip through entity_picture is only a fallback
+        try:
+            image = await camera.async_get_image(self.hass, self.entity_id, timeout=self.capture_timeout, width=self.capture_width, height=self.capture_height)
+            return image.content
+        except HomeAssistantError as e:
+            _logger.debug(f"Camera API capture from {self.entity_id} failed, falling back to HTTP: {e}")
+        return await self.capture_jpeg_over_http()
+
+    async def capture_jpeg_over_http(self):
+        camera_state = self.hass.states.get(self.entity_id)
+        if camera_state is None:
+            raise Exception(f"Camera entity {self.entity_id} not found")
+
+        url = camera_state.attributes.get("entity_picture")
+        if url is None:
+            raise Exception(f"Camera entity {self.entity_id} does not have an entity_picture attribute")
+
+        # Prepend the base URL of your Home Assistant instance
+        base_url = self.hass.config.external_url or self.hass.config.internal_url
+        if not base_url:
+            raise Exception("Base URL for Home Assistant is not set")
+        full_url = f"{base_url}{url}"
+
+        _logger.debug(f"Capturing JPEG from URL: {full_url}")
+
+        session = async_get_clientsession(self.hass)
+        async with session.get(full_url, timeout=aiohttp.ClientTimeout(total=self.capture_timeout)) as response:
+            _logger.debug(f"Response status: {response.status}")
+            if response.status != 200:
+                _logger.error(f"Failed to capture jpeg - HTTP status code: {response.status}")
+                raise Exception(f"Failed to capture jpeg - HTTP status code: {response.status}")
+            response.raise_for_status()
+            return await response.read()
+
+    async def async_frame(self, max_age=None):
+        # Latest processed frame, captured only if the cached one is older than max_age (default: the freshness window)
+        return await self.frame_cache.async_get(self._async_capture_frame, max_age)
+
+    async def _async_capture_frame(self, previous):
+        jpeg = await self.capture_jpeg()
+        source_digest = frame_digest(jpeg)
+        if previous is not None and previous.source_digest == source_digest:
+            return Frame(previous.content, previous.digest, source_digest)  # same picture as last time, already processed
+        content = await self.frame_processor.async_process(jpeg)
+        return Frame(content, source_digest if content is jpeg else frame_digest(content), source_digest)
@@ -1,7 +1,9 @@
 # octoprint_obico/ws.py
-import websocket
-import threading
+import asyncio
 import logging
+import random
+import time
+import aiohttp
 
 _logger = logging.getLogger('homeassistant.components.obico')
 
@@ -9,59 +11,166 @@ class WebSocketConnectionException(Exception):
     pass
 
 class WebSocketClient:
-    def __init__(self, url, token=None, on_ws_msg=None, on_ws_close=None, on_ws_open=None, subprotocols=None, waitsecs=120):
-        self._mutex = threading.RLock()
+    """Event-loop native websocket connection to the server that reconnects on its own."""
 
-        def on_error(ws, error):
-            _logger.warning('Server WS ERROR: {}'.format(error))
-            threading.Thread(target=self.close).start()
+    def __init__(self, session, url, token=None, on_ws_msg=None, on_ws_close=None, on_ws_open=None, subprotocols=None,
+                 connect_timeout=30, backoff_base=1.0, backoff_max=60.0, heartbeat_interval=20.0, max_missed_pongs=2, metrics=None):
+        self.session = session
+        self.url = url
+        self.headers = {"authorization": "bearer " + token} if token else None
+        self.subprotocols = subprotocols or ()
+        self.on_ws_msg = on_ws_msg
+        self.on_ws_close = on_ws_close
+        self.on_ws_open = on_ws_open
+        self.connect_timeout = connect_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.heartbeat_interval = heartbeat_interval
+        self.max_missed_pongs = max_missed_pongs
+        self.metrics = metrics
+        self.rtt_ms = None  # round trip time of the last answered heartbeat
+        self._ping_sent_ns = None  # send time of the unanswered ping, also its payload
+        self._missed_pongs = 0
+        self.ws = None
+        self.connected_event = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._reader_task = None
+        self._closing = False
 
-        def on_message(ws, msg):
-            if on_ws_msg:
-                on_ws_msg(ws, msg)
+    def start(self):
+        if self._reader_task is None:
+            self._reader_task = asyncio.get_running_loop().create_task(self._run())
 
-        def on_close(ws, close_status_code, close_msg):
-            _logger.warning('WS Closed - {} - {}'.format(close_status_code, close_msg))
-            if on_ws_close:
-                on_ws_close(ws, close_status_code=close_status_code)
+    async def wait_for_connection(self, waitsecs=None):
+        try:
+            await asyncio.wait_for(self.connected_event.wait(), waitsecs)
+        except asyncio.TimeoutError:
+            raise WebSocketConnectionException('Not connected to websocket server after {}s'.format(waitsecs))
 
-        def on_open(ws):
-            _logger.debug('WS Opened')
-            threading.Thread(target=on_ws_open, args=(ws,)).start() if on_ws_open else None
+    async def _run(self):
+        attempt = 0
+        while not self._closing:
+            try:
+                _logger.debug('Connecting to websocket: {}'.format(self.url))
+                if self.metrics:
+                    self.metrics.attempt('ws')
+                self.ws = await asyncio.wait_for(
+                    # autoping off: pongs have to reach _read_until_closed to measure the round trip
+                    self.session.ws_connect(self.url, headers=self.headers, protocols=self.subprotocols, autoping=False),
+                    self.connect_timeout,
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                _logger.warning('Server WS ERROR: {}'.format(e))
+                if self.metrics:
+                    self.metrics.error('ws')
+            else:
+                attempt = 0
+                await self._read_until_closed()
 
-        _logger.debug('Connecting to websocket: {}'.format(url))
-        header = ["authorization: bearer " + token] if token else None
-        self.ws = websocket.WebSocketApp(
-            url,
-            on_message=on_message,
-            on_open=on_open,
-            on_close=on_close,
-            on_error=on_error,
-            header=header,
-            subprotocols=subprotocols
-        )
+            if self._closing:
+                break
+            # Exponential backoff with full jitter so that many printers don't reconnect in lockstep
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            attempt += 1
+            _logger.debug('Reconnecting to websocket in {:.1f}s'.format(delay))
+            await asyncio.sleep(delay)
 
-        run_forever_kwargs = {'reconnect': 0} if 'reconnect' in inspect.getfullargspec(websocket.WebSocketApp.run_forever).args else {}
-        wst = threading.Thread(target=self.ws.run_forever, kwargs=run_forever_kwargs)
-        wst.daemon = True
-        wst.start()
+    async def _read_until_closed(self):
+        ws = self.ws
+        _logger.debug('WS Opened')
+        self.connected_event.set()
+        if self.metrics:
+            self.metrics.ws_connected()
+        self._ping_sent_ns = None
+        self._missed_pongs = 0
+        heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat(ws)) if self.heartbeat_interval else None
+        try:
+            if self.on_ws_open:
+                await self.on_ws_open(ws)
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.PING:
+                    async with self._send_lock:
+                        await ws.pong(msg.data)
+                elif msg.type == aiohttp.WSMsgType.PONG:
+                    self._on_pong(msg.data)
+                elif msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                    if self.on_ws_msg:
+                        try:
+                            self.on_ws_msg(ws, msg.data)
+                        except Exception as e:
+                            _logger.exception('Error processing server message: {}'.format(e))
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    _logger.warning('Server WS ERROR: {}'.format(ws.exception()))
+                    break
+        except Exception as e:
+            _logger.warning('Server WS ERROR: {}'.format(e))
+        finally:
+            if heartbeat_task:
+                heartbeat_task.cancel()
+            self.connected_event.clear()
+            self.ws = None
+            if not ws.closed and self._missed_pongs < self.max_missed_pongs:  # a dead link is already being closed
+                await ws.close()
+            _logger.warning('WS Closed - {}'.format(ws.close_code))
+            if self.on_ws_close:
+                self.on_ws_close(ws, close_status_code=ws.close_code)
 
-        for i in range(waitsecs * 10):
-            if self.connected():
-                return
-            time.sleep(0.1)
-        self.ws.close()
-        raise WebSocketConnectionException('Not connected to websocket server after {}s'.format(waitsecs))
+    async def _heartbeat(self, ws):
+        # Application-level ping/pong: a half-open connection behind NAT is found within max_missed_pongs intervals
+        while not ws.closed:
+            await asyncio.sleep(self.heartbeat_interval)
+            if self._ping_sent_ns is not None:
+                self._missed_pongs += 1
+                if self._missed_pongs >= self.max_missed_pongs:
+                    _logger.warning('No pong for {} heartbeats, reconnecting'.format(self._missed_pongs))
+                    if self.metrics:
+                        self.metrics.error('ws')
+                    # close() wakes the reader with a CLOSING message right away; the closing handshake finishes in the background
+                    asyncio.get_running_loop().create_task(ws.close())
+                    return
+            self._ping_sent_ns = time.monotonic_ns()
+            try:
+                async with self._send_lock:
+                    await ws.ping(self._ping_sent_ns.to_bytes(8, 'big'))
+            except (aiohttp.ClientError, ConnectionError, RuntimeError) as e:
+                _logger.warning('Failed to send heartbeat: {}'.format(e))
 
-    def send(self, data, as_binary=False):
-        with self._mutex:
-            if as_binary:
-                self.ws.send(data, opcode=websocket.ABNF.OPCODE_BINARY)
-            else:
-                self.ws.send(data)
+    def _on_pong(self, payload):
+        if self._ping_sent_ns is None or payload != self._ping_sent_ns.to_bytes(8, 'big'):
+            return  # unsolicited or stale pong
+        self.rtt_ms = (time.monotonic_ns() - self._ping_sent_ns) / 1e6
+        self._ping_sent_ns = None
+        self._missed_pongs = 0
+        if self.metrics:
+            self.metrics.ws_rtt(self.rtt_ms)
+
+    async def send(self, data, as_binary=False):
+        ws = self.ws
+        if not self.connected():
+            _logger.warning("Attempted to send data, but WebSocket is not connected.")
+            return False
+        try:
+            async with self._send_lock:
+                if as_binary:
+                    await ws.send_bytes(data)
+                else:
+                    await ws.send_str(data)
+            return True
+        except (aiohttp.ClientError, ConnectionError, RuntimeError) as e:
+            _logger.warning('Failed to send data over WebSocket: {}'.format(e))
+            return False
 
     def connected(self):
-        return self.ws.sock and self.ws.sock.connected
+        return self.ws is not None and not self.ws.closed
 
-    def close(self):
-        self.ws.close()
\ No newline at end of file
+    async def close(self):
+        self._closing = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None